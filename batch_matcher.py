@@ -0,0 +1,139 @@
+# batch_matcher.py
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import Levenshtein
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ticker_index import TickerIndex, get_index, normalize_name, split_security_name, trigrams
+
+# Names per sparse matrix product; bounds the dense score block to CHUNK_SIZE x universe
+CHUNK_SIZE = 2000
+
+# Cosine candidates per input row that are re-scored with Levenshtein
+RESCORE_CANDIDATES = 5
+
+RESULT_COLUMNS = ['input_name', 'found_name', 'ticker', 'confidence',
+                  'runner_up_name', 'runner_up_ticker', 'runner_up_confidence']
+
+
+class BatchMatcher:
+    """
+    Many-to-many company name matcher.
+
+    The ticker universe is held as an L2-normalized TF-IDF matrix of character
+    trigrams. A batch of input names is vectorized the same way and scored
+    against the whole universe with one sparse matrix product; the top
+    candidates per row are re-scored with Levenshtein so confidences use the
+    same 0-100 scale as TickerIndex.search and fuzz.ratio.
+    """
+
+    def __init__(self, index: Optional[TickerIndex] = None):
+        index = index if index is not None else get_index()
+        self.keys = index.keys
+        self.symbols = [listings[0][0] for listings in index.entries]
+        self.names = [split_security_name(listings[0][1])[0] for listings in index.entries]
+
+        self.vocabulary = {}
+        for key in self.keys:
+            for gram in trigrams(key):
+                self.vocabulary.setdefault(gram, len(self.vocabulary))
+        counts = self._count_matrix(self.keys)
+        doc_freq = np.bincount(counts.indices, minlength=len(self.vocabulary))
+        self.idf = np.log((1 + len(self.keys)) / (1 + doc_freq)) + 1.0
+        self.universe_t = self._weight(counts).T.tocsr()
+
+    def _count_matrix(self, keys: List[str]) -> sparse.csr_matrix:
+        indptr = [0]
+        indices = []
+        for key in keys:
+            indices.extend(self.vocabulary[g] for g in trigrams(key) if g in self.vocabulary)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        return sparse.csr_matrix((data, np.array(indices, dtype=np.int32), np.array(indptr)),
+                                 shape=(len(keys), len(self.vocabulary)))
+
+    def _weight(self, counts: sparse.csr_matrix) -> sparse.csr_matrix:
+        weighted = counts.multiply(self.idf.astype(np.float32)).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(weighted).tocsr()
+
+    def match_chunk(self, names: List[str]) -> pd.DataFrame:
+        """Match one chunk of names against the universe."""
+        keys = [normalize_name(str(name)) for name in names]
+        scores = self._weight(self._count_matrix(keys)).dot(self.universe_t).toarray()
+
+        n_candidates = min(RESCORE_CANDIDATES, scores.shape[1])
+        candidates = np.argpartition(-scores, n_candidates - 1, axis=1)[:, :n_candidates]
+
+        rows = []
+        for name, key, row_scores, row_candidates in zip(names, keys, scores, candidates):
+            ranked = sorted(
+                ((round(Levenshtein.ratio(key, self.keys[c]) * 100), c)
+                 for c in row_candidates if key and row_scores[c] > 0),
+                reverse=True)
+            best = ranked[0] if ranked else (0, None)
+            second = ranked[1] if len(ranked) > 1 else (0, None)
+            rows.append((
+                name,
+                self.names[best[1]] if best[1] is not None else 'Not Found',
+                self.symbols[best[1]] if best[1] is not None else 'N/A',
+                best[0],
+                self.names[second[1]] if second[1] is not None else 'N/A',
+                self.symbols[second[1]] if second[1] is not None else 'N/A',
+                second[0],
+            ))
+        return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+    def match(self, names: List[str], chunk_size: int = CHUNK_SIZE,
+              workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        Match every name in one batch.
+
+        Args:
+            names (List[str]): Company names to resolve
+            chunk_size (int): Names per sparse matrix product
+            workers (int): Spread chunks across this many processes (None = in-process)
+
+        Returns:
+            pd.DataFrame: One row per input name with the best match, its
+            confidence and the runner-up (see RESULT_COLUMNS)
+        """
+        names = list(names)
+        chunks = [names[i:i + chunk_size] for i in range(0, len(names), chunk_size)]
+        if not chunks:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        if workers and workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self,)) as executor:
+                frames = list(executor.map(_match_in_worker, chunks))
+        else:
+            frames = [self.match_chunk(chunk) for chunk in chunks]
+        return pd.concat(frames, ignore_index=True)
+
+
+_worker_matcher = None
+
+
+def _init_worker(matcher: BatchMatcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _match_in_worker(names: List[str]) -> pd.DataFrame:
+    return _worker_matcher.match_chunk(names)
+
+
+_default_matcher = None
+
+
+def match_names(names: List[str], chunk_size: int = CHUNK_SIZE,
+                workers: Optional[int] = None) -> pd.DataFrame:
+    """Match names against the ticker master using a shared BatchMatcher."""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = BatchMatcher()
+    return _default_matcher.match(names, chunk_size=chunk_size, workers=workers)
@@ -0,0 +1,292 @@
+# cap_analytics.py
+import argparse
+import sys
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from ticker_universe import CATEGORY_FIELDS, TickerUniverse, get_universe
+
+# Snapshot written by get_market_cap.main
+MARKET_DATA_FILE = 'market_data.csv'
+
+# Size buckets on USD market cap: lower bounds of small, mid, large and mega caps
+SIZE_BUCKET_EDGES = [0, 2e9, 10e9, 200e9, np.inf]
+SIZE_BUCKETS = ['small', 'mid', 'large', 'mega']
+
+# Yahoo FX pair quoted as USD per unit of the currency
+FX_SYMBOL = "{currency}USD=X"
+# Minor units Yahoo reports some listings in: code -> (major currency, units per major unit).
+# Both Yahoo's codes (GBp, ZAc) and the upper-case ones in market_data.csv (GBX, ZAC) are
+# listed; get_market_cap writes pence as GBX, so GBP there always means pounds
+MINOR_UNITS = {'GBp': ('GBP', 100), 'GBX': ('GBP', 100), 'ILA': ('ILS', 100), 'ZAc': ('ZAR', 100),
+               'ZAC': ('ZAR', 100)}
+# Rows without a currency are assumed to be US listings
+DEFAULT_CURRENCY = 'USD'
+
+# Keys totals are kept for, and updated incrementally by update()
+TOTAL_KEYS = ['sector', 'industry', 'exchange', 'SizeBucket']
+CATEGORY_COLUMNS = ['Currency', 'Market'] + CATEGORY_FIELDS
+
+# Base level of cap-weighted indices
+INDEX_BASE = 100.0
+
+
+def fx_rates(currencies: Iterable[str], fetch=None) -> Dict[str, float]:
+    """
+    USD value of one unit of each currency, from Yahoo FX quotes.
+
+    The quotes go through yahoo_quotes.get_quotes (and its info cache), so
+    repeated calls within the quote TTL do not hit the network. Minor units
+    (GBp/GBX, ILA, ZAc/ZAC) are derived from their major currency. Currencies Yahoo
+    has no rate for, or whose quotes could not be fetched, are left out with a
+    warning; their caps have no USD value.
+    """
+    from yahoo_quotes import QuoteFetchError
+    if fetch is None:
+        from yahoo_quotes import get_quotes as fetch
+    wanted = {c for c in currencies if isinstance(c, str) and c}
+    majors = {MINOR_UNITS[c][0] if c in MINOR_UNITS else c for c in wanted} - {'USD'}
+    rates = {'USD': 1.0}
+    if majors:
+        symbols = {FX_SYMBOL.format(currency=c): c for c in sorted(majors)}
+        try:
+            prices = fetch(list(symbols), fields=['regularMarketPrice'])['regularMarketPrice'].items()
+        except QuoteFetchError as e:
+            print(f"FX quotes failed for {', '.join(e.symbols)}: {e}", file=sys.stderr)
+            prices = [(record.get('symbol'), record.get('regularMarketPrice')) for record in e.records]
+        for symbol, price in prices:
+            if symbol in symbols and pd.notna(price) and price > 0:
+                rates[symbols[symbol]] = float(price)
+    for code in wanted & set(MINOR_UNITS):
+        major, units = MINOR_UNITS[code]
+        if major in rates:
+            rates[code] = rates[major] / units
+    unknown = wanted - set(rates)
+    if unknown:
+        print(f"No USD rate for {', '.join(sorted(unknown))}; their market caps are left out", file=sys.stderr)
+    return {c: rates[c] for c in wanted | {'USD'} if c in rates}
+
+
+def metadata_frame(universe: TickerUniverse) -> pd.DataFrame:
+    """Exchange/sector/industry of every universe ticker as categoricals, indexed by ticker."""
+    columns = {}
+    for field in CATEGORY_FIELDS:
+        # Code 0 is "unknown" and becomes a missing value
+        codes = np.asarray(universe.codes[field], dtype=np.int64) - 1
+        columns[field] = pd.Categorical.from_codes(codes, categories=universe.categories[field][1:])
+    return pd.DataFrame(columns, index=pd.Index(universe.tickers(), name='Ticker'))
+
+
+def _usd(caps: pd.Series, currencies: pd.Series, rates: Dict[str, float]) -> pd.Series:
+    currencies = currencies.astype(object).where(currencies.notna(), DEFAULT_CURRENCY)
+    return caps * currencies.map(rates).astype(float)
+
+
+def _group_totals(frame: pd.DataFrame, by: str) -> pd.DataFrame:
+    totals = frame.groupby(by, observed=True)['MarketCapUSD'].agg(['sum', 'count'])
+    totals.index = totals.index.astype(object)
+    return totals
+
+
+class CapAnalytics:
+    """
+    Market-cap analytics over one snapshot joined with the ticker universe.
+
+    The snapshot (Ticker, MarketCap, Currency, Market, as written by
+    get_market_cap) is joined with the universe's sector/industry/exchange
+    codes and kept as one frame with categorical keys. Caps are converted to
+    USD with fx_rates and bucketed by size. Everything is computed with
+    vectorized pandas/NumPy operations.
+
+    update() applies the rows of a partial run. Group totals are adjusted
+    by the changed rows only: old contributions are subtracted and new ones
+    added. Percentile ranks are recomputed lazily on the next read. The
+    overall rank is one vectorized rank over all caps, because any change
+    shifts everyone's percentile. Within-sector ranks are recomputed only
+    for the sectors the changed tickers were in.
+    """
+
+    def __init__(self, results_df: pd.DataFrame, universe: Optional[TickerUniverse] = None,
+                 rates: Optional[Dict[str, float]] = None):
+        self.metadata = metadata_frame(universe if universe is not None else get_universe())
+        self.rates = dict(rates) if rates is not None else None
+        self.frame = self._prepare(results_df)
+        self._totals = {by: _group_totals(self.frame, by) for by in TOTAL_KEYS}
+        self._stale_sectors = None  # None: all ranks must be recomputed
+        self._ranked = False
+
+    def _prepare(self, results_df: pd.DataFrame) -> pd.DataFrame:
+        """Typed, joined and USD-normalised rows of a get_market_cap result, indexed by ticker."""
+        frame = pd.DataFrame({
+            'MarketCap': pd.to_numeric(results_df['MarketCap'], errors='coerce').astype(float).values,
+            'Currency': results_df['Currency'].replace('N/A', None).values,
+            'Market': results_df['Market'].replace('N/A', None).values,
+        }, index=pd.Index(results_df['Ticker'].astype(str).str.upper().values, name='Ticker'))
+        frame = frame[~frame.index.duplicated(keep='last')]
+        missing_rates = set(frame['Currency'].dropna()) - set(self.rates or ())
+        if self.rates is None or missing_rates:
+            self.rates = dict(self.rates or {}, **fx_rates(missing_rates | {'USD'}))
+        frame = frame.join(self.metadata, how='left')
+        # The quote's exchange is fresher than the universe's copy
+        frame['exchange'] = frame['Market'].where(frame['Market'].notna(), frame['exchange'].astype(object))
+        for column in CATEGORY_COLUMNS:
+            frame[column] = frame[column].astype('category')
+        frame['MarketCapUSD'] = _usd(frame['MarketCap'], frame['Currency'], self.rates)
+        frame['SizeBucket'] = pd.cut(frame['MarketCapUSD'], SIZE_BUCKET_EDGES, right=False, labels=SIZE_BUCKETS)
+        frame['pct_rank'] = np.nan
+        frame['sector_pct_rank'] = np.nan
+        return frame
+
+    def update(self, results_df: pd.DataFrame) -> int:
+        """Apply new rows for some tickers (others are kept); returns the number of rows applied."""
+        new = self._prepare(results_df)
+        old = self.frame.reindex(new.index)
+        for by, totals in self._totals.items():
+            totals = totals.sub(_group_totals(old, by), fill_value=0).add(_group_totals(new, by), fill_value=0)
+            totals['count'] = totals['count'].round().astype(int)
+            self._totals[by] = totals[totals['count'] > 0]
+
+        touched = set(old['sector'].dropna()) | set(new['sector'].dropna())
+        if self._stale_sectors is not None:
+            self._stale_sectors |= touched
+
+        frame = self.frame
+        for column in CATEGORY_COLUMNS + ['SizeBucket']:
+            categories = frame[column].cat.categories.union(new[column].cat.categories, sort=False)
+            frame[column] = frame[column].cat.set_categories(categories, ordered=frame[column].cat.ordered)
+            new[column] = new[column].cat.set_categories(categories, ordered=frame[column].cat.ordered)
+        existing = new.index.intersection(frame.index)
+        frame.loc[existing] = new.loc[existing]
+        added = new.index.difference(frame.index, sort=False)
+        if len(added):
+            frame = pd.concat([frame, new.loc[added]])
+        self.frame = frame
+        self._ranked = False
+        return len(new)
+
+    def _rank(self):
+        if self._ranked:
+            return
+        caps = self.frame['MarketCapUSD']
+        self.frame['pct_rank'] = caps.rank(pct=True)
+        sectors = self.frame['sector']
+        mask = sectors.notna() if self._stale_sectors is None else sectors.isin(self._stale_sectors)
+        if mask.any():
+            self.frame.loc[mask, 'sector_pct_rank'] = caps[mask].groupby(sectors[mask], observed=True).rank(pct=True)
+        self._stale_sectors = set()
+        self._ranked = True
+
+    def table(self) -> pd.DataFrame:
+        """The joined universe table with USD caps, size buckets and percentile ranks."""
+        self._rank()
+        return self.frame.copy()
+
+    def ranks(self) -> pd.DataFrame:
+        """Percentile rank of each ticker's USD cap, overall and within its sector."""
+        self._rank()
+        return self.frame[['MarketCapUSD', 'sector', 'pct_rank', 'sector_pct_rank']].copy()
+
+    def totals(self, by: str = 'sector') -> pd.DataFrame:
+        """Total USD market cap, ticker count and share of the total per group, largest first."""
+        if by not in self._totals:
+            self._totals[by] = _group_totals(self.frame, by)
+        totals = self._totals[by].rename(columns={'sum': 'market_cap_usd'})
+        total = totals['market_cap_usd'].sum()
+        totals = totals.assign(share=totals['market_cap_usd'] / total if total else np.nan)
+        return totals.sort_values('market_cap_usd', ascending=False).rename_axis(by)
+
+
+def cap_weighted_index(history: Optional[pd.DataFrame] = None, start=None, end=None, by: Optional[str] = None,
+                       universe: Optional[TickerUniverse] = None, rates: Optional[Dict[str, float]] = None,
+                       base: float = INDEX_BASE) -> pd.DataFrame:
+    """
+    Cap-weighted index levels per date from stored market cap history.
+
+    The index is chain-linked. Between two consecutive snapshot dates it
+    moves by the change in total USD cap of the tickers present on both
+    dates, so tickers entering or leaving the universe do not move it. With
+    `by` ('sector', 'industry', 'exchange', 'Currency' or 'SizeBucket') there
+    is one index column per group; otherwise a single 'level' column.
+
+    History defaults to market_cap_store.load_history(start, end). Caps are
+    converted with one set of FX rates for all dates, so non-USD members move
+    with their local-currency caps.
+    """
+    if history is None:
+        from market_cap_store import load_history
+        history = load_history(start, end)
+    if history.empty:
+        return pd.DataFrame(columns=['level'], index=pd.DatetimeIndex([], name='date'))
+    frame = pd.DataFrame({
+        'date': pd.to_datetime(history['date']).values,
+        'Ticker': history['Ticker'].astype(str).values,
+        'MarketCap': pd.to_numeric(history['MarketCap'], errors='coerce').astype(float).values,
+        'Currency': history['Currency'].astype(object).values,
+    })
+    if rates is None:
+        rates = fx_rates(frame['Currency'].dropna().unique())
+    frame['cap'] = _usd(frame['MarketCap'], frame['Currency'], rates)
+    if by in CATEGORY_FIELDS:
+        metadata = metadata_frame(universe if universe is not None else get_universe())
+        frame['group'] = metadata[by].reindex(frame['Ticker']).astype(object).values
+        if by == 'exchange':
+            market = history['Market'].astype(object).values
+            frame['group'] = np.where(pd.notna(market), market, frame['group'])
+    elif by == 'SizeBucket':
+        frame['group'] = pd.cut(frame['cap'], SIZE_BUCKET_EDGES, right=False, labels=SIZE_BUCKETS).astype(object)
+    elif by is not None:
+        frame['group'] = history[by].astype(object).values
+    else:
+        frame['group'] = 'level'
+
+    dates = np.sort(frame['date'].unique())
+    frame['pos'] = np.searchsorted(dates, frame['date'].values)
+    frame = frame.sort_values(['Ticker', 'pos'], kind='stable')
+    same_ticker = frame['Ticker'].eq(frame['Ticker'].shift())
+    previous_cap = frame['cap'].shift().where(same_ticker)
+    previous_pos = frame['pos'].shift().where(same_ticker)
+    # Only pairs of consecutive snapshots in the same group count towards a date's return
+    linked = ((previous_pos == frame['pos'] - 1) & frame['group'].eq(frame['group'].shift())
+              & frame['cap'].notna() & previous_cap.notna())
+    sums = pd.DataFrame({'group': frame['group'][linked], 'pos': frame['pos'][linked],
+                         'now': frame['cap'][linked], 'before': previous_cap[linked]})
+    sums = sums.groupby(['pos', 'group'])[['now', 'before']].sum()
+    returns = (sums['now'] / sums['before']).unstack('group')
+    returns = returns.reindex(range(len(dates))).replace([np.inf, -np.inf], np.nan).fillna(1.0)
+    levels = base * returns.cumprod()
+    levels.index = pd.DatetimeIndex(dates, name='date')
+    levels.columns.name = by
+    # A group's index starts at its first date with data
+    present = frame.groupby(['pos', 'group']).size().unstack('group').reindex(range(len(dates))).notna()
+    started = present.cumsum().gt(0).reindex(columns=levels.columns, fill_value=False)
+    return levels.where(started.values)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Market cap totals, ranks and cap-weighted indices.")
+    parser.add_argument('--input', default=MARKET_DATA_FILE, help="get_market_cap output CSV")
+    parser.add_argument('--by', default=None, choices=TOTAL_KEYS + ['Currency'],
+                        help="Group key (default: sector totals, one overall index)")
+    parser.add_argument('--top', type=int, default=10, help="Largest tickers to list")
+    parser.add_argument('--index', action='store_true', help="Cap-weighted index levels from the history store")
+    parser.add_argument('--start', default=None, help="YYYY-MM-DD (with --index)")
+    parser.add_argument('--end', default=None, help="YYYY-MM-DD (with --index)")
+    args = parser.parse_args(argv)
+
+    if args.index:
+        print(cap_weighted_index(start=args.start, end=args.end, by=args.by).round(2).to_string())
+        return 0
+    analytics = CapAnalytics(pd.read_csv(args.input))
+    totals = analytics.totals(args.by or 'sector')
+    print(totals.assign(market_cap_usd=totals['market_cap_usd'].map('{:,.0f}'.format),
+                        share=totals['share'].map('{:.1%}'.format)).to_string())
+    table = analytics.table().sort_values('MarketCapUSD', ascending=False).head(args.top)
+    print()
+    print(table[['MarketCapUSD', 'Currency', 'sector', 'SizeBucket', 'pct_rank', 'sector_pct_rank']].to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
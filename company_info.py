@@ -1,29 +1,37 @@
-import yfinance as yf
-import pandas as pd
 from typing import Dict, Optional
+from info_cache import get_info
+from yahoo_quotes import get_quote
+from instrumentation import profiled, timed
 
-def get_company_info(ticker_symbol: str) -> Optional[Dict]:
+# Fields from the batch quote endpoint; sector and industry are only in Ticker.info
+QUOTE_FIELDS = ['longName', 'market', 'marketCap', 'currency', 'exchange']
+PROFILE_FIELDS = ['sector', 'industry']
+
+@timed('get_company_info')
+def get_company_info(ticker_symbol: str, refresh: bool = False) -> Optional[Dict]:
     """
     Get company information including ticker symbol, market, and market share.
     
     Args:
         ticker_symbol (str): Stock ticker symbol (e.g., 'AAPL', 'MSFT', 'GOOGL')
+        refresh (bool): Ignore cached data and fetch fresh information
         
     Returns:
         dict: Dictionary containing company information or None if not found
     """
     try:
-        # Create a Ticker object with the symbol
-        ticker = yf.Ticker(ticker_symbol)
-        
-        # Get company info
-        info = ticker.info
+        # Quote fields come from the batch quote endpoint (served from the local cache when still fresh)
+        info = get_quote(ticker_symbol, fields=QUOTE_FIELDS, refresh=refresh)
         
         # Check if we got valid information
-        if not info or 'symbol' not in info:
+        if not info or ('longName' not in info and 'marketCap' not in info):
             print(f"Debug: No valid information found for ticker {ticker_symbol}")
             return None
         
+        # Sector and industry rarely change and are cached for a week
+        profile = get_info(ticker_symbol, fields=PROFILE_FIELDS, refresh=refresh)
+        info.update({field: profile[field] for field in PROFILE_FIELDS if field in profile})
+        
         # Extract relevant information
         company_info = {
             'name': info.get('longName', ticker_symbol),
@@ -72,4 +80,5 @@ def main():
         print("   - META (Meta/Facebook)")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    with profiled():
+        main() 
\ No newline at end of file
@@ -0,0 +1,208 @@
+# companyfacts.py
+import argparse
+import json
+import os
+import zipfile
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from instrumentation import profiled, span
+
+# SEC bulk archive with every company's XBRL facts, one CIK##########.json per company
+COMPANYFACTS_URL = "https://www.sec.gov/Archives/edgar/daily-index/xbrl/companyfacts.zip"
+COMPANYFACTS_ZIP = "companyfacts.zip"
+
+# Shares outstanding index built from the archive, reused until the zip changes
+SHARES_FILE = "shares_outstanding.parquet"
+
+# Share count concepts in order of preference: the cover page figure, then the balance sheet one
+SHARE_CONCEPTS = [('dei', 'EntityCommonStockSharesOutstanding'),
+                  ('us-gaap', 'CommonStockSharesOutstanding')]
+
+SHARES_COLUMNS = ['cik', 'shares_outstanding', 'shares_as_of', 'filed', 'form', 'accession', 'concept']
+OUTPUT_COLUMNS = ['Ticker', 'MarketCap', 'Currency', 'Market', 'SharesOutstanding', 'Price', 'SharesAsOf']
+
+# company_tickers.json also lists an issuer's preferreds (BAC-PB), warrants (XYZ-WT, ABCDW),
+# units (XYZ-UN, ABCDU) and rights (XYZ-RT, ABCDR; NASDAQ's fifth-letter codes) under its CIK
+NON_COMMON_TICKER = r'-(?:P[A-Z]*|WT?S?|UN?|RT?)$|^[A-Z]{4}[WUR]$'
+
+
+def latest_shares(facts: Dict) -> Optional[Dict]:
+    """
+    Latest shares outstanding figure from one company's companyfacts document.
+
+    Companies with several share classes report one value per class for the
+    same date and filing; those are summed into a single total.
+    """
+    for taxonomy, concept in SHARE_CONCEPTS:
+        units = facts.get('facts', {}).get(taxonomy, {}).get(concept, {}).get('units', {})
+        values = units.get('shares')
+        if not values:
+            continue
+        latest = max(values, key=lambda v: (v.get('end', ''), v.get('filed', '')))
+        same_report = [v for v in values
+                       if v.get('end') == latest.get('end') and v.get('accn') == latest.get('accn')]
+        return {
+            'cik': int(facts.get('cik') or 0),
+            'shares_outstanding': int(sum(v['val'] for v in same_report)),
+            'shares_as_of': latest.get('end'),
+            'filed': latest.get('filed'),
+            'form': latest.get('form'),
+            'accession': latest.get('accn'),
+            'concept': f"{taxonomy}:{concept}",
+        }
+    return None
+
+
+def iter_companyfacts(zip_path: str) -> Iterable[Dict]:
+    """Yield each company's facts document from the bulk archive, one member at a time."""
+    with zipfile.ZipFile(zip_path) as archive:
+        for member in archive.infolist():
+            if not member.filename.endswith('.json'):
+                continue
+            with archive.open(member) as f:
+                try:
+                    yield json.load(f)
+                except ValueError as e:
+                    print(f"Skipping {member.filename}: {e}")
+
+
+def index_shares_outstanding(zip_path: str = COMPANYFACTS_ZIP) -> pd.DataFrame:
+    """Read the archive in a single pass and return the latest share count per CIK."""
+    rows = []
+    with span('parse', step='companyfacts'):
+        for facts in iter_companyfacts(zip_path):
+            row = latest_shares(facts)
+            if row is not None and row['cik']:
+                rows.append(row)
+    shares = pd.DataFrame(rows, columns=SHARES_COLUMNS)
+    shares['cik'] = shares['cik'].astype('int64')
+    shares['shares_outstanding'] = shares['shares_outstanding'].astype('int64')
+    return shares
+
+
+def load_shares_outstanding(zip_path: str = COMPANYFACTS_ZIP, shares_file: str = SHARES_FILE) -> pd.DataFrame:
+    """Shares outstanding by CIK, from the Parquet index when it is newer than the zip."""
+    if os.path.exists(shares_file) and os.path.getmtime(shares_file) >= os.path.getmtime(zip_path):
+        return pd.read_parquet(shares_file)
+    shares = index_shares_outstanding(zip_path)
+    shares.to_parquet(shares_file, index=False)
+    return shares
+
+
+def download_companyfacts(dest: str = COMPANYFACTS_ZIP, client=None) -> str:
+    """Download the bulk companyfacts archive (over 1 GB) through the shared EDGAR client."""
+    if client is None:
+        from fetch_files_api import get_client
+        client = get_client()
+    print(f"Downloading {COMPANYFACTS_URL} to {dest}...")
+    return client.download_file(COMPANYFACTS_URL, dest)
+
+
+def cik_map(cik_list: Optional[Dict] = None) -> pd.DataFrame:
+    """Ticker -> CIK frame from company_tickers.json (as returned by fetch_files_api.fetch_cik_list)."""
+    if cik_list is None:
+        from fetch_files_api import fetch_cik_list
+        cik_list = fetch_cik_list()
+    frame = pd.DataFrame.from_records(list(cik_list.values()), columns=['cik_str', 'ticker', 'title'])
+    return pd.DataFrame({'Ticker': frame['ticker'].astype(str).str.upper(),
+                         'cik': frame['cik_str'].astype('int64')}).drop_duplicates('Ticker')
+
+
+def fetch_prices(tickers: List[str]) -> pd.Series:
+    """Latest close per ticker from one batched Yahoo download."""
+    import yfinance as yf
+
+    with span('http_request', endpoint='yahoo_download'):
+        data = yf.download(tickers, period='5d', interval='1d', progress=False,
+                           auto_adjust=False, threads=True)
+    if data.empty:
+        return pd.Series(dtype='float64')
+    close = data['Close']
+    if isinstance(close, pd.Series):
+        close = close.to_frame(tickers[0])
+    return close.ffill().iloc[-1].rename('Price')
+
+
+def compute_market_caps(tickers: Iterable[str], shares: pd.DataFrame, ciks: pd.DataFrame,
+                        prices: pd.Series) -> pd.DataFrame:
+    """
+    Market cap for every ticker in one vectorized step: shares outstanding
+    (joined through the CIK map) times price. Tickers without shares or a
+    price get a missing market cap.
+
+    companyfacts share counts are per issuer (all classes summed), while
+    prices are per listed class. Tickers whose CIK has several common
+    listings in the CIK map (GOOG/GOOGL, BRK-A/BRK-B) therefore get no
+    market cap: issuer shares times one class's price would misstate every
+    row and count the company once per class. Preferreds, warrants, units
+    and rights (NON_COMMON_TICKER) do not count as classes and get no
+    market cap themselves. The exchange is not known here and is left N/A.
+    """
+    frame = pd.DataFrame({'Ticker': pd.Series(list(tickers), dtype=str)})
+    frame = frame.merge(ciks, on='Ticker', how='left')
+    frame = frame.merge(shares[['cik', 'shares_outstanding', 'shares_as_of']], on='cik', how='left')
+    frame['Price'] = frame['Ticker'].map(prices).astype('float64')
+    no_cap = _no_market_cap(frame, ciks)
+    market_cap = (frame['shares_outstanding'].astype('float64') * frame['Price']).round().mask(no_cap)
+    return pd.DataFrame({
+        'Ticker': frame['Ticker'],
+        'MarketCap': market_cap.astype('Int64'),
+        # companyfacts share counts are paired with US listing prices
+        'Currency': 'USD',
+        'Market': 'N/A',
+        'SharesOutstanding': frame['shares_outstanding'].astype('Int64'),
+        'Price': frame['Price'],
+        'SharesAsOf': frame['shares_as_of'],
+    }, columns=OUTPUT_COLUMNS)
+
+
+def _no_market_cap(frame: pd.DataFrame, ciks: pd.DataFrame) -> pd.Series:
+    """Rows (Ticker, cik) that are not common stock or belong to an issuer with several common classes."""
+    non_common = frame['Ticker'].str.contains(NON_COMMON_TICKER)
+    common = ciks[~ciks['Ticker'].str.contains(NON_COMMON_TICKER)]
+    multi_class = frame['cik'].map(common['cik'].value_counts()).fillna(0) > 1
+    return non_common | multi_class
+
+
+def market_caps_from_companyfacts(tickers: List[str], zip_path: str = COMPANYFACTS_ZIP,
+                                  cik_list: Optional[Dict] = None,
+                                  price_provider: Callable[[List[str]], pd.Series] = fetch_prices) -> pd.DataFrame:
+    """
+    Market caps for a list of tickers without per-ticker Yahoo info calls.
+
+    Shares come from the bulk companyfacts archive (downloaded if missing),
+    CIKs from company_tickers.json and prices from a single batched pull.
+    """
+    if not os.path.exists(zip_path):
+        download_companyfacts(zip_path)
+    shares = load_shares_outstanding(zip_path, os.path.join(os.path.dirname(zip_path), SHARES_FILE))
+    ciks = cik_map(cik_list)
+    prices = price_provider(list(tickers))
+    with span('parse', step='companyfacts_market_caps'):
+        results = compute_market_caps(tickers, shares, ciks, prices)
+    skipped = _no_market_cap(ciks, ciks) & ciks['Ticker'].isin(results['Ticker'])
+    if skipped.any():
+        print(f"No market cap for {int(skipped.sum())} tickers of multi-class issuers, preferreds, "
+              f"warrants, units and rights (issuer-wide share counts cannot be split by class)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute market caps from the SEC companyfacts archive.")
+    parser.add_argument('--zip', default=COMPANYFACTS_ZIP, help="Local companyfacts.zip (downloaded if missing)")
+    parser.add_argument('--tickers', default='us_stock_tickers.csv', help="Ticker CSV with a 'Ticker' column")
+    parser.add_argument('--output', default='market_data.csv')
+    args = parser.parse_args()
+
+    from get_us_tickers import load_tickers
+    tickers = load_tickers(args.tickers)['Ticker'].dropna().astype(str).tolist()
+    results = market_caps_from_companyfacts(tickers, args.zip)
+    results.to_csv(args.output, index=False)
+    print(f"Market caps for {results['MarketCap'].notna().sum()} of {len(results)} tickers saved to {args.output}")
+
+
+if __name__ == "__main__":
+    with profiled():
+        main()
@@ -0,0 +1,282 @@
+# edgar_client.py
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HTTP_CACHE_DB, HttpCache
+from rate_limiter import DeferredRetries, get_limiter, host_key
+from instrumentation import metrics, span
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from filing_store import FilingStore
+
+# SEC fair-access policy: at most 10 requests per second per client
+SEC_REQUESTS_PER_SECOND = 10
+
+DATA_BASE_URL = "https://data.sec.gov"
+WWW_BASE_URL = "https://www.sec.gov"
+DEFAULT_USER_AGENT = "YourName YourEmail@example.com"
+
+MAX_RETRIES = 5
+MAX_WORKERS = 8
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Parsed JSON documents kept in memory, so a 304 for a recently used URL skips decompressing and parsing
+JSON_LRU_SIZE = 256
+
+
+class RetryableError(Exception):
+    """A request still throttled or failing after all retries; worth retrying later."""
+
+
+def endpoint_name(url: str) -> str:
+    """Short EDGAR endpoint label for metrics."""
+    if url.endswith('companyfacts.zip'):
+        return 'sec_companyfacts'
+    if '/submissions/' in url:
+        return 'sec_submissions'
+    if '/full-index/' in url:
+        return 'sec_full_index'
+    if '/Archives/' in url:
+        return 'sec_archive'
+    if url.endswith('company_tickers.json'):
+        return 'sec_company_tickers'
+    return 'sec_other'
+
+
+class EdgarClient:
+    """
+    EDGAR HTTP client shared by all download workers.
+
+    Uses one requests.Session with a connection pool (HTTP keep-alive), a
+    token bucket capped at the SEC rate limit and shared with every other
+    process talking to the same host (see rate_limiter.AdaptiveRateLimiter),
+    and retries with backoff on 429/5xx responses and connection errors.
+    Throttling lowers the shared rate and pauses all sharers. Base URLs can
+    be pointed at a local stub server for testing.
+
+    JSON documents (company_tickers.json, submissions) go through an HTTP
+    cache (http_cache.HttpCache at cache_path, None to disable): requests
+    carry If-None-Match/If-Modified-Since, a 304 is answered from disk, and
+    the parsed documents are kept in a small in-process LRU.
+    """
+
+    def __init__(self, user_agent: str = DEFAULT_USER_AGENT, rate: float = SEC_REQUESTS_PER_SECOND,
+                 max_retries: int = MAX_RETRIES, pool_size: int = MAX_WORKERS,
+                 data_base_url: str = DATA_BASE_URL, www_base_url: str = WWW_BASE_URL,
+                 timeout: float = 30, cache_path: Optional[str] = HTTP_CACHE_DB,
+                 json_lru_size: int = JSON_LRU_SIZE):
+        self.data_base_url = data_base_url.rstrip('/')
+        self.www_base_url = www_base_url.rstrip('/')
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # No burst allowance: requests are spaced evenly at the SEC limit.
+        # www.sec.gov and data.sec.gov count against the same per-client limit.
+        self.limiter = get_limiter(host_key(self.data_base_url), rate, capacity=1)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": user_agent, "Accept-Encoding": "gzip, deflate"})
+        self.http_cache = HttpCache(cache_path) if cache_path else None
+        self.json_lru_size = json_lru_size
+        self._json_lru: 'OrderedDict[str, Tuple[Tuple, Any]]' = OrderedDict()
+        self._json_lock = threading.Lock()
+        # Concurrent lookups of the same CIK share one submissions request
+        self.submissions_flight = SingleFlight('sec_submissions')
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET a URL under the global rate limit, retrying throttling and server errors.
+
+        Returns the last response; callers check the status code as with requests.get.
+        Connection errors are re-raised once retries are exhausted.
+        """
+        endpoint = endpoint_name(url)
+        for attempt in range(self.max_retries + 1):
+            with span('rate_limit_wait', endpoint='edgar'):
+                self.limiter.acquire()
+            try:
+                with span('http_request', endpoint=endpoint):
+                    response = self.session.get(url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self.limiter.failed()
+                if attempt >= self.max_retries:
+                    raise
+                metrics.incr('retries', endpoint=endpoint)
+                with span('backoff_sleep', endpoint=endpoint):
+                    time.sleep(delay)
+                continue
+            metrics.incr('http_responses', endpoint=endpoint, status=response.status_code)
+            delay = self.limiter.record(response.status_code, response.headers.get("Retry-After"))
+            if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                return response
+            print(f"HTTP {response.status_code} for {url}, retrying in {delay:.1f}s")
+            metrics.incr('retries', endpoint=endpoint)
+            with span('backoff_sleep', endpoint=endpoint):
+                time.sleep(delay)
+        return response
+
+    def get_json(self, url: str) -> Optional[Any]:
+        """
+        GET a JSON document through the HTTP cache; None if the server answers 404.
+
+        Unchanged documents cost a bodyless 304 revalidation. The parsed result
+        may be shared with other callers and must not be modified. Raises
+        RetryableError if the SEC was still throttling or failing after all retries.
+        """
+        endpoint = endpoint_name(url)
+        entry = self.http_cache.lookup(url) if self.http_cache else None
+        response = self.get(url, headers=entry.conditional_headers() if entry else None)
+        if response.status_code == 304 and entry is not None:
+            metrics.incr('http_cache', endpoint=endpoint, result='not_modified')
+            validators = (entry.etag, entry.last_modified)
+            with self._json_lock:
+                cached = self._json_lru.get(url)
+                if cached is not None and cached[0] == validators:
+                    self._json_lru.move_to_end(url)
+                    metrics.incr('http_cache', endpoint=endpoint, result='lru_hit')
+                    return cached[1]
+            with span('parse', step='http_cache_body'):
+                data = json.loads(entry.body())
+        elif response.status_code == 404:
+            return None
+        elif response.status_code in RETRY_STATUSES:
+            raise RetryableError(f"HTTP {response.status_code} for {url}")
+        else:
+            response.raise_for_status()
+            metrics.incr('http_cache', endpoint=endpoint, result='fetched')
+            validators = (response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            body = response.content
+            if self.http_cache:
+                self.http_cache.store(url, body, *validators)
+            data = json.loads(body)
+        with self._json_lock:
+            self._json_lru[url] = (validators, data)
+            self._json_lru.move_to_end(url)
+            while len(self._json_lru) > self.json_lru_size:
+                self._json_lru.popitem(last=False)
+        return data
+
+    def company_tickers(self) -> Dict:
+        """Fetch company_tickers.json (ticker/CIK map for all registrants)."""
+        url = f"{self.www_base_url}/files/company_tickers.json"
+        data = self.get_json(url)
+        if data is None:
+            raise requests.HTTPError(f"404 Not Found for {url}")
+        return data
+
+    def submissions(self, cik: int) -> Optional[Dict]:
+        """
+        Fetch the submissions document for a CIK, or None if the SEC has none.
+        Raises RetryableError (or a connection error) if it could not be fetched.
+        """
+        return self.submissions_flight.do(int(cik), lambda: self._fetch_submissions(cik))
+
+    def _fetch_submissions(self, cik: int) -> Optional[Dict]:
+        try:
+            return self.get_json(f"{self.data_base_url}/submissions/CIK{int(cik):010d}.json")
+        except requests.HTTPError:
+            return None
+
+    def filings(self, cik: int, form: str = "10-K", year: Optional[int] = None) -> List[Tuple[str, str, str]]:
+        """
+        List (accession, form, date) of recent filings of a form, optionally for one year.
+        Raises like submissions() when the lookup itself failed.
+        """
+        data = self.submissions(cik)
+        if not data:
+            return []
+        recent = data.get("filings", {}).get("recent", {})
+        return [
+            (accession, filing_form, date)
+            for accession, filing_form, date in zip(
+                recent.get("accessionNumber", []),
+                recent.get("form", []),
+                recent.get("filingDate", []),
+            )
+            if filing_form == form and (year is None or date.startswith(str(year)))
+        ]
+
+    def download_file(self, url: str, dest: str, chunk_size: int = 1 << 20) -> str:
+        """Stream a (possibly large) file such as a bulk archive to dest; returns dest."""
+        response = self.get(url, stream=True)
+        response.raise_for_status()
+        tmp_path = dest + ".part"
+        with open(tmp_path, "wb") as file:
+            for chunk in response.iter_content(chunk_size):
+                file.write(chunk)
+        os.replace(tmp_path, dest)
+        return dest
+
+    def filing_index_url(self, cik: int, accession_number: str) -> str:
+        accession_number = accession_number.replace("-", "")
+        return (f"{self.www_base_url}/Archives/edgar/data/{int(cik)}/"
+                f"{accession_number}/{accession_number}-index.html")
+
+    def download_filing(self, cik: int, accession_number: str, save_dir: str,
+                        store: Optional['FilingStore'] = None) -> Optional[str]:
+        """
+        Download a filing index page into save_dir, or into a filing_store.FilingStore
+        if given; returns the file path (store:accession/name) or None.
+        Raises RetryableError if the SEC was still throttling or failing after all retries.
+        """
+        url = self.filing_index_url(cik, accession_number)
+        response = self.get(url)
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableError(f"HTTP {response.status_code} for {url}")
+        if response.status_code != 200:
+            print(f"Failed to download: {url}")
+            return None
+        file_name = f"{cik}_{accession_number.replace('-', '')}.html"
+        if store is not None:
+            store.put(accession_number, file_name, io.BytesIO(response.content), cik=str(cik), form="10-K")
+            return f"{store.root}:{accession_number}/{file_name}"
+        file_path = os.path.join(save_dir, file_name)
+        with open(file_path, "wb") as file:
+            file.write(response.content)
+        return file_path
+
+    def download_filings(self, worklist: Iterable[Tuple[int, str]], save_dir: str,
+                         max_workers: int = MAX_WORKERS, store: Optional['FilingStore'] = None) -> List[str]:
+        """
+        Download (cik, accession) pairs concurrently; returns the saved paths.
+
+        Filings that fail because the SEC is throttling or down are deferred and
+        retried after the circuit breaker closes instead of being dropped.
+        """
+        if store is None:
+            os.makedirs(save_dir, exist_ok=True)
+        saved = []
+        deferred = DeferredRetries(self.limiter)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.download_filing, cik, accession, save_dir, store): (cik, accession)
+                       for cik, accession in worklist}
+            for future in as_completed(futures):
+                try:
+                    path = future.result()
+                except (RetryableError, requests.ConnectionError, requests.Timeout) as e:
+                    deferred.add(futures[future], e)
+                    continue
+                except Exception as e:
+                    print(f"Download error: {e}")
+                    continue
+                if path:
+                    print(f"Downloaded: {path}")
+                    saved.append(path)
+        for _, path in deferred.run(lambda key: self.download_filing(key[0], key[1], save_dir, store)):
+            if path:
+                print(f"Downloaded: {path}")
+                saved.append(path)
+        for (cik, accession), error in deferred.failed.items():
+            print(f"Download failed after deferred retries: {cik} {accession}: {error}")
+        return saved
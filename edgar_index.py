@@ -0,0 +1,157 @@
+# edgar_index.py
+import gzip
+import os
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from edgar_client import EdgarClient
+
+# Quarterly EDGAR full index: every filing of the quarter, one line each
+FULL_INDEX_PATH = "/Archives/edgar/full-index/{year}/QTR{quarter}/{kind}.idx"
+QUARTERS = (1, 2, 3, 4)
+# master.idx is pipe-delimited; form.idx is fixed-width and sorted by form type
+INDEX_KINDS = ('master', 'form')
+
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+class IndexEntry(NamedTuple):
+    cik: int
+    company: str
+    form: str
+    date_filed: str
+    accession: str
+
+
+def _accession(file_name: str) -> str:
+    # edgar/data/320193/0000320193-24-000123.txt -> 0000320193-24-000123
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+def _date(value: str) -> str:
+    # Older index files use YYYYMMDD
+    return f"{value[:4]}-{value[4:6]}-{value[6:]}" if len(value) == 8 and value.isdigit() else value
+
+
+def parse_index(lines: Iterable) -> Iterator[IndexEntry]:
+    """
+    Stream entries from the lines of a master.idx or form.idx file (bytes or str).
+
+    The preamble up to the dashed separator line is skipped. master.idx rows
+    are split on '|'; form.idx rows take the form type from its column and
+    CIK, date and file name from the right, so long company names that spill
+    past their column do not shift the other fields.
+    """
+    header = None
+    form_width = None
+    in_body = False
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('latin-1')
+        line = line.rstrip('\r\n')
+        if not in_body:
+            if line.startswith('---'):
+                in_body = True
+                if header and '|' not in header and 'Company Name' in header:
+                    form_width = header.index('Company Name')
+            elif line.strip():
+                header = line
+            continue
+        if form_width is None:
+            parts = line.split('|')
+            if len(parts) != 5 or not parts[0].isdigit():
+                continue
+            cik, company, form, date_filed, file_name = parts
+        else:
+            parts = line[form_width:].rsplit(None, 3)
+            if len(parts) != 4 or not parts[1].isdigit():
+                continue
+            company, cik, date_filed, file_name = parts
+            form = line[:form_width]
+        yield IndexEntry(int(cik), company.strip(), form.strip(), _date(date_filed.strip()),
+                         _accession(file_name.strip()))
+
+
+def _open_local(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _local_paths(source: str, year: int, quarters: Sequence[int], kind: str) -> List[str]:
+    """Index files under a local mirror (<source>/<year>/QTR<q>/<kind>.idx[.gz]), or source itself if a file."""
+    if os.path.isfile(source):
+        return [source]
+    paths = []
+    for quarter in quarters:
+        path = os.path.join(source, str(year), f"QTR{quarter}", f"{kind}.idx")
+        for candidate in (path, path + '.gz'):
+            if os.path.exists(candidate):
+                paths.append(candidate)
+                break
+        else:
+            print(f"No {kind}.idx for {year} QTR{quarter} under {source}")
+    return paths
+
+
+def iter_full_index(year: int, forms: Optional[Iterable[str]] = None, quarters: Sequence[int] = QUARTERS,
+                    client: Optional[EdgarClient] = None, source: Optional[str] = None,
+                    kind: str = 'master') -> Iterator[IndexEntry]:
+    """
+    Stream the full-index entries of a year's quarters, optionally only some forms.
+
+    Files are read from `source` (a local mirror directory or a single index
+    file) if given, otherwise streamed from EDGAR through `client`: one
+    request per quarter, parsed line by line without holding the file in
+    memory. Quarters not published yet (404) are skipped.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"kind must be one of {INDEX_KINDS}")
+    forms = set(forms) if forms is not None else None
+
+    def wanted(entries):
+        return entries if forms is None else (e for e in entries if e.form in forms)
+
+    if source:
+        for path in _local_paths(source, year, quarters, kind):
+            with _open_local(path) as f:
+                yield from wanted(parse_index(f))
+        return
+
+    client = client or EdgarClient()
+    for quarter in quarters:
+        url = client.www_base_url + FULL_INDEX_PATH.format(year=year, quarter=quarter, kind=kind)
+        response = client.get(url, stream=True)
+        if response.status_code == 404:
+            print(f"No full index for {year} QTR{quarter} yet")
+            response.close()
+            continue
+        response.raise_for_status()
+        with response:
+            yield from wanted(parse_index(response.iter_lines(chunk_size=STREAM_CHUNK_SIZE)))
+
+
+def build_form_index(entries: Iterable[IndexEntry]) -> Dict[str, Dict[int, List[Tuple[str, str]]]]:
+    """Index entries as form -> CIK -> [(date_filed, accession)] in filing date order."""
+    index: Dict[str, Dict[int, List[Tuple[str, str]]]] = {}
+    for entry in entries:
+        index.setdefault(entry.form, {}).setdefault(entry.cik, []).append((entry.date_filed, entry.accession))
+    for by_cik in index.values():
+        for filings in by_cik.values():
+            filings.sort()
+    return index
+
+
+def filing_worklist(year: int, forms: Iterable[str] = ('10-K',), ciks: Optional[Set[int]] = None,
+                    client: Optional[EdgarClient] = None, source: Optional[str] = None,
+                    quarters: Sequence[int] = QUARTERS) -> List[Tuple[int, str]]:
+    """
+    (cik, accession) pairs of every filing of `forms` filed in `year`, optionally
+    only for some CIKs; ordered by CIK, then filing date.
+    """
+    entries = iter_full_index(year, forms=forms, quarters=quarters, client=client, source=source)
+    if ciks is not None:
+        entries = (e for e in entries if e.cik in ciks)
+    index = build_form_index(entries)
+    filings = sorted((cik, date_filed, accession) for by_cik in index.values()
+                     for cik, cik_filings in by_cik.items() for date_filed, accession in cik_filings)
+    return [(cik, accession) for cik, _, accession in filings]
@@ -0,0 +1,289 @@
+# fake_api_server.py
+import argparse
+import csv
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from rate_limiter import TokenBucket
+
+# Ticker universe served by the fake endpoints
+MASTER_CSV_FILE = "Master_us_stock_tickers.csv"
+
+EXCHANGES = ['NMS', 'NGM', 'NCM']
+SECTORS = [('Technology', 'Software - Application'), ('Healthcare', 'Biotechnology'),
+           ('Financial Services', 'Banks - Regional'), ('Industrials', 'Specialty Industrial Machinery'),
+           ('Consumer Cyclical', 'Specialty Retail'), ('Energy', 'Oil & Gas E&P')]
+FIRST_CIK = 1000
+
+
+def _company(symbol, name, i):
+    """Deterministic fake fundamentals for one ticker."""
+    seed = zlib.crc32(symbol.encode())
+    sector, industry = SECTORS[seed % len(SECTORS)]
+    return {
+        'symbol': symbol,
+        'longName': name.partition(' - ')[0],
+        'market': 'us_market',
+        'exchange': EXCHANGES[seed % len(EXCHANGES)],
+        'currency': 'USD',
+        'marketCap': (seed % 500000 + 1) * 1000000,
+        'sector': sector,
+        'industry': industry,
+        'cik': FIRST_CIK + i,
+    }
+
+
+class FakeApiServer:
+    """
+    Local HTTP stand-in for the Yahoo Finance and SEC EDGAR endpoints used by the scripts.
+
+    Endpoints:
+        /v1/finance/search?q=...&quotesCount=N       Yahoo search
+        /v7/finance/quote?symbols=A,B,...             Yahoo multi-symbol quote
+        /v10/finance/quoteSummary/<symbol>            Yahoo info for one symbol
+        /files/company_tickers.json                   SEC ticker/CIK map
+        /submissions/CIK##########.json               SEC submissions
+        /Archives/edgar/full-index/<y>/QTR<q>/<kind>.idx  SEC quarterly full index
+        /Archives/edgar/data/<cik>/<acc>/<file>       SEC filing documents
+        /_reset                                       Clear the request counters
+
+    Every response is delayed by `latency` seconds (+/- 50% jitter), fails with
+    HTTP 500 at `error_rate`, and returns HTTP 429 once `rate_limit` requests
+    per second are exceeded. `fail_paths` maps a path to a list of statuses
+    its next requests answer with, one per request, before it is served
+    normally. Requests are counted per endpoint.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, rate_limit=None, host='127.0.0.1', port=0,
+                 tickers_file=MASTER_CSV_FILE, filing_year=None, seed=0, fail_paths=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.filing_year = filing_year or time.localtime().tm_year - 1
+        self.random = random.Random(seed)
+        self.counts = Counter()
+        self.statuses = Counter()
+        self.fail_paths = {path: list(statuses) for path, statuses in (fail_paths or {}).items()}
+        self._lock = threading.Lock()
+
+        with open(tickers_file, newline='', encoding='utf-8') as f:
+            rows = [(row['Ticker'], row['Company Name']) for row in csv.DictReader(f)]
+        self.companies = {symbol: _company(symbol, name, i) for i, (symbol, name) in enumerate(rows)}
+        self.by_cik = {c['cik']: c for c in self.companies.values()}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._handle(self)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self):
+        with self._lock:
+            return {'requests': dict(self.counts), 'statuses': dict(self.statuses),
+                    'total': sum(self.counts.values())}
+
+    def reset_stats(self):
+        with self._lock:
+            self.counts.clear()
+            self.statuses.clear()
+
+    def _send(self, handler, status, body=b'', content_type='application/json', headers=None):
+        with self._lock:
+            if status != 204:
+                self.statuses[status] += 1
+        handler.send_response(status)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            handler.send_header('Retry-After', '1')
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _json(self, handler, payload):
+        # Content-hash ETag; a matching If-None-Match gets an empty 304
+        body = json.dumps(payload).encode()
+        etag = f'"{zlib.crc32(body):08x}"'
+        if handler.headers.get('If-None-Match') == etag:
+            return self._send(handler, 304, headers={'ETag': etag})
+        self._send(handler, 200, body, headers={'ETag': etag})
+
+    def _handle(self, handler):
+        parsed = urlparse(handler.path)
+        path = parsed.path
+        if path == '/_reset':
+            self.reset_stats()
+            return self._send(handler, 204)
+        params = parse_qs(parsed.query)
+        endpoint = self._endpoint(path)
+        with self._lock:
+            self.counts[endpoint] += 1
+            fail = self.random.random() < self.error_rate
+            scripted = self.fail_paths.get(path)
+            scripted = scripted.pop(0) if scripted else None
+            delay = self.latency * self.random.uniform(0.5, 1.5) if self.latency else 0
+
+        if scripted:
+            return self._send(handler, scripted)
+        if self.limiter and not self.limiter.try_acquire():
+            return self._send(handler, 429)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self._send(handler, 500)
+
+        if endpoint == 'yahoo_search':
+            return self._json(handler, self._search(params.get('q', [''])[0],
+                                                    int(params.get('quotesCount', ['5'])[0])))
+        if endpoint == 'yahoo_quote':
+            symbols = params.get('symbols', [''])[0].split(',')
+            result = [self._quote(s) for s in symbols if s in self.companies]
+            return self._json(handler, {'quoteResponse': {'result': result, 'error': None}})
+        if endpoint == 'yahoo_info':
+            company = self.companies.get(unquote(path.rsplit('/', 1)[-1]).upper())
+            if not company:
+                return self._send(handler, 404)
+            info = {k: v for k, v in company.items() if k != 'cik'}
+            return self._json(handler, {'quoteSummary': {'result': [info], 'error': None}})
+        if endpoint == 'sec_company_tickers':
+            return self._json(handler, {
+                str(i): {'cik_str': c['cik'], 'ticker': c['symbol'], 'title': c['longName']}
+                for i, c in enumerate(self.companies.values())})
+        if endpoint == 'sec_submissions':
+            cik = int(path.rsplit('CIK', 1)[-1].split('.')[0])
+            if cik not in self.by_cik:
+                return self._send(handler, 404)
+            return self._json(handler, self._submissions(cik))
+        if endpoint == 'sec_full_index':
+            parts = path.split('/')
+            year, quarter, kind = int(parts[-3]), int(parts[-2][3:]), parts[-1].split('.')[0]
+            return self._send(handler, 200, self._full_index(year, quarter, kind).encode('latin-1'), 'text/plain')
+        if endpoint == 'sec_archive':
+            body = f"<html><body>Filing {path}</body></html>".encode()
+            return self._send(handler, 200, body, 'text/html')
+        return self._send(handler, 404)
+
+    @staticmethod
+    def _endpoint(path):
+        if path.startswith('/v1/finance/search'):
+            return 'yahoo_search'
+        if path.startswith('/v7/finance/quote'):
+            return 'yahoo_quote'
+        if path.startswith('/v10/finance/quoteSummary/'):
+            return 'yahoo_info'
+        if path.endswith('company_tickers.json'):
+            return 'sec_company_tickers'
+        if path.startswith('/submissions/'):
+            return 'sec_submissions'
+        if path.startswith('/Archives/edgar/full-index/'):
+            return 'sec_full_index'
+        if path.startswith('/Archives/'):
+            return 'sec_archive'
+        return 'unknown'
+
+    def _quote(self, symbol):
+        c = self.companies[symbol]
+        return {'symbol': symbol, 'longName': c['longName'], 'market': c['market'],
+                'exchange': c['exchange'], 'currency': c['currency'], 'marketCap': c['marketCap'],
+                'quoteType': 'EQUITY'}
+
+    def _search(self, query, count):
+        query = query.lower()
+        quotes = [
+            {'symbol': c['symbol'], 'longname': c['longName'], 'quoteType': 'EQUITY'}
+            for c in self.companies.values() if query in c['longName'].lower()
+        ][:count]
+        return {'quotes': quotes}
+
+    def _submissions(self, cik):
+        year = self.filing_year
+        accession = f"{cik:010d}-{year % 100:02d}-{cik % 1000000:06d}"
+        return {'cik': str(cik), 'filings': {'recent': {
+            'accessionNumber': [accession, f"{cik:010d}-{(year - 1) % 100:02d}-000001"],
+            'form': ['10-K', '10-K'],
+            'filingDate': [f"{year}-03-01", f"{year - 1}-03-01"],
+            'primaryDocument': ['form10k.htm', 'form10k.htm'],
+        }}}
+
+
+    def _full_index(self, year, quarter, kind):
+        """master.idx / form.idx listing each company's 10-K (Q1, as in _submissions) plus a 10-Q and an 8-K."""
+        rows = []
+        for cik, c in self.by_cik.items():
+            name = c['longName'][:60]
+            if quarter == 1 and year in (self.filing_year, self.filing_year - 1):
+                seq = f"{cik % 1000000:06d}" if year == self.filing_year else "000001"
+                rows.append(('10-K', name, cik, f"{year}-03-01", f"{cik:010d}-{year % 100:02d}-{seq}"))
+            rows.append(('10-Q', name, cik, f"{year}-{quarter * 3:02d}-10", f"{cik:010d}-{year % 100:02d}-9{quarter}0000"))
+            rows.append(('8-K', name, cik, f"{year}-{quarter * 3 - 1:02d}-15", f"{cik:010d}-{year % 100:02d}-8{quarter}0000"))
+        preamble = (f"Description:           Master Index of EDGAR Dissemination Feed\n"
+                    f"Last Data Received:    Quarter {quarter}, {year}\n\n\n")
+        if kind == 'form':
+            rows.sort()
+            lines = [f"{'Form Type':<12}{'Company Name':<62}{'CIK':<12}{'Date Filed':<12}File Name", '-' * 120]
+            lines += [f"{form:<12}{name:<62}{cik:<12}{date:<12}edgar/data/{cik}/{acc}.txt"
+                      for form, name, cik, date, acc in rows]
+        else:
+            lines = ["CIK|Company Name|Form Type|Date Filed|Filename", '-' * 80]
+            lines += [f"{cik}|{name}|{form}|{date}|edgar/data/{cik}/{acc}.txt" for form, name, cik, date, acc in rows]
+        return preamble + '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake Yahoo/EDGAR API server.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests failing with 500")
+    parser.add_argument('--rate-limit', type=float, default=None, help="Requests per second before 429s")
+    args = parser.parse_args()
+
+    server = FakeApiServer(latency=args.latency, error_rate=args.error_rate,
+                           rate_limit=args.rate_limit, port=args.port)
+    print(f"Fake API server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
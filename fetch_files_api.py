@@ -1,6 +1,12 @@
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import requests
+from edgar_client import EdgarClient, RetryableError
+from edgar_index import filing_worklist
+from filing_store import FILING_STORE_DIR, FilingStore
+from instrumentation import profiled, timed
+from rate_limiter import DeferredRetries
 
 # Constants
 BASE_URL = "https://data.sec.gov/submissions/"
@@ -8,64 +14,112 @@ HEADERS = {"User-Agent": "YourName YourEmail@example.com"}
 CURRENT_YEAR = datetime.now().year - 1  # Fetch filings from the previous year
 # Note: Adjust the year as needed for your use case
 SAVE_DIR = "10k_reports"
+MAX_WORKERS = 8  # Concurrent requests; the client still caps the total at 10/s
+FILING_LIMIT = None  # Set to a number to stop after that many filings
+# 'full_index' lists the year's 10-Ks from the four quarterly EDGAR full-index files
+# (a handful of requests); 'submissions' makes one submissions request per CIK
+DISCOVERY = 'full_index'
+FULL_INDEX_SOURCE = None  # Local mirror of full-index/ (or one .idx file) to read instead of EDGAR
+# Save filings into the compressed, deduplicated filing store (filing_store.py) instead of SAVE_DIR
+STORE_DIR = FILING_STORE_DIR  # Set to None to write plain files into SAVE_DIR
 
 # Ensure save directory exists
 os.makedirs(SAVE_DIR, exist_ok=True)
 
+_client = None
+_store = None
+
+def get_client():
+    """Return the shared EDGAR client (pooled session + SEC rate limit)."""
+    global _client
+    if _client is None:
+        _client = EdgarClient(user_agent=HEADERS["User-Agent"], pool_size=MAX_WORKERS)
+    return _client
+
+def get_store():
+    """Return the filing store downloads go to, or None to save plain files."""
+    global _store
+    if _store is None and STORE_DIR:
+        _store = FilingStore(STORE_DIR)
+    return _store
+
 def fetch_cik_list():
     """Fetch a list of CIKs from EDGAR."""
-    url = "https://www.sec.gov/files/company_tickers.json"
-    response = requests.get(url, headers=HEADERS)
-    response.raise_for_status()
-    return response.json()
+    return get_client().company_tickers()
 
+@timed('fetch_10k_filings')
 def fetch_10k_filings(cik):
     """Fetch 10-K filings for a given CIK."""
-    url = f"{BASE_URL}CIK{cik:010d}.json"
-    response = requests.get(url, headers=HEADERS)
-    if response.status_code == 200:
-        data = response.json()
-        filings = data.get("filings", {}).get("recent", {})
-        return [
-            (accession, form, date)
-            for accession, form, date in zip(
-                filings.get("accessionNumber", []),
-                filings.get("form", []),
-                filings.get("filingDate", []),
-            )
-            if form == "10-K" and date.startswith(str(CURRENT_YEAR))
-        ]
-    return []
+    return get_client().filings(cik, form="10-K", year=CURRENT_YEAR)
 
+@timed('download_filing')
 def download_filing(cik, accession_number):
     """Download a filing from EDGAR."""
-    accession_number = accession_number.replace("-", "")
-    url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{accession_number}/{accession_number}-index.html"
-    response = requests.get(url, headers=HEADERS)
-    if response.status_code == 200:
-        file_path = os.path.join(SAVE_DIR, f"{cik}_{accession_number}.html")
-        with open(file_path, "wb") as file:
-            file.write(response.content)
+    file_path = get_client().download_filing(cik, accession_number, SAVE_DIR, get_store())
+    if file_path:
         print(f"Downloaded: {file_path}")
-    else:
-        print(f"Failed to download: {url}")
+    return file_path
 
-def main():
-    cik_list = fetch_cik_list()
-    count = 0
+def build_worklist(cik_list, limit=FILING_LIMIT, max_workers=MAX_WORKERS):
+    """
+    Look up 10-K filings for every CIK concurrently; returns (cik, accession) pairs.
+    CIKs listed under several tickers are looked up once. Lookups that fail
+    because the SEC is throttling or down are deferred and retried once it
+    recovers; a CIK whose lookup still fails, or fails otherwise, is logged
+    and skipped.
+    """
+    # One CIK can have several tickers (share classes)
+    ciks = list(dict.fromkeys(int(cik_info["cik_str"]) for cik_info in cik_list.values()))
+    worklist = []
+    deferred = DeferredRetries(get_client().limiter)
+
+    def add(cik, filings):
+        worklist.extend((cik, accession_number) for accession_number, form, date in filings)
+        return limit is not None and len(worklist) >= limit
 
-    for cik_info in cik_list.values():
-        if count >= 10:  # Limit to 10 filings for demonstration
-            break
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch_10k_filings, cik) for cik in ciks]
+        for cik, future in zip(ciks, futures):
+            try:
+                filings = future.result()
+            except (RetryableError, requests.ConnectionError, requests.Timeout) as e:
+                deferred.add(cik, e)
+                continue
+            except Exception as e:
+                print(f"Could not look up filings for CIK {cik}: {e}")
+                continue
+            if add(cik, filings):
+                # Drop lookups that have not started yet
+                for pending in futures:
+                    pending.cancel()
+                return worklist[:limit]
+    for cik, filings in deferred.run(fetch_10k_filings):
+        if add(cik, filings):
+            return worklist[:limit]
+    for cik, error in deferred.failed.items():
+        print(f"Could not look up filings for CIK {cik} after deferred retries: {error}")
+    return worklist if limit is None else worklist[:limit]
 
-        cik = cik_info["cik_str"]
-        filings = fetch_10k_filings(int(cik))
+def build_worklist_from_index(cik_list=None, year=CURRENT_YEAR, limit=FILING_LIMIT, source=FULL_INDEX_SOURCE):
+    """
+    10-K (cik, accession) pairs filed in `year`, from the EDGAR quarterly full index.
+    Only CIKs in cik_list (as returned by fetch_cik_list) are kept if it is given.
+    """
+    ciks = {int(cik_info["cik_str"]) for cik_info in cik_list.values()} if cik_list is not None else None
+    worklist = filing_worklist(year, forms=("10-K",), ciks=ciks, client=get_client(), source=source)
+    return worklist if limit is None else worklist[:limit]
 
-        for accession_number, form, date in filings:
-            download_filing(cik, accession_number)
-            count += 1
-            if count >= 10:
-                break
+def main(limit=FILING_LIMIT, max_workers=MAX_WORKERS, discovery=DISCOVERY):
+    cik_list = fetch_cik_list()
+    print(f"Looking up {CURRENT_YEAR} 10-K filings for {len(cik_list)} companies...")
+    if discovery == 'full_index':
+        worklist = build_worklist_from_index(cik_list, limit=limit)
+    else:
+        worklist = build_worklist(cik_list, limit=limit, max_workers=max_workers)
+    print(f"Downloading {len(worklist)} filings...")
+    saved = get_client().download_filings(worklist, SAVE_DIR, max_workers=max_workers, store=get_store())
+    print(f"Downloaded {len(saved)} of {len(worklist)} filings to {STORE_DIR or SAVE_DIR}")
 
 if __name__ == "__main__":
-    main()
+    with profiled():
+        main()
@@ -1,8 +1,17 @@
 # fetch_sec_filings.py
 import os
+import threading
 from datetime import datetime, timedelta
+import requests
 from sec_edgar_downloader import Downloader
-import pandas as pd
+from edgar_client import RETRY_STATUSES, SEC_REQUESTS_PER_SECOND, RetryableError
+from rate_limiter import DeferredRetries, get_limiter
+from ticker_universe import get_universe
+from ticker_delta import get_changed_symbols
+from filing_manifest import FilingManifest, MANIFEST_FILE
+from filing_store import FILING_STORE_DIR, FilingStore, store_accession_dir
+from job_runner import JobJournal, Progress, journal_path, shard_keys
+from instrumentation import profiled, span
 
 # --- Configuration ---
 # IMPORTANT: Replace with the actual list of ticker symbols you want to download reports for.
@@ -18,6 +27,14 @@ DOWNLOAD_DIR = "sec_filings"
 # CSV file containing ticker symbols
 CSV_TICKER_FILE = "us_stock_tickers.csv"
 
+# Compressed, deduplicated store (filing_store.py) new filings are moved into; None keeps only the raw tree
+STORE_DIR = FILING_STORE_DIR
+# Set to True to keep the downloaded folders as well after they are stored
+KEEP_RAW_FILINGS = False
+
+# Set to True to only process tickers added or renamed in the latest ticker_delta refresh
+CHANGED_ONLY = False
+
 # Calculate the date range (last 2 years from today)
 END_DATE = datetime.now()
 START_DATE = END_DATE - timedelta(days=2*365)
@@ -27,6 +44,54 @@ start_date_str = START_DATE.strftime('%Y-%m-%d')
 end_date_str = END_DATE.strftime('%Y-%m-%d')
 # --- End Configuration ---
 
+# Same limiter key as edgar_client, so every process talking to the SEC shares one budget
+SEC_LIMITER_KEY = "sec.gov"
+
+# Retryable errors from the downloader's requests in the current thread
+_request_errors = threading.local()
+
+def install_shared_limiter(limiter):
+    """
+    Routes sec_edgar_downloader's HTTP calls through the shared SEC limiter.
+
+    The library only rate-limits within one process and swallows per-filing
+    errors. The wrapper waits on the cross-process bucket before each request,
+    reports the outcome back to it, and records throttling/server errors so
+    download_filings knows a ticker/form is incomplete. Returns False if this
+    version of the library has no such hook.
+    """
+    from sec_edgar_downloader import _sec_gateway
+
+    original = getattr(_sec_gateway, '_call_sec', None)
+    if original is None:
+        return False
+    if getattr(original, 'shared_limiter', None) is limiter:
+        return True
+    original = getattr(original, 'wrapped', original)
+
+    def _call_sec(uri, user_agent, host):
+        limiter.acquire()
+        try:
+            response = original(uri, user_agent, host)
+        except requests.HTTPError as e:
+            response = e.response
+            status = response.status_code if response is not None else 0
+            limiter.record(status, response.headers.get('Retry-After') if response is not None else None)
+            if status in RETRY_STATUSES:
+                _request_errors.__dict__.setdefault('errors', []).append(e)
+            raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            limiter.failed()
+            _request_errors.__dict__.setdefault('errors', []).append(e)
+            raise
+        limiter.succeeded()
+        return response
+
+    _call_sec.wrapped = original
+    _call_sec.shared_limiter = limiter
+    _sec_gateway._call_sec = _call_sec
+    return True
+
 def get_tickers_from_csv(file_path):
     """
     Reads a CSV file and extracts ticker symbols from the 'Ticker' column.
@@ -38,16 +103,15 @@ def get_tickers_from_csv(file_path):
         list: A list of ticker symbols, or None if an error occurs.
     """
     try:
-        df = pd.read_csv(file_path)
-        if 'Ticker' in df.columns:
-            tickers = df['Ticker'].dropna().astype(str).unique().tolist()
-            # Optional: Filter out potential non-standard symbols if needed
-            # tickers = [t for t in tickers if t.isalpha() and len(t) <= 5]
-            print(f"Read {len(tickers)} unique tickers from {file_path}")
-            return tickers
-        else:
-            print(f"Error: 'Ticker' column not found in {file_path}")
-            return None
+        # The universe is memory-mapped and already deduplicated
+        tickers = get_universe(file_path).tickers()
+        # Optional: Filter out potential non-standard symbols if needed
+        # tickers = [t for t in tickers if t.isalpha() and len(t) <= 5]
+        print(f"Read {len(tickers)} unique tickers from {file_path}")
+        return tickers
+    except KeyError:
+        print(f"Error: 'Ticker' column not found in {file_path}")
+        return None
     except FileNotFoundError:
         print(f"Error: Ticker file not found at {file_path}")
         return None
@@ -55,50 +119,144 @@ def get_tickers_from_csv(file_path):
         print(f"An error occurred while reading {file_path}: {e}")
         return None
 
-def download_filings(tickers, filing_types, start_date, end_date, download_dir, user_agent):
+def download_filings(tickers, filing_types, start_date, end_date, download_dir, user_agent, manifest=None,
+                     shard=0, shards=1, resume=True, store=None, keep_raw=KEEP_RAW_FILINGS):
     """
     Downloads specified SEC filings for a list of tickers within a date range.
+
+    Runs incrementally against a local manifest (manifest.sqlite in download_dir):
+    each ticker/form is only asked for filings since its last sync, accessions
+    already on disk are skipped, and progress is saved after every ticker/form
+    so an interrupted run resumes where it stopped.
+
+    Requests share the cross-process SEC limiter with edgar_client. A
+    ticker/form hit by throttling or server errors is not marked synced; it is
+    deferred and retried after the limiter's circuit breaker closes.
+
+    Finished tickers (and their failures) are also checkpointed in a job
+    journal (job_runner.JobJournal), so a restarted run skips them outright
+    and the failure summary covers the whole job, not just the last process.
+    With shards > 1 only this shard's share of the tickers is processed.
+
+    With a filing_store.FilingStore, each new accession folder is moved into
+    the store as soon as it is recorded (kept on disk too if keep_raw); the
+    manifest still lists it, so it is not downloaded again.
     """
     if not os.path.exists(download_dir):
         os.makedirs(download_dir)
         print(f"Created download directory: {download_dir}")
 
+    if manifest is None:
+        manifest = FilingManifest(os.path.join(download_dir, MANIFEST_FILE))
+
     # Initialize the downloader
     # The email address is crucial for EDGAR identification.
     dl = Downloader(user_agent.split(' ')[0], user_agent.split(' ')[2], download_dir)
+    limiter = get_limiter(SEC_LIMITER_KEY, SEC_REQUESTS_PER_SECOND, capacity=1)
+    per_request = install_shared_limiter(limiter)
+    deferred = DeferredRetries(limiter)
+
+    def sync(ticker, filing_type):
+        """Download one ticker/form; returns the number of new filings."""
+        last_sync = manifest.last_sync(ticker, filing_type)
+        if last_sync and last_sync >= end_date:
+            print(f"  {filing_type} filings for {ticker} already synced through {last_sync}.")
+            return 0
+        # Only ask for filings since the last sync (inclusive, known accessions are skipped)
+        after = max(start_date, last_sync) if last_sync else start_date
+        _request_errors.errors = []
+        if not per_request:
+            limiter.acquire()
+        try:
+            # Download filings for the specific type and date range
+            # Set download_details=True to get metadata about downloads
+            with span('edgar_downloader_get', form=filing_type):
+                num_downloaded = dl.get(filing_type, ticker, after=after, before=end_date, download_details=True,
+                                        accession_numbers_to_skip=manifest.accessions(ticker, filing_type))
+        except requests.HTTPError as e:
+            if not per_request and e.response is not None:
+                limiter.record(e.response.status_code, e.response.headers.get('Retry-After'))
+            if e.response is not None and e.response.status_code in RETRY_STATUSES:
+                raise RetryableError(str(e)) from e
+            raise
+
+        if num_downloaded > 0:
+            print(f"  Successfully downloaded {num_downloaded} {filing_type} filing(s) for {ticker}.")
+        else:
+            print(f"  No new {filing_type} filings found for {ticker} since {after}.")
+
+        added = manifest.scan_downloads(download_dir, ticker, filing_type)
+        if store is not None and added:
+            added = set(added)
+            for filing in manifest.filings(ticker):
+                if filing['accession'] in added and filing['form'] == filing_type:
+                    store_accession_dir(store, filing['path'], filing['accession'], remove=not keep_raw,
+                                        ticker=ticker, cik=filing['cik'], form=filing_type,
+                                        filing_date=filing['filing_date'])
+        if _request_errors.errors:
+            # Some filings were dropped by the library; keep the form unsynced and retry it
+            raise RetryableError(f"{len(_request_errors.errors)} request(s) failed: {_request_errors.errors[-1]}")
+        manifest.mark_synced(ticker, filing_type, end_date)
+        return num_downloaded
+
+    tickers = shard_keys(tickers, shard, shards)
+    journal = JobJournal(journal_path('sec_filings', shard, shards),
+                         params={'forms': list(filing_types), 'start': start_date, 'end': end_date,
+                                 'dir': os.path.abspath(download_dir)},
+                         resume=resume)
+    todo = journal.pending(tickers)
+    progress = Progress(len(tickers), done=len(tickers) - len(todo), label='sec filings')
+
+    def finish(ticker, downloaded, failed):
+        journal.record(ticker, {'downloaded': downloaded, 'failed': failed}, status='failed' if failed else 'ok')
 
     print(f"Starting download process for filings between {start_date} and {end_date}.")
     print(f"User Agent: {user_agent}")
-    print(f"Tickers: {', '.join(tickers)}")
+    print(f"Tickers: {', '.join(todo)}")
     print(f"Filing Types: {', '.join(filing_types)}")
     print("-" * 30)
 
     total_downloaded = 0
-    failed_tickers = {}
-
-    for ticker in tickers:
-        print(f"\nProcessing ticker: {ticker}")
-        ticker_failed_filings = []
-        ticker_download_count = 0
-        for filing_type in filing_types:
-            try:
-                # Download filings for the specific type and date range
-                # Set download_details=True to get metadata about downloads
-                num_downloaded = dl.get(filing_type, ticker, after=start_date, before=end_date, download_details=True)
-
-                if num_downloaded > 0:
-                    print(f"  Successfully downloaded {num_downloaded} {filing_type} filing(s) for {ticker}.")
-                    ticker_download_count += num_downloaded
-                else:
-                    print(f"  No {filing_type} filings found for {ticker} in the specified date range.")
-
-            except Exception as e:
-                print(f"  ERROR downloading {filing_type} for {ticker}: {e}")
-                ticker_failed_filings.append(filing_type)
-
-        if ticker_failed_filings:
-            failed_tickers[ticker] = ticker_failed_filings
-        total_downloaded += ticker_download_count
+    # Tickers with deferred forms are journaled once those have been retried
+    waiting = {}
+
+    try:
+        for ticker in todo:
+            print(f"\nProcessing ticker: {ticker}")
+            ticker_failed_filings = []
+            ticker_download_count = 0
+            ticker_deferred = False
+            for filing_type in filing_types:
+                try:
+                    ticker_download_count += sync(ticker, filing_type)
+                except RetryableError as e:
+                    print(f"  {filing_type} for {ticker} deferred: {e}")
+                    deferred.add((ticker, filing_type), e)
+                    ticker_deferred = True
+                except Exception as e:
+                    print(f"  ERROR downloading {filing_type} for {ticker}: {e}")
+                    ticker_failed_filings.append(filing_type)
+
+            total_downloaded += ticker_download_count
+            if ticker_deferred:
+                waiting[ticker] = [ticker_download_count, ticker_failed_filings]
+            else:
+                finish(ticker, ticker_download_count, ticker_failed_filings)
+            progress.update()
+
+        for (ticker, filing_type), num_downloaded in deferred.run(lambda key: sync(*key)):
+            total_downloaded += num_downloaded
+            waiting[ticker][0] += num_downloaded
+        for ticker, filing_type in deferred.failed:
+            waiting[ticker][1].append(filing_type)
+        for ticker, (downloaded, failed) in waiting.items():
+            finish(ticker, downloaded, failed)
+    finally:
+        journal.close()
+
+    failed_tickers = {ticker: value['failed'] for ticker, value in journal.results('failed').items()}
+    if not failed_tickers and not journal.pending(tickers):
+        journal.complete()
 
     print("\n" + "=" * 30)
     print("Download process finished.")
@@ -110,18 +268,20 @@ def download_filings(tickers, filing_types, start_date, end_date, download_dir,
     print("=" * 30)
 
 if __name__ == "__main__":
-    # Get tickers from CSV file
-    ticker_list = get_tickers_from_csv(CSV_TICKER_FILE)
+    # Get tickers from CSV file (or only the ones that changed since the last refresh)
+    ticker_list = get_changed_symbols() if CHANGED_ONLY else get_tickers_from_csv(CSV_TICKER_FILE)
 
     if ticker_list:
         filing_types_to_download = ["10-K", "10-Q"]
-        download_filings(
-            ticker_list, # Use the list read from CSV
-            filing_types_to_download,
-            start_date_str,
-            end_date_str,
-            DOWNLOAD_DIR,
-            USER_AGENT
-        )
+        with profiled():
+            download_filings(
+                ticker_list, # Use the list read from CSV
+                filing_types_to_download,
+                start_date_str,
+                end_date_str,
+                DOWNLOAD_DIR,
+                USER_AGENT,
+                store=FilingStore(STORE_DIR) if STORE_DIR else None
+            )
     else:
         print("Exiting: Could not retrieve ticker symbols from CSV.")
\ No newline at end of file
@@ -0,0 +1,164 @@
+# filing_manifest.py
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Set
+
+# Manifest file name, stored inside the filings download directory
+MANIFEST_FILE = "manifest.sqlite"
+
+# Folder layout written by sec_edgar_downloader:
+# <download_dir>/sec-edgar-filings/<ticker>/<form>/<accession>/full-submission.txt
+ROOT_SAVE_FOLDER = "sec-edgar-filings"
+FULL_SUBMISSION_FILE = "full-submission.txt"
+
+# Header lines to scan for filing metadata before giving up
+HEADER_SCAN_LINES = 300
+
+# One row per downloaded (ticker, form, accession)
+FILINGS_TABLE = """
+    CREATE TABLE IF NOT EXISTS filings (
+        accession TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        cik TEXT,
+        form TEXT NOT NULL,
+        filing_date TEXT,
+        path TEXT NOT NULL,
+        recorded_at REAL NOT NULL,
+        PRIMARY KEY (ticker, form, accession)
+    );
+"""
+
+
+def read_submission_header(file_path: str) -> Dict[str, str]:
+    """
+    Read CIK, form and filing date from the SEC header of a full-submission file.
+
+    Only the header block at the top of the file is read.
+
+    Returns:
+        dict: 'cik', 'form' and 'filing_date' (YYYY-MM-DD) where found
+    """
+    header = {}
+    with open(file_path, 'r', encoding='latin-1') as f:
+        for i, line in enumerate(f):
+            if i >= HEADER_SCAN_LINES or line.startswith('</SEC-HEADER>'):
+                break
+            key, _, value = line.strip().partition(':')
+            value = value.strip()
+            if key == 'CONFORMED SUBMISSION TYPE':
+                header['form'] = value
+            elif key == 'FILED AS OF DATE' and len(value) == 8:
+                header['filing_date'] = f"{value[:4]}-{value[4:6]}-{value[6:]}"
+            elif key == 'CENTRAL INDEX KEY' and 'cik' not in header:
+                # The first CIK in the header belongs to the filer
+                header['cik'] = value.lstrip('0')
+    return header
+
+
+class FilingManifest:
+    """
+    SQLite record of the filings already on disk and how far each ticker has been synced.
+
+    filings holds one row per downloaded (ticker, form, accession), since a
+    filing shared by several tickers (GOOG/GOOGL) is downloaded once for
+    each; sync_state holds the date through which each (ticker, form) pair
+    has been fetched, updated after every pair so an interrupted run resumes
+    where it stopped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(FILINGS_TABLE + """
+            CREATE TABLE IF NOT EXISTS sync_state (
+                ticker TEXT NOT NULL,
+                form TEXT NOT NULL,
+                synced_through TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (ticker, form)
+            );
+        """)
+        self._conn.commit()
+        self._migrate_filings_key()
+
+    def _migrate_filings_key(self):
+        """Re-key manifests written when filings was keyed on accession alone."""
+        columns = self._conn.execute("PRAGMA table_info(filings)").fetchall()
+        key = [name for _, name, _, _, _, pk in sorted(columns, key=lambda column: column[5]) if pk]
+        if key != ['accession']:
+            return
+        with self._conn:
+            self._conn.execute("DROP INDEX IF EXISTS filings_ticker_form")
+            self._conn.execute("ALTER TABLE filings RENAME TO filings_old")
+            self._conn.execute(FILINGS_TABLE)
+            self._conn.execute(
+                "INSERT INTO filings SELECT accession, ticker, cik, form, filing_date, path, recorded_at "
+                "FROM filings_old")
+            self._conn.execute("DROP TABLE filings_old")
+
+    def accessions(self, ticker: str, form: str) -> Set[str]:
+        """Accession numbers already recorded for a ticker and form."""
+        rows = self._conn.execute(
+            "SELECT accession FROM filings WHERE ticker = ? AND form = ?", (ticker, form))
+        return {row[0] for row in rows}
+
+    def last_sync(self, ticker: str, form: str) -> Optional[str]:
+        """Date (YYYY-MM-DD) through which a ticker/form was last synced, or None."""
+        row = self._conn.execute(
+            "SELECT synced_through FROM sync_state WHERE ticker = ? AND form = ?",
+            (ticker, form)).fetchone()
+        return row[0] if row else None
+
+    def mark_synced(self, ticker: str, form: str, through_date: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_state (ticker, form, synced_through, synced_at) "
+            "VALUES (?, ?, ?, ?)", (ticker, form, through_date, time.time()))
+        self._conn.commit()
+
+    def record_filing(self, accession: str, ticker: str, form: str, path: str,
+                      cik: Optional[str] = None, filing_date: Optional[str] = None):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO filings (accession, ticker, cik, form, filing_date, path, recorded_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (accession, ticker, cik, form, filing_date, path, time.time()))
+        self._conn.commit()
+
+    def scan_downloads(self, download_dir: str, ticker: str, form: str) -> List[str]:
+        """
+        Record accession folders on disk that are not in the manifest yet.
+
+        Returns:
+            list: Newly recorded accession numbers
+        """
+        form_dir = os.path.join(download_dir, ROOT_SAVE_FOLDER, ticker, form)
+        if not os.path.isdir(form_dir):
+            return []
+        known = self.accessions(ticker, form)
+        added = []
+        for accession in sorted(os.listdir(form_dir)):
+            if accession in known:
+                continue
+            accession_dir = os.path.join(form_dir, accession)
+            submission = os.path.join(accession_dir, FULL_SUBMISSION_FILE)
+            if not os.path.isfile(submission):
+                continue
+            header = read_submission_header(submission)
+            self.record_filing(accession, ticker, form, accession_dir,
+                               cik=header.get('cik'), filing_date=header.get('filing_date'))
+            added.append(accession)
+        return added
+
+    def filings(self, ticker: Optional[str] = None) -> List[Dict]:
+        """All recorded filings, optionally for one ticker."""
+        query = "SELECT accession, ticker, cik, form, filing_date, path FROM filings"
+        params = ()
+        if ticker is not None:
+            query += " WHERE ticker = ?"
+            params = (ticker,)
+        columns = ['accession', 'ticker', 'cik', 'form', 'filing_date', 'path']
+        rows = self._conn.execute(query + " ORDER BY filing_date, accession, ticker", params)
+        return [dict(zip(columns, row)) for row in rows]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,473 @@
+# filing_parser.py
+import argparse
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from html.parser import HTMLParser
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from filing_manifest import FULL_SUBMISSION_FILE, MANIFEST_FILE, FilingManifest
+from filing_store import FILING_STORE_DIR, INDEX_FILE, FilingStore
+from instrumentation import profiled, span
+
+# Directories written by fetch_sec_filings.py and fetch_files_api.py
+SEC_FILINGS_DIR = "sec_filings"
+REPORTS_DIR = "10k_reports"
+
+# Columnar output, one row per parsed filing
+FACTS_FILE = "filing_facts.parquet"
+
+# Bytes fed to the parser at a time; whole documents are never held in memory
+READ_CHUNK_SIZE = 1 << 20
+
+# Rows collected before the facts file is rewritten, so a long run keeps its progress
+FLUSH_EVERY = 500
+
+# Documents inside a full-submission file that are parsed, besides the main form document
+SUBMISSION_START = "<SEC-DOCUMENT>"
+PARSED_DOCUMENT_TYPES = {'10-K', '10-K/A', '10-Q', '10-Q/A', 'EX-101.INS'}
+
+# Facts extracted and the XBRL concepts they come from, in order of preference
+CONCEPTS = {
+    'shares_outstanding': ['dei:entitycommonstocksharesoutstanding'],
+    'revenue': ['us-gaap:revenues',
+                'us-gaap:revenuefromcontractwithcustomerexcludingassessedtax',
+                'us-gaap:revenuefromcontractwithcustomerincludingassessedtax',
+                'us-gaap:salesrevenuenet'],
+    'net_income': ['us-gaap:netincomeloss', 'us-gaap:profitloss'],
+    'total_assets': ['us-gaap:assets'],
+    'stockholders_equity': ['us-gaap:stockholdersequity'],
+    'eps_basic': ['us-gaap:earningspersharebasic'],
+}
+FACT_COLUMNS = list(CONCEPTS)
+CONCEPT_FIELDS = {concept: field for field, concepts in CONCEPTS.items() for concept in concepts}
+
+# Cover page fallback for filings without XBRL, e.g. "15,204,137,000 shares of common stock"
+SHARES_TEXT_PATTERN = re.compile(
+    r"(\d{1,3}(?:,\d{3}){2,})\s+shares\s+of\s+(?:the\s+registrant'?s\s+)?common\s+stock", re.I)
+# Text kept from the previous data chunk so the pattern can match across chunk boundaries
+TEXT_TAIL = 200
+
+SCHEMA = pa.schema([
+    ('ticker', pa.string()),
+    ('accession', pa.string()),
+    ('cik', pa.string()),
+    ('form', pa.dictionary(pa.int8(), pa.string())),
+    ('filing_date', pa.string()),
+    ('period_end', pa.string()),
+    ('shares_outstanding', pa.int64()),
+    ('revenue', pa.int64()),
+    ('net_income', pa.int64()),
+    ('total_assets', pa.int64()),
+    ('stockholders_equity', pa.int64()),
+    ('eps_basic', pa.float64()),
+    ('source', pa.dictionary(pa.int8(), pa.string())),
+    ('path', pa.string()),
+    ('size', pa.int64()),
+    ('mtime', pa.float64()),
+    ('checksum', pa.string()),
+])
+
+INT_FIELDS = {'shares_outstanding', 'revenue', 'net_income', 'total_assets', 'stockholders_equity'}
+
+
+def _parse_number(text: str, attrs: Dict[str, str]) -> Optional[float]:
+    """Numeric value of an inline XBRL fact, applying its format, scale and sign."""
+    fmt = attrs.get('format', '')
+    text = text.strip()
+    if 'zero' in fmt or text in ('-', '—', '–'):
+        return 0.0
+    if 'comma' in fmt and 'decimal' in fmt and fmt.index('comma') < fmt.index('decimal'):
+        # ixt:num-comma-decimal: 1.234,56
+        text = text.replace('.', '').replace(' ', '').replace(',', '.')
+    text = re.sub(r"[^\d.]", '', text)
+    if not text or text == '.':
+        return None
+    value = float(text) * 10 ** int(attrs.get('scale') or 0)
+    return -value if attrs.get('sign') == '-' else value
+
+
+def _period_days(start: Optional[str], end: str) -> int:
+    try:
+        return (date.fromisoformat(end) - date.fromisoformat(start)).days if start else 0
+    except ValueError:
+        return 0
+
+
+class FactParser(HTMLParser):
+    """
+    Incremental parser for filing documents: HTML/inline XBRL, XBRL instances and
+    full-submission text files.
+
+    Feed it the document in chunks. It keeps only the contexts and the facts
+    for CONCEPTS, plus a short text tail for the cover page fallback.
+    """
+
+    def __init__(self, form: str = ''):
+        super().__init__(convert_charrefs=True)
+        self.form = form.upper()
+        self.contexts = {}           # id -> {'start', 'end', 'dimensional'}
+        self.facts = []              # (field, rank, context_id, value)
+        self.text_shares = None
+        self._context = None
+        self._context_field = None
+        self._fact = None            # [tag, field, rank, attrs, text parts]
+        self._tail = ''
+
+    def handle_starttag(self, tag, attrs):
+        if self._fact is not None:
+            return
+        name = tag.rpartition(':')[2]
+        if name == 'context':
+            self._context = {'id': dict(attrs).get('id'), 'start': None, 'end': None, 'dimensional': False}
+        elif self._context is not None:
+            if name in ('startdate', 'enddate', 'instant'):
+                self._context_field = name
+            elif name in ('segment', 'scenario'):
+                self._context['dimensional'] = True
+        elif tag == 'ix:nonfraction':
+            attrs = dict(attrs)
+            concept = (attrs.get('name') or '').lower()
+            if concept in CONCEPT_FIELDS:
+                self._start_fact(tag, concept, attrs)
+        elif tag in CONCEPT_FIELDS:
+            # XBRL instance document: the tag itself names the concept
+            self._start_fact(tag, tag, dict(attrs))
+
+    def _start_fact(self, tag, concept, attrs):
+        field = CONCEPT_FIELDS[concept]
+        self._fact = [tag, field, CONCEPTS[field].index(concept), attrs, []]
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing tags never carry a value (e.g. xsi:nil facts)
+        if self._fact is None and self._context is not None and tag.rpartition(':')[2] in ('segment', 'scenario'):
+            self._context['dimensional'] = True
+
+    def handle_endtag(self, tag):
+        if self._fact is not None:
+            if tag != self._fact[0]:
+                return
+            _, field, rank, attrs, parts = self._fact
+            self._fact = None
+            value = _parse_number(''.join(parts), attrs)
+            if value is not None:
+                context = attrs.get('contextref')
+                self.facts.append((field, rank, context, value))
+            return
+        if self._context is not None:
+            name = tag.rpartition(':')[2]
+            if name == 'context':
+                self.contexts[self._context['id']] = self._context
+                self._context = None
+            elif name == self._context_field:
+                self._context_field = None
+
+    def handle_data(self, data):
+        if self._fact is not None:
+            self._fact[4].append(data)
+            return
+        if self._context is not None and self._context_field:
+            key = 'start' if self._context_field == 'startdate' else 'end'
+            self._context[key] = (self._context[key] or '') + data.strip()
+            return
+        if self.text_shares is None:
+            text = self._tail + ' ' + ' '.join(data.split())
+            match = SHARES_TEXT_PATTERN.search(text)
+            if match:
+                self.text_shares = int(match.group(1).replace(',', ''))
+            self._tail = text[-TEXT_TAIL:]
+
+    def _pick(self, field):
+        """Best value for a field: non-dimensional context, latest period, preferred concept."""
+        annual = self.form.startswith('10-K')
+        best_key, best_value = None, None
+        for fact_field, rank, context_id, value in self.facts:
+            if fact_field != field:
+                continue
+            context = self.contexts.get(context_id)
+            if context is None or context['dimensional']:
+                continue
+            end = context['end'] or ''
+            # For durations a 10-K wants the longest period ending last, a 10-Q the shortest
+            days = _period_days(context['start'], end)
+            key = (end, days if annual else -days, -rank)
+            if best_key is None or key > best_key:
+                best_key, best_value = key, value
+        return best_value, (best_key[0] if best_key else None)
+
+    def results(self) -> Dict:
+        """Extracted facts plus the period end date and where they came from."""
+        row = {}
+        period_end = None
+        for field in FACT_COLUMNS:
+            value, end = self._pick(field)
+            if value is not None:
+                row[field] = value
+            if end and field in ('revenue', 'net_income', 'total_assets') and (period_end is None or end > period_end):
+                period_end = end
+        source = 'xbrl' if row else None
+        if 'shares_outstanding' not in row and self.text_shares is not None:
+            row['shares_outstanding'] = self.text_shares
+            source = source or 'text'
+        row['period_end'] = period_end
+        row['source'] = source
+        return row
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _document_chunks(f, form: str):
+    """
+    Yield the text worth parsing in READ_CHUNK_SIZE pieces.
+
+    A full-submission file bundles the main document with exhibits, XBRL
+    linkbases, spreadsheets and uuencoded images. Only the main form document
+    and the XBRL instance carry the facts, so everything else is skipped line
+    by line without reaching the HTML parser. Plain HTML files are passed through.
+    """
+    first = f.readline()
+    full_submission = first.startswith(SUBMISSION_START)
+    keep = not full_submission
+    buffer, size = ([] if full_submission else [first]), len(first)
+    for line in f:
+        if full_submission:
+            if line.startswith('<TYPE>'):
+                doc_type = line[6:].strip().upper()
+                keep = doc_type in PARSED_DOCUMENT_TYPES or doc_type == form.upper()
+                continue
+            if line.startswith('</DOCUMENT>'):
+                keep = False
+        if keep:
+            buffer.append(line)
+            size += len(line)
+            if size >= READ_CHUNK_SIZE:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def parse_stream(f, form: str = '') -> Dict:
+    """Stream an open text file object through FactParser and return its facts."""
+    parser = FactParser(form)
+    for chunk in _document_chunks(f, form):
+        parser.feed(chunk)
+    parser.close()
+    return parser.results()
+
+
+def parse_filing(path: str, form: str = '') -> Dict:
+    """Stream one filing document through FactParser and return its facts."""
+    with open(path, 'r', encoding='latin-1') as f:
+        return parse_stream(f, form)
+
+
+# Filing stores opened by this (worker) process, by root
+_stores: Dict[str, FilingStore] = {}
+
+
+def _open_store(root: str) -> FilingStore:
+    if root not in _stores:
+        _stores[root] = FilingStore(root)
+    return _stores[root]
+
+
+def _stat(task: Dict):
+    """(size, mtime) of a task's document; stored documents carry theirs from the store index."""
+    if task.get('store'):
+        return task['size'], task['mtime']
+    stat = os.stat(task['path'])
+    return stat.st_size, stat.st_mtime
+
+
+def _parse_task(task: Dict) -> Dict:
+    """
+    Worker entry point: checksum the file, then parse it unless the checksum is unchanged.
+
+    Documents in the filing store already have their checksum in the index
+    and are decompressed on the fly while parsing.
+
+    Returns the output row, or None when the stored row is still valid.
+    """
+    path = task['path']
+    size, mtime = _stat(task)
+    checksum = task['digest'] if task.get('store') else file_checksum(path)
+    if checksum == task.get('known_checksum'):
+        return {'accession': task['accession'], 'unchanged': True, 'size': size, 'mtime': mtime}
+    with span('parse', step='filing'):
+        if task.get('store'):
+            with _open_store(task['store']).open_text(task['accession'], task['name']) as f:
+                facts = parse_stream(f, task.get('form') or '')
+        else:
+            facts = parse_filing(path, task.get('form') or '')
+    row = {column: task.get(column) for column in ('ticker', 'accession', 'cik', 'form', 'filing_date')}
+    row.update(facts)
+    row.update(path=path, size=size, mtime=mtime, checksum=checksum)
+    return row
+
+
+def discover_filings(sec_dir: str = SEC_FILINGS_DIR, reports_dir: str = REPORTS_DIR,
+                     store_dir: str = FILING_STORE_DIR) -> List[Dict]:
+    """
+    Filing documents on disk: full submissions recorded in the fetch_sec_filings
+    manifest and the pages saved by fetch_files_api (named <cik>_<accession>.html),
+    plus the same documents moved into the filing store at store_dir.
+    """
+    tasks = []
+    manifest_path = os.path.join(sec_dir, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        manifest = FilingManifest(manifest_path)
+        seen = set()
+        try:
+            for filing in manifest.filings():
+                path = os.path.join(filing['path'], FULL_SUBMISSION_FILE)
+                # Facts are kept per accession: a filing shared by several tickers is parsed once
+                if os.path.isfile(path) and filing['accession'] not in seen:
+                    seen.add(filing['accession'])
+                    tasks.append({'ticker': filing['ticker'], 'accession': filing['accession'],
+                                  'cik': filing['cik'], 'form': filing['form'],
+                                  'filing_date': filing['filing_date'], 'path': path})
+        finally:
+            manifest.close()
+    if os.path.isdir(reports_dir):
+        for file_name in sorted(os.listdir(reports_dir)):
+            cik, _, rest = file_name.partition('_')
+            accession = os.path.splitext(rest)[0]
+            if not rest or not cik.isdigit():
+                continue
+            if len(accession) == 18:
+                accession = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
+            tasks.append({'ticker': None, 'accession': accession, 'cik': cik, 'form': '10-K',
+                          'filing_date': None, 'path': os.path.join(reports_dir, file_name)})
+    if os.path.exists(os.path.join(store_dir, INDEX_FILE)):
+        on_disk = {task['accession'] for task in tasks}
+        store = FilingStore(store_dir)
+        try:
+            for doc in store.documents():
+                # Full submissions and report pages; primary documents are part of the full submission
+                if doc['accession'] in on_disk or not (doc['name'] == FULL_SUBMISSION_FILE or
+                                                       doc['name'].partition('_')[0].isdigit()):
+                    continue
+                tasks.append({'ticker': doc['ticker'], 'accession': doc['accession'], 'cik': doc['cik'],
+                              'form': doc['form'] or '10-K', 'filing_date': doc['filing_date'],
+                              'path': f"{store_dir}:{doc['accession']}/{doc['name']}", 'store': store_dir,
+                              'name': doc['name'], 'size': doc['size'], 'mtime': doc['stored_at'],
+                              'digest': doc['digest']})
+        finally:
+            store.close()
+    return tasks
+
+
+def _to_table(rows: List[Dict]) -> pa.Table:
+    frame = pd.DataFrame(rows, columns=SCHEMA.names)
+    for column in INT_FIELDS:
+        frame[column] = pd.to_numeric(frame[column]).round().astype('Int64')
+    return pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+
+def load_facts(facts_file: str = FACTS_FILE) -> pd.DataFrame:
+    """Parsed filing facts, one row per ticker/accession."""
+    if not os.path.exists(facts_file):
+        return _to_table([]).to_pandas()
+    return pq.read_table(facts_file, memory_map=True).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def _write_facts(existing: Optional[pa.Table], rows: List[Dict], touched: Dict[str, Dict], facts_file: str):
+    """Merge new rows (replacing their accessions) into the facts file and write it atomically."""
+    table = _to_table(rows)
+    if existing is not None:
+        replaced = pc.is_in(existing['accession'], value_set=pa.array(list(touched) or [''], pa.string()))
+        kept = existing.filter(pc.invert(replaced))
+        table = pa.concat_tables([kept, table]).unify_dictionaries()
+    table = table.sort_by([('ticker', 'ascending'), ('accession', 'ascending')])
+    tmp_path = facts_file + ".tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, facts_file)
+    return table
+
+
+def extract_facts(tasks: Optional[List[Dict]] = None, facts_file: str = FACTS_FILE,
+                  workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Parse filings across a process pool (one worker per core by default).
+
+    Filings whose path, size and modification time (for stored filings, the
+    time they were stored) match the facts file are skipped outright;
+    otherwise the worker checksums the file and only parses it when the
+    checksum changed.
+
+    Returns:
+        pandas.DataFrame: All rows of the facts file after the run
+    """
+    tasks = discover_filings() if tasks is None else tasks
+    existing = pq.read_table(facts_file).cast(SCHEMA) if os.path.exists(facts_file) else None
+    known = {}
+    if existing is not None:
+        for row in existing.select(['accession', 'path', 'size', 'mtime', 'checksum']).to_pylist():
+            known[row['accession']] = row
+
+    pending = []
+    for task in tasks:
+        previous = known.get(task['accession'])
+        if previous and previous['path'] == task['path']:
+            try:
+                size, mtime = _stat(task)
+            except OSError:
+                continue
+            if size == previous['size'] and mtime == previous['mtime']:
+                continue
+            task = dict(task, known_checksum=previous['checksum'])
+        pending.append(task)
+    print(f"{len(tasks) - len(pending)} of {len(tasks)} filings already parsed; parsing {len(pending)}...")
+
+    rows, touched, parsed = [], {}, 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            for row in executor.map(_parse_task, pending, chunksize=4):
+                if row.get('unchanged'):
+                    # Same content, new mtime: keep the facts and refresh the stat fields
+                    previous = existing.filter(pc.equal(existing['accession'], row['accession'])).to_pylist()[0]
+                    previous.update(size=row['size'], mtime=row['mtime'])
+                    row = previous
+                else:
+                    parsed += 1
+                rows.append(row)
+                touched[row['accession']] = row
+                if len(rows) % FLUSH_EVERY == 0:
+                    existing = _write_facts(existing, rows, touched, facts_file)
+                    rows, touched = [], {}
+        existing = _write_facts(existing, rows, touched, facts_file)
+    print(f"Parsed {parsed} filings into {facts_file}")
+    return load_facts(facts_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract key financial facts from downloaded filings.")
+    parser.add_argument('--sec-dir', default=SEC_FILINGS_DIR)
+    parser.add_argument('--reports-dir', default=REPORTS_DIR)
+    parser.add_argument('--store-dir', default=FILING_STORE_DIR)
+    parser.add_argument('--output', default=FACTS_FILE)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    tasks = discover_filings(args.sec_dir, args.reports_dir, args.store_dir)
+    facts = extract_facts(tasks, args.output, args.workers)
+    print(facts[['ticker', 'accession', 'form', 'period_end'] + FACT_COLUMNS].tail(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    with profiled():
+        main()
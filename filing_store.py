@@ -0,0 +1,435 @@
+# filing_store.py
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from typing import BinaryIO, Dict, Iterable, List, Optional, TextIO, Tuple, Union
+
+import zstandard
+
+from filing_manifest import FULL_SUBMISSION_FILE, MANIFEST_FILE, FilingManifest
+
+# Store layout: <root>/index.sqlite plus <root>/blobs/<hh>/<sha256>.zst for large parts
+FILING_STORE_DIR = "filing_store"
+INDEX_FILE = "index.sqlite"
+BLOB_DIR = "blobs"
+
+# zstd level for stored parts; 9 compresses filing text about 8-10x at tens of MB/s
+ZSTD_LEVEL = 9
+
+# Parts up to this size are kept compressed inside the index instead of as blob files
+INLINE_BYTES = 64 * 1024
+
+# Seconds a write waits for another process's transaction on the index
+BUSY_TIMEOUT = 60
+
+# Bytes read from a source at a time
+READ_CHUNK_SIZE = 1 << 20
+
+# Lines of a full submission that start a new part. Splitting around the
+# <TEXT> body separates each document's content from its per-filing
+# metadata (sequence number, file name), so an exhibit filed again
+# unchanged hashes to the same part and is stored once.
+PART_BREAK_BEFORE = (b'<DOCUMENT>', b'</TEXT>')
+PART_BREAK_AFTER = (b'<TEXT>',)
+
+
+class _PartWriter:
+    """Hashes and compresses one part as it streams in; spills to a blob file past INLINE_BYTES."""
+
+    def __init__(self, store: 'FilingStore'):
+        self.store = store
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.buffer: List[bytes] = []
+        self.tmp_path = None
+        self.writer = None
+
+    def write(self, data: bytes):
+        self.digest.update(data)
+        self.size += len(data)
+        if self.writer is not None:
+            self.writer.write(data)
+            return
+        self.buffer.append(data)
+        if self.size > INLINE_BYTES:
+            fd, self.tmp_path = tempfile.mkstemp(dir=self.store.blob_dir, suffix='.part')
+            self.writer = zstandard.ZstdCompressor(level=self.store.level).stream_writer(os.fdopen(fd, 'wb'))
+            for chunk in self.buffer:
+                self.writer.write(chunk)
+            self.buffer = []
+
+    def close(self) -> Tuple[str, bool]:
+        """Store the part unless an identical one exists; returns its hash and whether it was new."""
+        part_hash = self.digest.hexdigest()
+        if self.writer is None:
+            return part_hash, self.store._put_inline(part_hash, b''.join(self.buffer))
+        self.writer.close()
+        return part_hash, self.store._put_file(part_hash, self.tmp_path, self.size)
+
+
+class _PartsReader(io.RawIOBase):
+    """Raw stream over a document's parts, decompressing one part at a time."""
+
+    def __init__(self, store: 'FilingStore', hashes: List[str]):
+        self.store = store
+        self.hashes = list(hashes)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.hashes:
+                    return 0
+                self.current = self.store._open_part(self.hashes.pop(0))
+            data = self.current.read(len(buffer))
+            if data:
+                buffer[:len(data)] = data
+                return len(data)
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+class FilingStore:
+    """
+    Content-addressed, zstd-compressed store for filing documents.
+
+    A document (full submission, primary document, saved index page) is
+    kept as a list of parts, each addressed by the SHA-256 of its raw bytes
+    and stored once however many filings contain it: full submissions are
+    split around every embedded document's body, so unchanged exhibits and
+    boilerplate documents are deduplicated. Small parts live compressed in
+    the SQLite index, large ones in blob files. The index maps
+    accession/document name (and ticker, CIK, form, date) to the parts;
+    open() streams a document back, decompressing part by part.
+    """
+
+    def __init__(self, root: str = FILING_STORE_DIR, level: int = ZSTD_LEVEL):
+        self.root = root
+        self.level = level
+        self.blob_dir = os.path.join(root, BLOB_DIR)
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, INDEX_FILE), timeout=BUSY_TIMEOUT,
+                                     check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                data BLOB
+            );
+            CREATE TABLE IF NOT EXISTS documents (
+                accession TEXT NOT NULL,
+                name TEXT NOT NULL,
+                ticker TEXT,
+                cik TEXT,
+                form TEXT,
+                filing_date TEXT,
+                size INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (accession, name)
+            );
+            CREATE INDEX IF NOT EXISTS documents_ticker ON documents (ticker, form);
+            CREATE TABLE IF NOT EXISTS parts (
+                accession TEXT NOT NULL,
+                name TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (accession, name, seq)
+            );
+            CREATE INDEX IF NOT EXISTS parts_hash ON parts (hash);
+        """)
+        self._conn.commit()
+
+    def _blob_path(self, part_hash: str) -> str:
+        return os.path.join(self.blob_dir, part_hash[:2], part_hash + '.zst')
+
+    def _has_blob(self, part_hash: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM blobs WHERE hash = ?", (part_hash,)).fetchone() is not None
+
+    def _put_inline(self, part_hash: str, data: bytes) -> bool:
+        with self._lock:
+            if self._has_blob(part_hash):
+                return False
+        compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+        with self._lock:
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, size, stored_size, data) VALUES (?, ?, ?, ?)",
+                (part_hash, len(data), len(compressed), compressed)).rowcount > 0
+            self._conn.commit()
+            return added
+
+    def _put_file(self, part_hash: str, tmp_path: str, size: int) -> bool:
+        with self._lock:
+            if self._has_blob(part_hash):
+                os.remove(tmp_path)
+                return False
+            path = self._blob_path(part_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            # Another process storing the same part at once wrote the same file; losing the insert is a dedup
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, size, stored_size, data) VALUES (?, ?, ?, NULL)",
+                (part_hash, size, os.path.getsize(path))).rowcount > 0
+            self._conn.commit()
+            return added
+
+    def _open_part(self, part_hash: str) -> BinaryIO:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (part_hash,)).fetchone()
+        if row is None:
+            raise KeyError(f"Missing blob {part_hash}")
+        decompressor = zstandard.ZstdDecompressor()
+        if row[0] is not None:
+            return io.BytesIO(decompressor.decompress(row[0]))
+        return decompressor.stream_reader(open(self._blob_path(part_hash), 'rb'), closefd=True)
+
+    @staticmethod
+    def _close_part(part: _PartWriter, hashes: List[str]) -> int:
+        part_hash, new = part.close()
+        hashes.append(part_hash)
+        return int(new)
+
+    def put(self, accession: str, name: str, source: Union[str, BinaryIO], ticker: Optional[str] = None,
+            cik: Optional[str] = None, form: Optional[str] = None, filing_date: Optional[str] = None) -> Dict:
+        """
+        Store one document from a path or binary stream, replacing any earlier version.
+
+        Full submissions (starting with <SEC-DOCUMENT>) are split into parts
+        around each embedded document's text; other documents are one part.
+        The source is read line by line and never held in memory whole.
+
+        Returns:
+            dict: 'size' (raw bytes), 'parts' and 'new_parts' (parts not already stored)
+        """
+        f = open(source, 'rb') if isinstance(source, str) else source
+        try:
+            digest = hashlib.sha256()
+            hashes = []
+            added = 0
+            part = _PartWriter(self)
+            # Lines are read with a length cap, so a huge single-line document is still streamed
+            first = f.readline(READ_CHUNK_SIZE)
+            split = first.startswith(b'<SEC-DOCUMENT>')
+            if split:
+                rest = iter(lambda: f.readline(READ_CHUNK_SIZE), b'')
+            else:
+                rest = iter(lambda: f.read(READ_CHUNK_SIZE), b'')
+            for line in _chain(first, rest):
+                if not line:
+                    continue
+                if split and part.size and line.startswith(PART_BREAK_BEFORE):
+                    added += self._close_part(part, hashes)
+                    part = _PartWriter(self)
+                digest.update(line)
+                part.write(line)
+                if split and line.startswith(PART_BREAK_AFTER):
+                    added += self._close_part(part, hashes)
+                    part = _PartWriter(self)
+            if part.size or not hashes:
+                added += self._close_part(part, hashes)
+        finally:
+            if isinstance(source, str):
+                f.close()
+
+        size = 0
+        with self._lock:
+            for part_hash in hashes:
+                size += self._conn.execute("SELECT size FROM blobs WHERE hash = ?", (part_hash,)).fetchone()[0]
+            self._conn.execute("DELETE FROM parts WHERE accession = ? AND name = ?", (accession, name))
+            self._conn.executemany("INSERT INTO parts (accession, name, seq, hash) VALUES (?, ?, ?, ?)",
+                                   [(accession, name, seq, h) for seq, h in enumerate(hashes)])
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (accession, name, ticker, cik, form, filing_date, size, digest, "
+                "stored_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (accession, name, ticker, cik, form, filing_date, size, digest.hexdigest(), time.time()))
+            self._conn.commit()
+        return {'size': size, 'parts': len(hashes), 'new_parts': added}
+
+    def has(self, accession: str, name: Optional[str] = None) -> bool:
+        query, params = "SELECT 1 FROM documents WHERE accession = ?", (accession,)
+        if name is not None:
+            query, params = query + " AND name = ?", (accession, name)
+        with self._lock:
+            return self._conn.execute(query, params).fetchone() is not None
+
+    def open(self, accession: str, name: str = FULL_SUBMISSION_FILE) -> BinaryIO:
+        """Binary stream of a stored document, decompressed on the fly."""
+        with self._lock:
+            hashes = [row[0] for row in self._conn.execute(
+                "SELECT hash FROM parts WHERE accession = ? AND name = ? ORDER BY seq", (accession, name))]
+        if not hashes:
+            raise KeyError(f"No document {name} for {accession}")
+        return io.BufferedReader(_PartsReader(self, hashes), READ_CHUNK_SIZE)
+
+    def open_text(self, accession: str, name: str = FULL_SUBMISSION_FILE, encoding: str = 'latin-1') -> TextIO:
+        """Text stream of a stored document (latin-1, like the parsers read raw files)."""
+        return io.TextIOWrapper(self.open(accession, name), encoding=encoding)
+
+    def documents(self, ticker: Optional[str] = None, accession: Optional[str] = None) -> List[Dict]:
+        """Index rows of stored documents, optionally for one ticker or accession."""
+        columns = ['accession', 'name', 'ticker', 'cik', 'form', 'filing_date', 'size', 'digest', 'stored_at']
+        query, params = f"SELECT {', '.join(columns)} FROM documents", []
+        conditions = []
+        if ticker is not None:
+            conditions.append("ticker = ?")
+            params.append(ticker)
+        if accession is not None:
+            conditions.append("accession = ?")
+            params.append(accession)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY filing_date, accession, name", params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def remove(self, accession: str, name: Optional[str] = None):
+        """Drop documents from the index; their parts are freed by gc()."""
+        where, params = "accession = ?", (accession,)
+        if name is not None:
+            where, params = where + " AND name = ?", (accession, name)
+        with self._lock:
+            self._conn.execute(f"DELETE FROM parts WHERE {where}", params)
+            self._conn.execute(f"DELETE FROM documents WHERE {where}", params)
+            self._conn.commit()
+
+    def gc(self) -> int:
+        """Delete parts no document refers to any more; returns the number removed."""
+        with self._lock:
+            orphans = [row[0] for row in self._conn.execute(
+                "SELECT hash FROM blobs WHERE hash NOT IN (SELECT DISTINCT hash FROM parts)")]
+            for part_hash in orphans:
+                path = self._blob_path(part_hash)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._conn.executemany("DELETE FROM blobs WHERE hash = ?", [(h,) for h in orphans])
+            self._conn.commit()
+        return len(orphans)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            documents, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+            blobs, unique, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()
+        return {'documents': documents, 'parts': blobs, 'logical_bytes': logical, 'unique_bytes': unique,
+                'stored_bytes': stored, 'ratio': round(logical / stored, 2) if stored else None}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def store_accession_dir(store: FilingStore, accession_dir: str, accession: str, remove: bool = False,
+                        **metadata) -> Dict:
+    """Store every file of a sec_edgar_downloader accession folder; optionally delete the folder after."""
+    totals = {'size': 0, 'parts': 0, 'new_parts': 0}
+    for file_name in sorted(os.listdir(accession_dir)):
+        path = os.path.join(accession_dir, file_name)
+        if os.path.isfile(path):
+            for key, value in store.put(accession, file_name, path, **metadata).items():
+                totals[key] += value
+    if remove:
+        shutil.rmtree(accession_dir)
+    return totals
+
+
+def import_sec_filings(store: FilingStore, download_dir: str, remove: bool = False) -> int:
+    """Move the filings recorded in a fetch_sec_filings manifest into the store; returns the count."""
+    manifest_path = os.path.join(download_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return 0
+    manifest = FilingManifest(manifest_path)
+    count = 0
+    try:
+        for filing in manifest.filings():
+            if not os.path.isdir(filing['path']):
+                continue
+            store_accession_dir(store, filing['path'], filing['accession'], remove=remove, ticker=filing['ticker'],
+                                cik=filing['cik'], form=filing['form'], filing_date=filing['filing_date'])
+            count += 1
+    finally:
+        manifest.close()
+    return count
+
+
+def import_reports(store: FilingStore, reports_dir: str, remove: bool = False) -> int:
+    """Move fetch_files_api pages (<cik>_<accession>.html) into the store; returns the count."""
+    count = 0
+    for file_name in sorted(os.listdir(reports_dir)) if os.path.isdir(reports_dir) else []:
+        cik, _, rest = file_name.partition('_')
+        accession = os.path.splitext(rest)[0]
+        if not rest or not cik.isdigit():
+            continue
+        if len(accession) == 18:
+            accession = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
+        path = os.path.join(reports_dir, file_name)
+        store.put(accession, file_name, path, cik=cik, form='10-K')
+        if remove:
+            os.remove(path)
+        count += 1
+    return count
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Compressed, content-addressed filing store.")
+    parser.add_argument('--root', default=FILING_STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    imp = commands.add_parser('import', help="Move downloaded filings into the store")
+    imp.add_argument('--sec-dir', default="sec_filings")
+    imp.add_argument('--reports-dir', default="10k_reports")
+    imp.add_argument('--keep', action='store_true', help="Keep the original files")
+    cat = commands.add_parser('cat', help="Write a stored document to stdout")
+    cat.add_argument('accession')
+    cat.add_argument('name', nargs='?', default=FULL_SUBMISSION_FILE)
+    ls = commands.add_parser('ls', help="List stored documents")
+    ls.add_argument('--ticker', default=None)
+    commands.add_parser('stats', help="Sizes and deduplication ratio")
+    commands.add_parser('gc', help="Delete unreferenced parts")
+    args = parser.parse_args(argv)
+
+    store = FilingStore(args.root)
+    if args.command == 'import':
+        filings = import_sec_filings(store, args.sec_dir, remove=not args.keep)
+        reports = import_reports(store, args.reports_dir, remove=not args.keep)
+        print(f"Imported {filings} filings and {reports} report pages")
+        print(store.stats())
+    elif args.command == 'cat':
+        with store.open(args.accession, args.name) as f:
+            shutil.copyfileobj(f, sys.stdout.buffer, READ_CHUNK_SIZE)
+    elif args.command == 'ls':
+        for doc in store.documents(ticker=args.ticker):
+            print(f"{doc['accession']}  {doc['name']:<28} {doc['ticker'] or '':<8} {doc['form'] or '':<8} "
+                  f"{doc['filing_date'] or '':<10} {doc['size']:>12,}")
+    elif args.command == 'gc':
+        print(f"Removed {store.gc()} parts")
+    else:
+        print(store.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,73 +1,347 @@
-import yfinance as yf
 import pandas as pd
+import csv
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rate_limiter import DeferredRetries, get_limiter, host_key
+from yahoo_quotes import YAHOO_QUOTE_URL, RetryableError, get_quote, get_quotes
+from ticker_universe import get_universe
+from ticker_delta import get_changed_symbols
+from job_runner import JobJournal, Progress, journal_path, shard_keys, shard_suffix
+from instrumentation import metrics, profiled, span, timed
 
-def get_ticker_details(ticker_symbol):
+# Bulk mode settings: worker pool size, shared request rate and throttling retries
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 5
+MAX_RETRIES = 4
+OUTPUT_CSV_FILE = 'market_data.csv'
+RESULT_COLUMNS = ['Ticker', 'MarketCap', 'Currency', 'Market']
+# Key set on iter_market_caps rows whose fetch failed (not written to the CSV)
+FAILED_FLAG = '_failed'
+# Only process tickers added or renamed in the latest ticker_delta refresh
+CHANGED_ONLY = False
+DETAIL_FIELDS = ['marketCap', 'currency', 'exchange']
+# Currencies are written upper-cased; Yahoo's pence code would then read as pounds,
+# so it is written as GBX (ZAc and ILA upper-case to ZAC and ILA without a clash)
+MINOR_CURRENCY_CODES = {'GBp': 'GBX'}
+# 'batch' uses multi-symbol quote requests, 'per_ticker' one request per ticker,
+# 'companyfacts' SEC bulk share counts and one batched price pull
+SOURCE = 'batch'
+# Journaled runs: tickers per checkpoint in batch mode, and how old an
+# interrupted run may be before it is started over (market caps go stale)
+JOB_CHUNK_SIZE = 1000
+JOB_MAX_AGE = 12 * 3600
+
+def is_rate_limited(error):
+    """Returns True if the exception looks like a throttling response (HTTP 429)."""
+    if type(error).__name__ == 'YFRateLimitError':
+        return True
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+@timed('get_ticker_details')
+def fetch_ticker_details(ticker_symbol, refresh=False, before_fetch=None):
+    """
+    Fetches the market cap, currency, and exchange for a given ticker symbol.
+    Unlike get_ticker_details, network errors are raised so callers can retry them.
+    before_fetch is called only when the info cache misses and Yahoo is queried.
+    """
+    # Quote fields only (served from the local cache while still fresh)
+    info = get_quote(ticker_symbol, fields=DETAIL_FIELDS, refresh=refresh, before_fetch=before_fetch)
+    market_cap = info.get('marketCap')
+    currency = info.get('currency')
+    exchange = info.get('exchange') # Get the exchange
+
+    # Prepare return values, handling missing data
+    ret_cap = market_cap
+    ret_curr = MINOR_CURRENCY_CODES.get(currency, currency.upper()) if currency else None
+    ret_exch = exchange if exchange else None
+
+    if not market_cap:
+        print(f"Market cap not available for {ticker_symbol}")
+        ret_cap = None # Ensure cap is None if not found
+    if not currency:
+        print(f"Currency not available for {ticker_symbol}")
+    if not exchange:
+        print(f"Exchange not available for {ticker_symbol}")
+
+    return ret_cap, ret_curr, ret_exch
+
+def get_ticker_details(ticker_symbol, refresh=False):
     """Fetches the market cap, currency, and exchange for a given ticker symbol."""
     try:
-        ticker = yf.Ticker(ticker_symbol)
-        # Fetch info once
-        info = ticker.info
-        market_cap = info.get('marketCap')
-        currency = info.get('currency')
-        exchange = info.get('exchange') # Get the exchange
-
-        # Prepare return values, handling missing data
-        ret_cap = market_cap
-        ret_curr = currency.upper() if currency else None
-        ret_exch = exchange if exchange else None
-
-        if not market_cap:
-            print(f"Market cap not available for {ticker_symbol}")
-            ret_cap = None # Ensure cap is None if not found
-        if not currency:
-            print(f"Currency not available for {ticker_symbol}")
-        if not exchange:
-            print(f"Exchange not available for {ticker_symbol}")
-
-        return ret_cap, ret_curr, ret_exch
-
+        return fetch_ticker_details(ticker_symbol, refresh=refresh)
     except Exception as e:
         # More specific error logging could be added here if needed
         print(f"Could not fetch data for {ticker_symbol}: {e}")
         return None, None, None
 
-def main():
-    """Reads tickers from CSV and prints their market caps, currency, and exchange."""
+def _fetch_with_retry(ticker, provider, limiter, max_retries):
+    """
+    Calls the provider under the shared rate limit, backing off on throttling.
+    Re-raises the throttling error once retries are exhausted so the ticker can
+    be deferred; returns None if the fetch failed for another reason.
+    """
+    for attempt in range(max_retries + 1):
+        fetched = []
+
+        def before_fetch():
+            limiter.acquire()
+            fetched.append(True)
+
+        try:
+            result = provider(ticker, before_fetch=before_fetch)
+        except Exception as e:
+            if isinstance(e, RetryableError) or is_rate_limited(e):
+                # Each response is fed to the limiter once, here (the provider's requests
+                # go through before_fetch). Throttling halves the shared rate and pauses
+                # every worker (and process) on this host
+                if isinstance(e, RetryableError):
+                    delay = limiter.record(e.status, e.retry_after)
+                else:
+                    delay = limiter.throttled()
+                if attempt >= max_retries:
+                    raise
+                print(f"Rate limited on {ticker}, retrying in {delay:.1f}s")
+                metrics.incr('retries', endpoint='yahoo_quote')
+                with span('backoff_sleep', endpoint='yahoo_quote'):
+                    time.sleep(delay)
+                continue
+            print(f"Could not fetch data for {ticker}: {e}")
+            return None
+        if fetched:
+            limiter.succeeded()
+        return result
+
+def iter_market_caps(tickers, provider=fetch_ticker_details, max_workers=MAX_WORKERS,
+                     rate=REQUESTS_PER_SECOND, max_retries=MAX_RETRIES):
+    """
+    Fetches details for many tickers with a bounded worker pool.
+
+    Yields one result row per ticker as soon as it completes (not in input order).
+    At most 2 * max_workers lookups are queued at a time, and all workers share
+    one adaptive token bucket (shared with other processes querying Yahoo) so
+    the total request rate stays at or below `rate` per second. Tickers still
+    throttled after max_retries are deferred and retried at the end, once the
+    limiter's circuit breaker has closed. Tickers that could not be fetched
+    (errors, or still throttled after the deferred rounds) get a row of missing
+    values flagged with FAILED_FLAG: True, unlike tickers Yahoo has no data for.
+
+    Args:
+        tickers (list): Ticker symbols to fetch
+        provider (callable): provider(ticker, before_fetch) returns (market_cap,
+            currency, exchange) and raises on errors. It must call before_fetch()
+            before each network request so only real requests take rate-limit
+            tokens; defaults to fetch_ticker_details
+        max_workers (int): Number of worker threads
+        rate (float): Shared request rate limit (requests per second)
+        max_retries (int): Retries per ticker on throttling responses
+    """
+    limiter = get_limiter(host_key(YAHOO_QUOTE_URL), rate)
+    deferred = DeferredRetries(limiter)
+    pending = set()
+    ticker_iter = iter(tickers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_next():
+            for ticker in ticker_iter:
+                future = executor.submit(_fetch_with_retry, ticker, provider, limiter, max_retries)
+                future.ticker = ticker
+                pending.add(future)
+                return True
+            return False
+
+        while len(pending) < 2 * max_workers and submit_next():
+            pass
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                submit_next()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    deferred.add(future.ticker, e)
+                    continue
+                yield _result_row(future.ticker, result)
+
+    # One attempt per deferred ticker and round (DeferredRetries does the waiting)
+    for ticker, result in deferred.run(lambda t: _fetch_with_retry(t, provider, limiter, 0)):
+        yield _result_row(ticker, result)
+    for ticker, error in deferred.failed.items():
+        print(f"Could not fetch data for {ticker}: {error}")
+        yield _result_row(ticker, None)
+
+def _result_row(ticker, result):
+    # result is None when the fetch failed
+    cap, curr, exch = result or (None, None, None)
+    row = {
+        'Ticker': ticker,
+        'MarketCap': cap,
+        'Currency': curr or 'N/A',
+        'Market': exch or 'N/A'
+    }
+    if result is None:
+        row[FAILED_FLAG] = True
+    return row
+
+def fetch_market_caps_bulk(tickers, output_file=None, **kwargs):
+    """
+    Fetches details for many tickers concurrently and returns them as a DataFrame.
+
+    If output_file is given, each row is appended to that CSV as soon as it
+    completes, so partial results survive an interrupted run. Keyword arguments
+    are passed through to iter_market_caps.
+    """
+    total_tickers = len(tickers)
+    market_data = []
+    csv_file = open(output_file, 'w', newline='') if output_file else None
     try:
-        # Assuming the CSV file is in the same directory as the script
-        tickers_df = pd.read_csv('us_stock_tickers.csv')
-        # Assuming the ticker symbols are in a column named 'Ticker'
-        if 'Ticker' not in tickers_df.columns:
-            print("Error: 'Ticker' column not found in us_stock_tickers.csv")
-            return
-
-        market_data = [] # Store dictionaries
-        tickers_to_process = tickers_df['Ticker'].tolist()
+        writer = csv.DictWriter(csv_file, fieldnames=RESULT_COLUMNS, extrasaction='ignore') if csv_file else None
+        if writer:
+            writer.writeheader()
+        for row in iter_market_caps(tickers, **kwargs):
+            market_data.append(row)
+            print(f"Processed {len(market_data)}/{total_tickers}: {row['Ticker']}")
+            if writer:
+                writer.writerow(row)
+                csv_file.flush()
+    finally:
+        if csv_file:
+            csv_file.close()
+
+    # Restore input order for the final frame
+    with span('parse', step='market_caps_frame'):
+        order = {ticker: i for i, ticker in enumerate(tickers)}
+        market_data.sort(key=lambda row: order[row['Ticker']])
+        return pd.DataFrame(market_data, columns=RESULT_COLUMNS)
+
+def fetch_market_caps_batched(tickers, output_file=None, refresh=False):
+    """
+    Fetches details for many tickers through the multi-symbol quote endpoint
+    (one request per BATCH_SIZE tickers) and returns them as a DataFrame in input order.
+    Tickers whose batches could not be fetched get missing values and are
+    listed in the frame's attrs['failed'].
+    """
+    quotes = get_quotes(tickers, fields=DETAIL_FIELDS, refresh=refresh, partial=True)
+    results_df = pd.DataFrame({
+        'Ticker': list(tickers),
+        'MarketCap': quotes['marketCap'].values,
+        'Currency': quotes['currency'].astype('string').replace(MINOR_CURRENCY_CODES).str.upper()
+                                      .fillna('N/A').values,
+        'Market': quotes['exchange'].astype('string').fillna('N/A').values,
+    }, columns=RESULT_COLUMNS)
+    results_df.attrs['failed'] = failed = quotes.attrs['failed']
+    if failed:
+        print(f"Could not fetch {len(failed)} tickers: {', '.join(failed[:20])}"
+              + (" ..." if len(failed) > 20 else ""))
+    failed = set(failed)
+    missing = [t for t in results_df.loc[results_df['MarketCap'].isna(), 'Ticker'] if t not in failed]
+    if missing:
+        print(f"Market cap not available for {len(missing)} tickers: {', '.join(missing[:20])}"
+              + (" ..." if len(missing) > 20 else ""))
+    if output_file:
+        results_df.to_csv(output_file, index=False)
+    return results_df
+
+def _journal_row(row):
+    # JSON-safe copy of a result row (pandas NA/NaN -> None, numpy scalars -> Python)
+    return {k: (None if pd.isna(v) else v.item() if hasattr(v, 'item') else v)
+            for k, v in row.items() if k in RESULT_COLUMNS}
+
+def run_market_caps_job(tickers, source=SOURCE, shard=0, shards=1, resume=True):
+    """
+    Fetches market caps for this shard of `tickers` as a checkpointed job.
+
+    Completed rows go to an append-only journal (job_runner.JobJournal) as they
+    finish, so a restarted run skips the tickers already done. Progress and ETA
+    are printed as the job runs. With shards > 1, only tickers whose hash
+    falls in `shard` are processed, so N processes or hosts can split the
+    universe. Tickers that could not be fetched are journaled as failed, so
+    the next run retries them, and the journal is only completed once none
+    are left. Returns the shard's rows in input order.
+    """
+    tickers = shard_keys(tickers, shard, shards)
+    journal = JobJournal(journal_path('market_caps', shard, shards), params={'source': source},
+                         max_age=JOB_MAX_AGE, resume=resume)
+    todo = journal.pending(tickers)
+    progress = Progress(len(tickers), done=len(tickers) - len(todo), label='market caps')
+    try:
+        if source == 'per_ticker':
+            # Fetch concurrently; the shared token bucket replaces the fixed per-ticker sleep
+            for row in iter_market_caps(todo):
+                journal.record(row['Ticker'], _journal_row(row), status='failed' if row.get(FAILED_FLAG) else 'ok')
+                progress.update()
+        else:
+            for i in range(0, len(todo), JOB_CHUNK_SIZE):
+                chunk = fetch_market_caps_batched(todo[i:i + JOB_CHUNK_SIZE])
+                failed = set(chunk.attrs['failed'])
+                for row in chunk.to_dict('records'):
+                    journal.record(row['Ticker'], _journal_row(row),
+                                   status='failed' if row['Ticker'] in failed else 'ok')
+                journal.flush()
+                progress.update(len(chunk))
+    finally:
+        journal.close()
+    rows = journal.results()
+    with span('parse', step='market_caps_frame'):
+        results_df = pd.DataFrame([rows[t] for t in tickers if t in rows], columns=RESULT_COLUMNS)
+        results_df['MarketCap'] = pd.to_numeric(results_df['MarketCap'], errors='coerce').round().astype('Int64')
+    failed = journal.results('failed')
+    if failed:
+        print(f"{len(failed)} tickers could not be fetched; they are retried on the next run")
+    else:
+        journal.complete()
+    return results_df
+
+def main(changed_only=CHANGED_ONLY, since=None, source=SOURCE, shard=0, shards=1, resume=True):
+    """
+    Reads tickers from CSV and prints their market caps, currency, and exchange.
+    With changed_only, only tickers from the ticker change log (since `since`,
+    default the latest refresh) are processed. With source='companyfacts' the
+    market caps come from the SEC companyfacts archive instead of Yahoo info.
+    Yahoo runs are checkpointed (see run_market_caps_job): an interrupted run
+    resumes unless resume=False, and shard/shards split the tickers across
+    processes, each writing its own market_data.shard-<i>-of-<n>.csv.
+    """
+    try:
+        if changed_only:
+            tickers_to_process = get_changed_symbols(since)
+        else:
+            # Assuming the CSV file is in the same directory as the script.
+            # The shared ticker universe is memory-mapped and rebuilt only when the CSV changes.
+            try:
+                tickers_to_process = get_universe('us_stock_tickers.csv').tickers()
+            except KeyError:
+                print("Error: 'Ticker' column not found in us_stock_tickers.csv")
+                return
+        output_file = shard_suffix(OUTPUT_CSV_FILE, shard, shards)
         total_tickers = len(tickers_to_process)
-        print(f"Fetching market caps, currency, and exchange for {total_tickers} tickers...")
-
-        for i, ticker in enumerate(tickers_to_process):
-            print(f"Processing {i+1}/{total_tickers}: {ticker}")
-            cap, curr, exch = get_ticker_details(ticker)
-            # Store data even if some parts are missing, using N/A
-            market_data.append({
-                'Ticker': ticker,
-                'MarketCap': cap, # Keep as number or None for potential calculations
-                'Currency': curr or 'N/A',
-                'Market': exch or 'N/A' # Add market
-            })
-            # Add a small delay to avoid hitting API rate limits
-            time.sleep(0.1)
+        print(f"Fetching market caps, currency, and exchange for {total_tickers} tickers"
+              + (f" (shard {shard} of {shards})..." if shards > 1 else "..."))
+
+        if source == 'companyfacts':
+            from companyfacts import market_caps_from_companyfacts
+            tickers_to_process = shard_keys(tickers_to_process, shard, shards)
+            results_df = market_caps_from_companyfacts(tickers_to_process)[RESULT_COLUMNS]
+        else:
+            results_df = run_market_caps_job(tickers_to_process, source=source, shard=shard,
+                                             shards=shards, resume=resume)
+        results_df.to_csv(output_file, index=False)
 
         print("\n--- Market Data Results ---")
-        if market_data:
-            results_df = pd.DataFrame(market_data)
+        if not results_df.empty:
             # Optional: Format MarketCap for printing
             # results_df['MarketCap_Formatted'] = results_df['MarketCap'].apply(lambda x: f"{x:,.0f}" if pd.notnull(x) else 'N/A')
             print(results_df.to_string(index=False))
-            # results_df.to_csv('market_data.csv', index=False)
-            # print("\nResults saved to market_data.csv")
+            print(f"\nResults saved to {output_file}")
+            # Keep every run in the columnar history store
+            try:
+                from market_cap_store import append_snapshot  # pyarrow is only needed here
+                partition = append_snapshot(results_df)
+                print(f"Snapshot appended to {partition}")
+            except Exception as e:
+                print(f"Could not append snapshot to market cap history: {e}")
         else:
             print("No market data retrieved.")
 
@@ -77,4 +351,5 @@ def main():
         print(f"An error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
+    with profiled():
+        main()
@@ -1,7 +1,7 @@
 # get_us_tickers.py
 import pandas as pd
 import os
-from io import StringIO
+from instrumentation import profiled, span
 
 # URLs for NASDAQ symbol directories (pipe-delimited text files)
 NASDAQ_LISTED_URL = "ftp://ftp.nasdaqtrader.com/symboldirectory/nasdaqlisted.txt"
@@ -10,61 +10,138 @@ OTHER_LISTED_URL = "ftp://ftp.nasdaqtrader.com/symboldirectory/otherlisted.txt"
 # Output CSV file name
 OUTPUT_CSV_FILE = "us_stock_tickers.csv"
 
-def fetch_and_save_tickers(nasdaq_url, other_url, output_file):
+# Rows parsed per chunk when streaming the symbol directories
+CHUNK_SIZE = 2000
+
+# The last line of each directory file is a trailer like "File Creation Time: 0516202518:01"
+TRAILER_PREFIX = "File Creation Time"
+
+OUTPUT_COLUMNS = ['Ticker', 'Company Name']
+
+# Symbol column of each directory: nasdaqlisted.txt has 'Symbol', otherlisted.txt 'ACT Symbol'
+SYMBOL_COLUMNS = ['Symbol', 'ACT Symbol']
+
+class TickerDirectoryError(Exception):
+    """A symbol directory could not be read completely."""
+
+def columnar_path(csv_path):
+    """Path of the Parquet copy written next to a ticker CSV."""
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+def iter_ticker_chunks(url, seen):
     """
-    Fetches ticker symbols and company names from NASDAQ FTP site
-    and saves them to a CSV file.
+    Streams one symbol directory file and yields cleaned (Ticker, Company Name) chunks.
+
+    Uses the C parser in chunks; the trailer line is dropped explicitly, test
+    issues are filtered out and tickers already in `seen` are skipped (and
+    added to it), so duplicates are removed as the data streams in.
+
+    Raises TickerDirectoryError if the expected columns are missing or the
+    stream ends before the trailer line (a truncated download).
     """
-    print(f"Fetching data from {nasdaq_url} and {other_url}...")
+    # Use 'latin-1' encoding as sometimes these files have non-utf8 chars
+    # keep_default_na=False keeps symbols such as 'NA' as text
+    reader = pd.read_csv(
+        url,
+        sep='|',
+        encoding='latin-1',
+        dtype=str,
+        keep_default_na=False,
+        chunksize=CHUNK_SIZE
+    )
+    complete = False
+    for chunk in reader:
+        # Column names are 'Symbol' (or 'ACT Symbol') and 'Security Name'
+        symbol = next((c for c in SYMBOL_COLUMNS if c in chunk.columns), None)
+        if symbol is None or 'Security Name' not in chunk.columns:
+            raise TickerDirectoryError(f"Could not find 'Symbol' or 'Security Name' columns in {url}")
 
-    all_tickers_df = pd.DataFrame()
+        # Skip the trailer line
+        trailer = chunk[symbol].str.startswith(TRAILER_PREFIX)
+        complete = complete or bool(trailer.any())
+        chunk = chunk[~trailer]
 
-    for url in [nasdaq_url, other_url]:
-        try:
-            # Use StringIO to handle the text data directly
-            # Need to skip the last line which is a file creation timestamp
-            # Use 'latin-1' encoding as sometimes these files have non-utf8 chars
-            df = pd.read_csv(
-                url,
-                sep='|',
-                encoding='latin-1',
-                skipfooter=1, # Skip the trailer line
-                engine='python' # Needed for skipfooter
-            )
-
-            # Filter out test symbols and non-common stock entries if possible
-            # NASDAQ files have a 'Test Issue' column (Y/N)
-            if 'Test Issue' in df.columns:
-                df = df[df['Test Issue'] == 'N']
-
-            # Select and rename relevant columns
-            # Column names are 'Symbol' and 'Security Name'
-            if 'Symbol' in df.columns and 'Security Name' in df.columns:
-                df_filtered = df[['Symbol', 'Security Name']].copy()
-                df_filtered.rename(columns={'Symbol': 'Ticker', 'Security Name': 'Company Name'}, inplace=True)
-
-                # Append to the main dataframe
-                all_tickers_df = pd.concat([all_tickers_df, df_filtered], ignore_index=True)
-            else:
-                print(f"Warning: Could not find 'Symbol' or 'Security Name' columns in {url}")
+        # Filter out test symbols; NASDAQ files have a 'Test Issue' column (Y/N)
+        if 'Test Issue' in chunk.columns:
+            chunk = chunk[chunk['Test Issue'] == 'N']
+
+        chunk = chunk[[symbol, 'Security Name']]
+        chunk.columns = OUTPUT_COLUMNS
+
+        # Remove duplicates within the chunk and against everything seen so far
+        chunk = chunk[~chunk['Ticker'].isin(seen)].drop_duplicates(subset=['Ticker'])
+        seen.update(chunk['Ticker'])
+        if not chunk.empty:
+            yield chunk
+    if not complete:
+        raise TickerDirectoryError(f"{url} ended before its trailer line; the download was truncated")
+
+def load_ticker_directory(urls, strict=False):
+    """
+    Streams all symbol directories and returns one deduplicated, sorted DataFrame.
 
+    A directory that fails midway contributes nothing, not the chunks read
+    before the error. With strict=True the first failure raises
+    TickerDirectoryError instead of being skipped, for callers that must not
+    act on a partial directory.
+    """
+    seen = set()
+    chunks = []
+    for url in urls:
+        url_seen = set(seen)
+        try:
+            with span('parse', step='ticker_directory'):
+                url_chunks = list(iter_ticker_chunks(url, url_seen))
         except Exception as e:
+            if strict:
+                raise e if isinstance(e, TickerDirectoryError) else TickerDirectoryError(
+                    f"Error fetching or processing data from {url}: {e}") from e
             print(f"Error fetching or processing data from {url}: {e}")
             # Continue to the next URL if one fails
+            continue
+        seen = url_seen
+        chunks.extend(url_chunks)
 
-    if not all_tickers_df.empty:
-        # Remove potential duplicates (e.g., if a symbol is listed in both files somehow)
-        all_tickers_df.drop_duplicates(subset=['Ticker'], inplace=True)
+    if not chunks:
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    # Clean up company names (remove common suffixes like Inc, Corp, Ltd etc. if desired - optional)
+    # Example: df['Company Name'] = df['Company Name'].str.replace(r'\s+(Inc|Corp|Ltd|LLC)\.?$', '', regex=True)
+    return pd.concat(chunks, ignore_index=True).sort_values(by='Ticker', ignore_index=True)
+
+def save_tickers(tickers_df, output_file):
+    """Writes the tickers CSV and a Parquet copy next to it for fast loading."""
+    tickers_df.to_csv(output_file, index=False)
+    try:
+        tickers_df.to_parquet(columnar_path(output_file), index=False)
+    except ImportError as e:
+        print(f"Skipping Parquet copy of {output_file}: {e}")
+
+def load_tickers(csv_path):
+    """
+    Loads a tickers file, preferring its Parquet copy when it is at least as new as the CSV.
+    """
+    parquet_path = columnar_path(csv_path)
+    try:
+        if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+            return pd.read_parquet(parquet_path)
+    except (ImportError, OSError):
+        pass
+    return pd.read_csv(csv_path, dtype={'Ticker': str}, keep_default_na=False)
 
-        # Clean up company names (remove common suffixes like Inc, Corp, Ltd etc. if desired - optional)
-        # Example: all_tickers_df['Company Name'] = all_tickers_df['Company Name'].str.replace(r'\s+(Inc|Corp|Ltd|LLC)\.?$', '', regex=True)
+def fetch_and_save_tickers(nasdaq_url, other_url, output_file):
+    """
+    Fetches ticker symbols and company names from NASDAQ FTP site
+    and saves them to a CSV file.
+    """
+    print(f"Fetching data from {nasdaq_url} and {other_url}...")
 
-        # Sort by ticker symbol
-        all_tickers_df.sort_values(by='Ticker', inplace=True)
+    all_tickers_df = load_ticker_directory([nasdaq_url, other_url])
 
-        # Save to CSV
+    if not all_tickers_df.empty:
+        # Save to CSV (plus a Parquet copy) in one step
         try:
-            all_tickers_df.to_csv(output_file, index=False)
+            save_tickers(all_tickers_df, output_file)
             print(f"Successfully saved {len(all_tickers_df)} tickers to {output_file}")
         except Exception as e:
             print(f"Error saving data to {output_file}: {e}")
@@ -72,4 +149,5 @@ def fetch_and_save_tickers(nasdaq_url, other_url, output_file):
         print("No ticker data was successfully fetched or processed.")
 
 if __name__ == "__main__":
-    fetch_and_save_tickers(NASDAQ_LISTED_URL, OTHER_LISTED_URL, OUTPUT_CSV_FILE)
+    with profiled():
+        fetch_and_save_tickers(NASDAQ_LISTED_URL, OTHER_LISTED_URL, OUTPUT_CSV_FILE)
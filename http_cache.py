@@ -0,0 +1,112 @@
+# http_cache.py
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, NamedTuple, Optional
+
+# SQLite file holding cached EDGAR response bodies and their validators
+HTTP_CACHE_DB = "edgar_http_cache.sqlite"
+
+# zlib level for stored bodies; JSON documents shrink roughly 5-10x
+COMPRESS_LEVEL = 6
+
+# Maximum number of URLs kept on disk; least recently used ones are evicted
+MAX_ENTRIES = 50000
+
+
+class CachedEntry(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    data: bytes  # compressed body
+    size: int  # uncompressed size
+
+    def body(self) -> bytes:
+        return zlib.decompress(self.data)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """
+    On-disk cache of HTTP response bodies for conditional GETs, keyed by URL.
+
+    Bodies are stored zlib-compressed together with the response's ETag and
+    Last-Modified validators. The caller sends conditional_headers() with the
+    next request and, on 304 Not Modified, reads the body from here instead of
+    downloading it again. Only responses with at least one validator are
+    stored. The least recently used URLs are evicted above max_entries.
+    """
+
+    def __init__(self, path: str = HTTP_CACHE_DB, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+        """)
+        self._conn.commit()
+
+    def lookup(self, url: str) -> Optional[CachedEntry]:
+        """The stored response for a URL, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body, size FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        return CachedEntry(*row)
+
+    def store(self, url: str, body: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """Store a 200 response body; ignored without validators, since it could never be revalidated."""
+        if not etag and not last_modified:
+            return
+        data = zlib.compress(body, COMPRESS_LEVEL)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body, size, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (url, etag, last_modified, data, len(body), now, now))
+            self._evict()
+            self._conn.commit()
+
+    def invalidate(self, url: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._conn.commit()
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE url IN "
+                "(SELECT url FROM responses ORDER BY last_access LIMIT ?)", (count - self.max_entries,))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, stored, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'entries': entries, 'stored_bytes': stored, 'body_bytes': size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,269 @@
+# info_cache.py
+import json
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from instrumentation import metrics, span
+from singleflight import SingleFlight
+
+# SQLite file holding cached yfinance Ticker.info payloads
+CACHE_DB = "yf_info_cache.sqlite"
+
+# Time-to-live in seconds for cached fields. Descriptive fields rarely change,
+# prices and market cap go stale quickly.
+LONG_TTL = 7 * 24 * 3600
+SHORT_TTL = 15 * 60
+DEFAULT_TTL = 24 * 3600
+
+FIELD_TTLS = {
+    'symbol': LONG_TTL,
+    'longName': LONG_TTL,
+    'shortName': LONG_TTL,
+    'market': LONG_TTL,
+    'exchange': LONG_TTL,
+    'currency': LONG_TTL,
+    'sector': LONG_TTL,
+    'industry': LONG_TTL,
+    'marketCap': SHORT_TTL,
+    'currentPrice': SHORT_TTL,
+    'regularMarketPrice': SHORT_TTL,
+    'previousClose': SHORT_TTL,
+    'volume': SHORT_TTL,
+}
+
+# Maximum number of symbols kept on disk; least recently used ones are evicted
+MAX_SYMBOLS = 20000
+
+
+def _fetch_yahoo_info(symbol: str) -> Dict:
+    """Fetch the full info payload for a symbol from Yahoo Finance."""
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+class InfoCache:
+    """
+    On-disk cache of Ticker.info payloads keyed by symbol.
+
+    Every field is stored with the time it was fetched and expires after its
+    own TTL (see FIELD_TTLS). A lookup is a hit when all fields the caller asks
+    for are still fresh; otherwise the full payload is fetched again and stored.
+    Concurrent misses for the same symbol share one fetch.
+    """
+
+    def __init__(self, path: str = CACHE_DB, max_symbols: int = MAX_SYMBOLS,
+                 field_ttls: Optional[Dict[str, float]] = None, default_ttl: float = DEFAULT_TTL,
+                 fetcher: Callable[[str], Dict] = _fetch_yahoo_info):
+        self.path = path
+        self.max_symbols = max_symbols
+        self.field_ttls = dict(FIELD_TTLS if field_ttls is None else field_ttls)
+        self.default_ttl = default_ttl
+        self.fetcher = fetcher
+        self.hits = 0
+        self.misses = 0
+        self.flight = SingleFlight('yahoo_info')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS symbols (
+                symbol TEXT PRIMARY KEY,
+                last_fetch REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS symbols_last_access ON symbols (last_access);
+            CREATE TABLE IF NOT EXISTS fields (
+                symbol TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (symbol, field)
+            );
+        """)
+        self._conn.commit()
+
+    def ttl(self, field: str) -> float:
+        return self.field_ttls.get(field, self.default_ttl)
+
+    def lookup(self, symbol: str, fields: Optional[Iterable[str]] = None) -> Optional[Dict]:
+        """
+        Return the cached info for a symbol without touching the network.
+
+        Returns None if the symbol is unknown or any requested field has expired.
+        With fields=None every stored field must still be fresh, and an empty
+        payload expires after the default TTL.
+        """
+        symbol = symbol.upper()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_fetch FROM symbols WHERE symbol = ?", (symbol,)).fetchone()
+            if row is None:
+                return None
+            last_fetch = row[0]
+            stored = {
+                field: (value, fetched_at)
+                for field, value, fetched_at in self._conn.execute(
+                    "SELECT field, value, fetched_at FROM fields WHERE symbol = ?", (symbol,))
+            }
+            wanted = stored.keys() if fields is None else fields
+            if fields is None and not stored and now - last_fetch >= self.default_ttl:
+                # Nothing stored (e.g. Yahoo had no data): no field TTL would ever expire it
+                return None
+            for field in wanted:
+                # Fields missing from the last payload stay "known absent" for their TTL
+                fetched_at = stored[field][1] if field in stored else last_fetch
+                if now - fetched_at >= self.ttl(field):
+                    return None
+            self._conn.execute(
+                "UPDATE symbols SET last_access = ? WHERE symbol = ?", (now, symbol))
+            self._conn.commit()
+        return {field: json.loads(value) for field, (value, _) in stored.items()}
+
+    def put(self, symbol: str, info: Dict, fetched_at: Optional[float] = None, replace: bool = False):
+        """
+        Store an info payload for a symbol.
+
+        Partial payloads (e.g. from the batch quote endpoint) are merged into
+        what is cached and say nothing about other fields. With replace=True the
+        payload is complete: fields missing from it are dropped and count as
+        known absent until their TTL runs out.
+        """
+        symbol = symbol.upper()
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        rows = [(symbol, field, json.dumps(value, default=str), fetched_at)
+                for field, value in (info or {}).items()]
+        with self._lock:
+            if replace:
+                self._conn.execute(
+                    "INSERT INTO symbols (symbol, last_fetch, last_access) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET last_fetch = excluded.last_fetch, "
+                    "last_access = excluded.last_access",
+                    (symbol, fetched_at, fetched_at))
+                self._conn.execute("DELETE FROM fields WHERE symbol = ?", (symbol,))
+            else:
+                # last_fetch stays at the last complete payload (0 if there was none)
+                self._conn.execute(
+                    "INSERT INTO symbols (symbol, last_fetch, last_access) VALUES (?, 0, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET last_access = excluded.last_access",
+                    (symbol, fetched_at))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fields (symbol, field, value, fetched_at) VALUES (?, ?, ?, ?)",
+                rows)
+            self._evict()
+            self._conn.commit()
+
+    def get(self, symbol: str, fields: Optional[Iterable[str]] = None, refresh: bool = False,
+            before_fetch: Optional[Callable[[], None]] = None) -> Dict:
+        """
+        Return info for a symbol, from cache when fresh and from the network otherwise.
+
+        Args:
+            symbol (str): Ticker symbol
+            fields (Iterable[str]): Fields the caller needs; only these must be fresh
+            refresh (bool): Skip the cache and always fetch
+            before_fetch (callable): Called right before a network fetch, e.g. to
+                take a rate-limit token; not called on cache hits
+
+        Returns:
+            dict: The info payload (may contain more fields than requested)
+        """
+        if not refresh:
+            cached = self.lookup(symbol, fields)
+            if cached is not None:
+                with self._lock:
+                    self.hits += 1
+                metrics.incr('cache_hits', cache='yf_info')
+                return cached
+        with self._lock:
+            self.misses += 1
+        metrics.incr('cache_misses', cache='yf_info')
+        # Only the caller that actually fetches takes a rate-limit token
+        info = self.flight.do(symbol.upper(), lambda: self._fetch(symbol, before_fetch), use_memo=not refresh)
+        return dict(info)
+
+    def _fetch(self, symbol: str, before_fetch: Optional[Callable[[], None]]) -> Dict:
+        if before_fetch:
+            with span('rate_limit_wait', endpoint='yahoo_info'):
+                before_fetch()
+        with span('http_request', endpoint='yahoo_info'):
+            info = self.fetcher(symbol) or {}
+        self.put(symbol, info, replace=True)
+        return info
+
+    def stored_fields(self, symbols: Iterable[str], fields: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Stored values of some fields for many symbols, whatever their age.
+
+        A bulk read for descriptive metadata; it neither checks TTLs nor
+        counts as an access for eviction.
+        """
+        fields = list(fields)
+        wanted = {symbol.upper() for symbol in symbols}
+        result = {}
+        placeholders = ','.join('?' * len(fields))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT symbol, field, value FROM fields WHERE field IN ({placeholders})", fields).fetchall()
+        for symbol, field, value in rows:
+            if symbol in wanted:
+                result.setdefault(symbol, {})[field] = json.loads(value)
+        return result
+
+    def invalidate(self, symbol: str):
+        """Drop everything cached for a symbol."""
+        symbol = symbol.upper()
+        self.flight.forget(symbol)
+        with self._lock:
+            self._conn.execute("DELETE FROM fields WHERE symbol = ?", (symbol,))
+            self._conn.execute("DELETE FROM symbols WHERE symbol = ?", (symbol,))
+            self._conn.commit()
+
+    def _evict(self):
+        # Caller holds the lock
+        count = self._conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+        excess = count - self.max_symbols
+        if excess <= 0:
+            return
+        victims = [row[0] for row in self._conn.execute(
+            "SELECT symbol FROM symbols ORDER BY last_access LIMIT ?", (excess,))]
+        self._conn.executemany("DELETE FROM fields WHERE symbol = ?", [(s,) for s in victims])
+        self._conn.executemany("DELETE FROM symbols WHERE symbol = ?", [(s,) for s in victims])
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for this process and the number of cached symbols."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'symbols': size, 'fetches': self.flight.stats()}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache() -> InfoCache:
+    """Return the process-wide cache shared by all scripts."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = InfoCache()
+        return _default_cache
+
+
+def set_cache(cache: InfoCache):
+    """Replace the process-wide cache, e.g. with one using a different fetcher."""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
+
+
+def get_info(symbol: str, fields: Optional[Iterable[str]] = None, refresh: bool = False,
+             before_fetch: Optional[Callable[[], None]] = None) -> Dict:
+    """Shortcut for get_cache().get(...)."""
+    return get_cache().get(symbol, fields=fields, refresh=refresh, before_fetch=before_fetch)
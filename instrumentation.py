@@ -0,0 +1,208 @@
+# instrumentation.py
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Set to a file path (or '-' for stderr) to write one JSON line per span/event
+METRICS_LOG_ENV = "MKTCAP_METRICS_LOG"
+# Set to a file path to dump all metrics in Prometheus text format at exit
+METRICS_PROM_ENV = "MKTCAP_METRICS_PROM"
+# Set to a file path to profile a single run (.html uses pyinstrument, anything else cProfile)
+PROFILE_ENV = "MKTCAP_PROFILE"
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+class Metrics:
+    """Thread-safe counters and latency histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    hist['buckets'][i] += 1
+            hist['count'] += 1
+            hist['sum'] += seconds
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Plain-dict copy of all metrics, for JSON output."""
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), 'count': h['count'],
+                                'sum': round(h['sum'], 6),
+                                'buckets': dict(zip(map(str, BUCKETS), h['buckets']))}
+                               for (name, labels), h in sorted(self.histograms.items())],
+            }
+
+    def prometheus_text(self, prefix="mktcap_"):
+        """All metrics in the Prometheus text exposition format."""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        lines = []
+        with self._lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {prefix}{name}_total counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n == name:
+                        lines.append(f"{prefix}{name}_total{fmt(labels)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {prefix}{name} histogram")
+                for (n, labels), h in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, count in zip(BUCKETS, h['buckets']):
+                        lines.append(f"{prefix}{name}_bucket{fmt(labels, [('le', bound)])} {count}")
+                    lines.append(f"{prefix}{name}_bucket{fmt(labels, [('le', '+Inf')])} {h['count']}")
+                    lines.append(f"{prefix}{name}_sum{fmt(labels)} {h['sum']:.6f}")
+                    lines.append(f"{prefix}{name}_count{fmt(labels)} {h['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry used by all fetchers
+metrics = Metrics()
+
+_log_lock = threading.Lock()
+_log_file = None
+
+
+def _log_target():
+    global _log_file
+    target = os.environ.get(METRICS_LOG_ENV)
+    if not target:
+        return None
+    if target == '-':
+        return sys.stderr
+    if _log_file is None:
+        _log_file = open(target, 'a', buffering=1)
+    return _log_file
+
+
+def log_event(event, **fields):
+    """Write one structured JSON log line if METRICS_LOG_ENV is set."""
+    with _log_lock:
+        target = _log_target()
+        if target is None:
+            return
+        record = {'ts': round(time.time(), 6), 'event': event}
+        record.update(fields)
+        target.write(json.dumps(record, default=str) + '\n')
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Time a block of work.
+
+    Records the duration in the 'span_seconds' histogram labelled by span name
+    (plus any labels such as endpoint), counts errors, and logs a JSON line.
+    Exceptions are re-raised unchanged.
+    """
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException as e:
+        status = 'error'
+        metrics.incr('errors', span=name, error=type(e).__name__, **labels)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        metrics.observe('span_seconds', duration, span=name, **labels)
+        log_event('span', span=name, duration_ms=round(duration * 1000, 3), status=status, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_prometheus(path):
+    """Write all metrics in Prometheus text format to a file."""
+    with open(path, 'w') as f:
+        f.write(metrics.prometheus_text())
+
+
+@contextmanager
+def profiled(path=None):
+    """
+    Profile the enclosed block when a path is given or PROFILE_ENV is set.
+
+    Paths ending in .html use pyinstrument (if installed); anything else
+    writes cProfile stats readable with pstats or snakeviz. Without a path
+    this is a no-op, so scripts can wrap main() unconditionally.
+    """
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path:
+        yield
+        return
+    if path.endswith('.html'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument is not installed; falling back to cProfile")
+            path = os.path.splitext(path)[0] + '.prof'
+        else:
+            profiler = Profiler()
+            profiler.start()
+            try:
+                yield
+            finally:
+                profiler.stop()
+                with open(path, 'w') as f:
+                    f.write(profiler.output_html())
+                print(f"Profile written to {path}")
+            return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+
+
+if os.environ.get(METRICS_PROM_ENV):
+    atexit.register(lambda: write_prometheus(os.environ[METRICS_PROM_ENV]))
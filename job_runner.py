@@ -0,0 +1,245 @@
+# job_runner.py
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+# Journals of running (or interrupted) jobs; completed ones are renamed to *.done
+JOURNAL_DIR = ".jobs"
+
+# Completed keys are buffered and written in batches of this size, or after FLUSH_SECONDS
+FLUSH_EVERY = 50
+FLUSH_SECONDS = 5.0
+
+# Seconds between progress lines
+PROGRESS_EVERY = 10.0
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Stable shard number of a key (crc32, so every process and host agrees)."""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+def shard_keys(keys: Iterable[str], shard: int = 0, shards: int = 1) -> List[str]:
+    """The keys belonging to one shard, in input order."""
+    if not 0 <= shard < shards:
+        raise ValueError(f"shard must be in [0, {shards})")
+    keys = list(keys)
+    if shards == 1:
+        return keys
+    return [key for key in keys if shard_of(key, shards) == shard]
+
+
+def shard_suffix(path: str, shard: int = 0, shards: int = 1) -> str:
+    """Per-shard variant of an output path, e.g. market_data.csv -> market_data.shard-2-of-4.csv."""
+    if shards == 1:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{shard}-of-{shards}{ext}"
+
+
+def journal_path(job: str, shard: int = 0, shards: int = 1, directory: str = JOURNAL_DIR) -> str:
+    return shard_suffix(os.path.join(directory, f"{job}.jsonl"), shard, shards)
+
+
+class Progress:
+    """Counts completed keys and prints done/total, rate and ETA every PROGRESS_EVERY seconds."""
+
+    def __init__(self, total: int, done: int = 0, label: str = "", every: float = PROGRESS_EVERY):
+        self.total = total
+        self.done = done
+        self.label = label
+        self.every = every
+        self._start_done = done
+        self._start = time.monotonic()
+        self._last_print = self._start
+
+    def update(self, n: int = 1):
+        self.done += n
+        now = time.monotonic()
+        if now - self._last_print >= self.every or self.done >= self.total:
+            self._last_print = now
+            print(self.line())
+
+    def snapshot(self) -> Dict:
+        elapsed = time.monotonic() - self._start
+        rate = (self.done - self._start_done) / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.done)
+        return {'done': self.done, 'total': self.total, 'rate_per_s': round(rate, 2),
+                'eta_s': round(remaining / rate, 1) if rate > 0 else None}
+
+    def line(self) -> str:
+        s = self.snapshot()
+        pct = 100.0 * s['done'] / self.total if self.total else 100.0
+        eta = time.strftime('%H:%M:%S', time.gmtime(s['eta_s'])) if s['eta_s'] is not None else '?'
+        return f"[{self.label}] {s['done']}/{s['total']} ({pct:.1f}%), {s['rate_per_s']}/s, ETA {eta}"
+
+
+class JobJournal:
+    """
+    Append-only JSONL journal of the keys a job has completed.
+
+    The first line records the job parameters and start time; each following
+    line is {"key", "status", "value"}. Lines are buffered and appended in
+    batches with an fsync, so a crash loses at most one unflushed batch, and
+    a torn last line is cut off on the next open. A restarted job skips the
+    keys already marked "ok"; "failed" keys are attempted again.
+
+    A journal is only resumed if its parameters match and it is younger than
+    max_age seconds; otherwise the job starts fresh. complete() renames it to
+    *.done so the next run starts a new job.
+    """
+
+    def __init__(self, path: str, params: Optional[Dict] = None, max_age: Optional[float] = None,
+                 resume: bool = True, flush_every: int = FLUSH_EVERY, flush_seconds: float = FLUSH_SECONDS):
+        self.path = path
+        self.params = params or {}
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self.entries: Dict[str, Dict] = {}
+        self._buffer: List[str] = []
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        header = self._load() if resume and os.path.exists(path) else None
+        if header is not None and (header.get('params') != self.params or
+                                   (max_age is not None and time.time() - header.get('started', 0) > max_age)):
+            print(f"Journal {path} is from a different or stale job; starting fresh")
+            header = None
+            self.entries = {}
+        if header is None:
+            self.started = time.time()
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({'job': os.path.basename(path), 'params': self.params,
+                                         'started': self.started}) + '\n')
+            self._sync()
+        else:
+            self.started = header['started']
+            self._file = open(path, 'a', encoding='utf-8')
+            print(f"Resuming {path}: {len(self.done_keys())} keys already done")
+
+    def _load(self) -> Optional[Dict]:
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            # Torn write from a crash: drop the partial line
+            with open(self.path, 'r+b') as f:
+                f.truncate(end)
+        lines = data[:end].splitlines()
+        if not lines:
+            return None
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            return None
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.entries[entry['key']] = entry
+        return header
+
+    def done_keys(self) -> set:
+        return {key for key, entry in self.entries.items() if entry.get('status') == 'ok'}
+
+    def __contains__(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry.get('status') == 'ok'
+
+    def pending(self, keys: Iterable[str]) -> List[str]:
+        """Keys not yet completed, in input order."""
+        return [key for key in keys if key not in self]
+
+    def record(self, key: str, value: Any = None, status: str = 'ok'):
+        entry = {'key': key, 'status': status, 'value': value}
+        self.entries[key] = entry
+        self._buffer.append(json.dumps(entry, default=_json_default))
+        if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer = []
+            self._sync()
+        self._last_flush = time.monotonic()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def results(self, status: Optional[str] = None) -> Dict[str, Any]:
+        """Latest value per key, optionally only for one status."""
+        return {key: entry.get('value') for key, entry in self.entries.items()
+                if status is None or entry.get('status') == status}
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def complete(self):
+        """Close the journal and set it aside as *.done; the next run starts a new job."""
+        self.close()
+        os.replace(self.path, self.path + '.done')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _json_default(value):
+    # numpy / pandas scalars
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def journal_status(path: str) -> Dict:
+    """Summary of a journal file: job parameters, age and counts per status."""
+    counts: Dict[str, int] = {}
+    header = {}
+    latest = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for i, line in enumerate(f):
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if i == 0:
+                header = entry
+            else:
+                latest[entry['key']] = entry.get('status')
+    for status in latest.values():
+        counts[status] = counts.get(status, 0) + 1
+    started = header.get('started')
+    return {'journal': path, 'params': header.get('params'), 'counts': counts,
+            'age_s': round(time.time() - started, 1) if started else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the state of checkpointed jobs.")
+    parser.add_argument('--dir', default=JOURNAL_DIR)
+    parser.add_argument('--all', action='store_true', help="Include completed (*.done) journals")
+    args = parser.parse_args(argv)
+    paths = sorted(glob.glob(os.path.join(args.dir, '*.jsonl')))
+    if args.all:
+        paths += sorted(glob.glob(os.path.join(args.dir, '*.jsonl.done')))
+    if not paths:
+        print(f"No journals in {args.dir}")
+        return 1
+    for path in paths:
+        print(json.dumps(journal_status(path)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+# lookup_client.py
+# Thin client for lookup_service.py. Only the standard library is imported so
+# a call costs interpreter startup plus one local round trip.
+import argparse
+import http.client
+import json
+import socket
+import sys
+from urllib.parse import quote, urlencode
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+TIMEOUT = 120
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, socket_path, timeout=TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class LookupClient:
+    """Keeps one connection to the lookup service open across calls."""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=TIMEOUT):
+        if socket_path:
+            self.conn = UnixHTTPConnection(socket_path, timeout=timeout)
+        else:
+            self.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def request(self, method, path, payload=None):
+        """Send one request; returns (status, decoded JSON body)."""
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+
+    def info(self, symbol, refresh=False):
+        return self.request('GET', f"/info/{quote(symbol)}" + ("?refresh=1" if refresh else ""))
+
+    def search(self, query, max_results=5):
+        return self.request('GET', "/search?" + urlencode({'q': query, 'max_results': max_results}))
+
+    def batch(self, names):
+        return self.request('POST', "/batch", {'names': list(names)})
+
+    def stats(self):
+        return self.request('GET', "/stats")
+
+    def close(self):
+        self.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a running lookup_service.py.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', default=None, help="Unix socket of the service")
+    commands = parser.add_subparsers(dest='command', required=True)
+    info = commands.add_parser('info', help="Company info for ticker symbols")
+    info.add_argument('symbols', nargs='+')
+    info.add_argument('--refresh', action='store_true')
+    search = commands.add_parser('search', help="Search companies by name")
+    search.add_argument('query')
+    search.add_argument('--max-results', type=int, default=5)
+    batch = commands.add_parser('batch', help="Match a file of company names (one per line, '-' for stdin)")
+    batch.add_argument('file')
+    commands.add_parser('stats', help="Service cache and metrics")
+    args = parser.parse_args(argv)
+
+    client = LookupClient(args.host, args.port, args.socket)
+    try:
+        if args.command == 'info':
+            results = [client.info(symbol, args.refresh) for symbol in args.symbols]
+        elif args.command == 'search':
+            results = [client.search(args.query, args.max_results)]
+        elif args.command == 'batch':
+            f = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+            with f:
+                names = [line.strip() for line in f if line.strip()]
+            results = [client.batch(names)]
+        else:
+            results = [client.stats()]
+    except (ConnectionError, socket.error) as e:
+        print(f"Could not reach the lookup service: {e}", file=sys.stderr)
+        return 2
+    finally:
+        client.close()
+
+    failed = False
+    for status, body in results:
+        print(json.dumps(body, indent=2))
+        failed = failed or status != 200
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# lookup_service.py
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlparse
+
+from instrumentation import metrics, span
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+
+# Threads running the blocking lookups (cache reads, Yahoo calls, batch matching)
+MAX_WORKERS = 8
+
+# Largest request body accepted, e.g. for /batch name lists
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 60
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def _json_default(value):
+    # numpy / pandas scalars
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _clean(value):
+    """Replace NaN with None so responses are valid JSON."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clean(v) for v in value]
+    return value
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LookupService:
+    """
+    Local HTTP/JSON service for company lookups with warm in-memory state.
+
+    The ticker index, batch matcher and info cache are loaded once at startup
+    and shared by all requests. Connections are handled on one asyncio loop;
+    the blocking lookups run on a thread pool so slow Yahoo calls do not hold
+    up cached answers.
+
+    Endpoints:
+        GET  /info/<symbol>[?refresh=1]        company_info.get_company_info
+        GET  /search?q=<name>[&max_results=5]  search_ticker.search_companies
+        POST /batch  {"names": [...]}          search_ticker.process_company_list
+        GET  /health                           liveness and uptime
+        GET  /stats                            info cache and instrumentation metrics
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lookup')
+        self.started = time.time()
+        self.routes = {
+            ('GET', 'info'): self.info,
+            ('GET', 'search'): self.search,
+            ('POST', 'batch'): self.batch,
+            ('GET', 'health'): self.health,
+            ('GET', 'stats'): self.stats,
+        }
+
+    def warm_up(self):
+        """Import the lookup modules and load the index and cache before serving."""
+        from company_info import get_company_info
+        from info_cache import get_cache
+        from search_ticker import process_company_list, search_companies
+        from ticker_index import get_index
+
+        self.get_company_info = get_company_info
+        self.search_companies = search_companies
+        self.process_company_list = process_company_list
+        self.cache = get_cache()
+        get_index()
+
+    def info(self, path_args, params, body):
+        if not path_args:
+            raise HttpError(400, "Usage: /info/<symbol>")
+        symbol = path_args[0].upper()
+        refresh = params.get('refresh', ['0'])[0] in ('1', 'true')
+        info = self.get_company_info(symbol, refresh=refresh)
+        if info is None:
+            raise HttpError(404, f"No information found for {symbol}")
+        return info
+
+    def search(self, path_args, params, body):
+        query = params.get('q', [''])[0].strip()
+        if not query:
+            raise HttpError(400, "Missing query parameter q")
+        return self.search_companies(query, max_results=int(params.get('max_results', ['5'])[0]))
+
+    def batch(self, path_args, params, body):
+        names = body.get('names') if isinstance(body, dict) else None
+        if not isinstance(names, list):
+            raise HttpError(400, 'Expected a JSON body like {"names": [...]}')
+        return self.process_company_list([str(name) for name in names])
+
+    def health(self, path_args, params, body):
+        return {'status': 'ok', 'uptime_s': round(time.time() - self.started, 1), 'pid': os.getpid()}
+
+    def stats(self, path_args, params, body):
+        return {'info_cache': self.cache.stats(), 'metrics': metrics.snapshot()}
+
+    async def dispatch(self, method, target, body):
+        parsed = urlparse(target)
+        parts = [unquote(p) for p in parsed.path.strip('/').split('/') if p]
+        if not parts:
+            raise HttpError(404, "Unknown endpoint")
+        handler = self.routes.get((method, parts[0]))
+        if handler is None:
+            if any(route == parts[0] for _, route in self.routes):
+                raise HttpError(405, f"{method} not allowed on /{parts[0]}")
+            raise HttpError(404, f"Unknown endpoint /{parts[0]}")
+        payload = json.loads(body) if body else None
+        loop = asyncio.get_running_loop()
+        with span('service_request', endpoint=parts[0]):
+            return await loop.run_in_executor(self.executor, handler, parts[1:], parse_qs(parsed.query), payload)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'Malformed request line'}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() != 'HTTP/1.0')
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': 'Request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                try:
+                    status, result = 200, _clean(await self.dispatch(method.upper(), target, body))
+                except HttpError as e:
+                    status, result = e.status, {'error': str(e)}
+                except ValueError as e:
+                    status, result = 400, {'error': str(e)}
+                except Exception as e:
+                    status, result = 500, {'error': f"{type(e).__name__}: {e}"}
+                metrics.incr('service_responses', status=status)
+                await self._respond(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, default=_json_default).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.warm_up)
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+            print(f"Lookup service listening on {socket_path}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Lookup service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve company lookups over local HTTP/JSON.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', default=None, help="Listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Threads for blocking lookups")
+    args = parser.parse_args()
+
+    service = LookupService(max_workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# market_cap_store.py
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import date as date_type
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent writers are not serialized
+    fcntl = None
+
+# Root directory of the history store
+HISTORY_DIR = "market_cap_history"
+
+# Rows per Parquet row group. Partitions are sorted by ticker, so row group
+# statistics let single-ticker queries skip most of each file.
+ROW_GROUP_SIZE = 8192
+
+# Daily per-exchange totals, kept next to the partitions so range sums read a tiny file.
+# The leading underscore keeps it out of the partitioned dataset.
+EXCHANGE_TOTALS_FILE = "_exchange_totals.parquet"
+
+# Lock file serializing writers, e.g. shard processes appending to the same day
+LOCK_FILE = "_write.lock"
+
+SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('Ticker', pa.string()),
+    ('MarketCap', pa.int64()),
+    ('Currency', pa.dictionary(pa.int16(), pa.string())),
+    ('Market', pa.dictionary(pa.int16(), pa.string())),
+])
+
+TOTALS_SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('Market', pa.string()),
+    ('MarketCap', pa.int64()),
+])
+
+
+def _to_date(value):
+    return pd.Timestamp(value).date()
+
+
+def partition_path(day, root=HISTORY_DIR):
+    """Monthly partition file holding the snapshots of `day`, e.g. month=2024-05/data.parquet."""
+    return os.path.join(root, f"month={day:%Y-%m}", "data.parquet")
+
+
+def _to_table(results_df, day):
+    """Convert get_market_cap results to the compact store schema."""
+    frame = pd.DataFrame({
+        'date': pd.Series([day] * len(results_df), dtype=object),
+        'Ticker': results_df['Ticker'].astype(str).values,
+        'MarketCap': pd.to_numeric(results_df['MarketCap'], errors='coerce').round().astype('Int64').values,
+        'Currency': results_df['Currency'].replace('N/A', None).values,
+        'Market': results_df['Market'].replace('N/A', None).values,
+    })
+    return pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+
+
+def append_snapshot(results_df, day=None, root=HISTORY_DIR):
+    """
+    Store one run of market data (columns Ticker, MarketCap, Currency, Market).
+
+    Rows are merged into the monthly partition: existing rows for the same
+    date and tickers are replaced, so a partial run only updates its tickers.
+    The partition is rewritten atomically, sorted by ticker and date. Writers
+    hold a lock on the store, so shards appending at once keep each other's rows.
+
+    Returns:
+        str: Path of the partition file written
+    """
+    day = _to_date(day) if day is not None else date_type.today()
+    new_table = _to_table(results_df, day)
+    path = partition_path(day, root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with _write_lock(root):
+        if os.path.exists(path):
+            existing = pq.read_table(path, memory_map=True).cast(SCHEMA)
+            replaced = pc.and_(pc.equal(existing['date'], pa.scalar(day, pa.date32())),
+                               pc.is_in(existing['Ticker'], value_set=new_table['Ticker']))
+            existing = existing.filter(pc.invert(replaced))
+            table = pa.concat_tables([existing, new_table]).unify_dictionaries()
+        else:
+            table = new_table
+        table = table.sort_by([('Ticker', 'ascending'), ('date', 'ascending')])
+
+        _write_atomic(table, path)
+        _update_exchange_totals(table.filter(pc.equal(table['date'], pa.scalar(day, pa.date32()))), day, root)
+    return path
+
+
+@contextmanager
+def _write_lock(root):
+    """Exclusive lock on the store for one read-modify-write (released when the file closes)."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, LOCK_FILE), 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+def _write_atomic(table, path):
+    # Unique temp name; the leading dot keeps a half-written file out of the dataset
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.', suffix='.tmp')
+    os.close(fd)
+    try:
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _update_exchange_totals(day_table, day, root):
+    """Recompute the per-exchange totals of one date in the rollup file."""
+    day_table = day_table.select(['date', 'Market', 'MarketCap'])
+    day_table = day_table.set_column(1, 'Market', day_table['Market'].cast(pa.string()))
+    totals = day_table.group_by(['date', 'Market']).aggregate([('MarketCap', 'sum')])
+    totals = totals.rename_columns(['date', 'Market', 'MarketCap']).cast(TOTALS_SCHEMA)
+
+    path = os.path.join(root, EXCHANGE_TOTALS_FILE)
+    if os.path.exists(path):
+        existing = pq.read_table(path).cast(TOTALS_SCHEMA)
+        existing = existing.filter(pc.not_equal(existing['date'], pa.scalar(day, pa.date32())))
+        totals = pa.concat_tables([existing, totals])
+    _write_atomic(totals.sort_by([('date', 'ascending'), ('Market', 'ascending')]), path)
+
+
+def _dataset(root=HISTORY_DIR):
+    # Memory-mapped reads; the month directory is only used for partition pruning
+    return ds.dataset(root, format='parquet', partitioning='hive',
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def _month_filter(start, end):
+    """Partition filter covering the months between two dates."""
+    expr = None
+    if start is not None:
+        expr = ds.field('month') >= f"{start:%Y-%m}"
+    if end is not None:
+        upper = ds.field('month') <= f"{end:%Y-%m}"
+        expr = upper if expr is None else expr & upper
+    return expr
+
+
+def _scan(columns, start=None, end=None, extra=None, root=HISTORY_DIR):
+    """Read columns from the store as an Arrow table, pruning partitions and row groups."""
+    if not os.path.isdir(root):
+        return pa.table({name: pa.array([], SCHEMA.field(name).type) for name in columns})
+    start = _to_date(start) if start is not None else None
+    end = _to_date(end) if end is not None else None
+    expr = _month_filter(start, end)
+    if start is not None:
+        expr = expr & (ds.field('date') >= pa.scalar(start, pa.date32()))
+    if end is not None:
+        expr = expr & (ds.field('date') <= pa.scalar(end, pa.date32()))
+    if extra is not None:
+        expr = extra if expr is None else expr & extra
+    return _dataset(root).to_table(columns=columns, filter=expr)
+
+
+def _to_pandas(table):
+    # Keep market caps as nullable int64 instead of float
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def top_n(day, n=10, root=HISTORY_DIR):
+    """Largest n tickers by market cap on a date."""
+    table = _scan(['Ticker', 'MarketCap', 'Currency', 'Market'], start=day, end=day, root=root)
+    table = table.filter(pc.is_valid(table['MarketCap']))
+    return _to_pandas(table.sort_by([('MarketCap', 'descending')]).slice(0, n))
+
+
+def cap_history(ticker, start=None, end=None, root=HISTORY_DIR):
+    """Market cap history for one ticker, oldest first."""
+    table = _scan(['date', 'MarketCap', 'Currency', 'Market'], start=start, end=end,
+                  extra=ds.field('Ticker') == ticker, root=root)
+    return _to_pandas(table.sort_by('date'))
+
+
+def sum_by_exchange(start, end, root=HISTORY_DIR):
+    """Total market cap per exchange (Market) and date between two dates, inclusive."""
+    path = os.path.join(root, EXCHANGE_TOTALS_FILE)
+    if not os.path.exists(path):
+        return _to_pandas(TOTALS_SCHEMA.empty_table())
+    totals = pq.read_table(path, memory_map=True, filters=[
+        ('date', '>=', _to_date(start)), ('date', '<=', _to_date(end))])
+    return _to_pandas(totals)
+
+
+def load_history(start=None, end=None, root=HISTORY_DIR):
+    """All stored rows between two dates (inclusive)."""
+    return _to_pandas(_scan([f.name for f in SCHEMA], start=start, end=end, root=root))
@@ -0,0 +1,178 @@
+# mktcap.py
+# Single entry point for the ticker tools. Only argparse and the standard
+# library are imported up front; each subcommand imports what it needs, so a
+# cached lookup never loads pandas, yfinance or scipy.
+import argparse
+import json
+import sys
+
+# Quote fields shown by `caps`; same as get_market_cap.DETAIL_FIELDS
+CAPS_FIELDS = ['marketCap', 'currency', 'exchange']
+
+
+def _print(records, as_json):
+    if as_json:
+        print(json.dumps(records, indent=2, default=str))
+        return
+    for record in records:
+        print("-" * 50)
+        for key, value in record.items():
+            print(f"{key}: {value}")
+
+
+def cmd_info(args):
+    from company_info import get_company_info
+
+    records = [get_company_info(symbol.upper(), refresh=args.refresh) for symbol in args.symbols]
+    _print([r for r in records if r], args.json)
+    return 0 if all(records) else 1
+
+
+def cmd_search(args):
+    from search_ticker import search_companies
+
+    results = search_companies(args.query, max_results=args.max_results)
+    _print(results, args.json)
+    return 0 if results else 1
+
+
+def cmd_caps(args):
+    if not args.symbols:
+        # Whole universe: the bulk path writes market_data.csv and the history store
+        import get_market_cap
+        get_market_cap.main(changed_only=args.changed_only, source=args.source,
+                            shard=args.shard, shards=args.shards, resume=not args.restart)
+        return 0
+
+    from info_cache import get_cache
+    cache = get_cache()
+    symbols = [s.upper() for s in args.symbols]
+    found = {}
+    for symbol in symbols:
+        cached = None if args.refresh else cache.lookup(symbol, CAPS_FIELDS)
+        if cached is not None:
+            found[symbol] = cached
+    missing = [s for s in symbols if s not in found]
+    if missing:
+        # One batched quote request for everything not cached
+        from yahoo_quotes import get_quotes
+        quotes = get_quotes(missing, fields=CAPS_FIELDS, refresh=args.refresh)
+        for symbol, row in zip(missing, quotes.to_dict('records')):
+            found[symbol] = {k: (None if v != v else v) for k, v in row.items()}
+
+    records = [{'ticker': s,
+                'market_cap': found[s].get('marketCap'),
+                'currency': found[s].get('currency'),
+                'exchange': found[s].get('exchange')} for s in symbols]
+    _print(records, args.json)
+    return 0 if all(r['market_cap'] is not None for r in records) else 1
+
+
+def cmd_tickers(args):
+    if args.delta:
+        from get_us_tickers import TickerDirectoryError
+        from ticker_delta import refresh_master
+        try:
+            refresh_master()
+        except TickerDirectoryError as e:
+            print(f"Ticker refresh aborted, master left unchanged: {e}")
+            return 1
+    else:
+        from get_us_tickers import NASDAQ_LISTED_URL, OTHER_LISTED_URL, OUTPUT_CSV_FILE, fetch_and_save_tickers
+        fetch_and_save_tickers(NASDAQ_LISTED_URL, OTHER_LISTED_URL, args.output or OUTPUT_CSV_FILE)
+    return 0
+
+
+def cmd_filings(args):
+    import fetch_sec_filings as fsf
+
+    tickers = [t.upper() for t in args.tickers] or fsf.get_tickers_from_csv(fsf.CSV_TICKER_FILE)
+    if not tickers:
+        return 1
+    store_dir = None if args.no_store else args.store or fsf.STORE_DIR
+    fsf.download_filings(tickers, args.forms, args.start or fsf.start_date_str, args.end or fsf.end_date_str,
+                         args.dir or fsf.DOWNLOAD_DIR, fsf.USER_AGENT,
+                         shard=args.shard, shards=args.shards, resume=not args.restart,
+                         store=fsf.FilingStore(store_dir) if store_dir else None,
+                         keep_raw=args.keep_raw or fsf.KEEP_RAW_FILINGS)
+    return 0
+
+
+def cmd_analytics(args):
+    from cap_analytics import main as analytics_main
+
+    argv = ['--input', args.input, '--top', str(args.top)]
+    if args.by:
+        argv += ['--by', args.by]
+    if args.index:
+        argv += ['--index'] + (['--start', args.start] if args.start else []) + (['--end', args.end] if args.end else [])
+    return analytics_main(argv)
+
+
+def _add_job_args(parser):
+    parser.add_argument('--shard', type=int, default=0, help="This process's shard (0-based)")
+    parser.add_argument('--shards', type=int, default=1, help="Split the tickers across this many processes/hosts")
+    parser.add_argument('--restart', action='store_true', help="Ignore the journal of an interrupted run")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='mktcap', description="Ticker, market cap and filing tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info = commands.add_parser('info', help="Company info for ticker symbols")
+    info.add_argument('symbols', nargs='+')
+    info.add_argument('--refresh', action='store_true', help="Ignore cached data")
+    info.add_argument('--json', action='store_true')
+    info.set_defaults(func=cmd_info)
+
+    search = commands.add_parser('search', help="Find tickers by company name")
+    search.add_argument('query')
+    search.add_argument('-n', '--max-results', type=int, default=5)
+    search.add_argument('--json', action='store_true')
+    search.set_defaults(func=cmd_search)
+
+    caps = commands.add_parser('caps', help="Market caps for symbols, or for the whole ticker list")
+    caps.add_argument('symbols', nargs='*')
+    caps.add_argument('--source', choices=['batch', 'per_ticker', 'companyfacts'], default='batch',
+                      help="Bulk mode data source (without symbols)")
+    caps.add_argument('--changed-only', action='store_true', help="Bulk mode: only tickers changed in the last refresh")
+    caps.add_argument('--refresh', action='store_true', help="Ignore cached data")
+    caps.add_argument('--json', action='store_true')
+    _add_job_args(caps)
+    caps.set_defaults(func=cmd_caps)
+
+    tickers = commands.add_parser('tickers', help="Download the NASDAQ symbol directories")
+    tickers.add_argument('--delta', action='store_true', help="Refresh the master list and log changes")
+    tickers.add_argument('--output', default=None)
+    tickers.set_defaults(func=cmd_tickers)
+
+    filings = commands.add_parser('filings', help="Download SEC filings with sec_edgar_downloader")
+    filings.add_argument('tickers', nargs='*', help="Default: every ticker in us_stock_tickers.csv")
+    filings.add_argument('--forms', nargs='+', default=['10-K', '10-Q'])
+    filings.add_argument('--start', default=None, help="YYYY-MM-DD")
+    filings.add_argument('--end', default=None, help="YYYY-MM-DD")
+    filings.add_argument('--dir', default=None, help="Download directory")
+    filings.add_argument('--store', default=None, help="Filing store directory new filings are moved into")
+    filings.add_argument('--no-store', action='store_true', help="Keep the downloaded folders, no filing store")
+    filings.add_argument('--keep-raw', action='store_true', help="Keep the downloaded folders as well as storing them")
+    _add_job_args(filings)
+    filings.set_defaults(func=cmd_filings)
+
+    analytics = commands.add_parser('analytics', help="Market cap totals, ranks and cap-weighted indices")
+    analytics.add_argument('--input', default='market_data.csv', help="get_market_cap output CSV")
+    analytics.add_argument('--by', default=None, choices=['sector', 'industry', 'exchange', 'SizeBucket', 'Currency'])
+    analytics.add_argument('--top', type=int, default=10, help="Largest tickers to list")
+    analytics.add_argument('--index', action='store_true', help="Cap-weighted index levels from the history store")
+    analytics.add_argument('--start', default=None, help="YYYY-MM-DD (with --index)")
+    analytics.add_argument('--end', default=None, help="YYYY-MM-DD (with --index)")
+    analytics.set_defaults(func=cmd_analytics)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,304 @@
+# rate_limiter.py
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Tuple
+from urllib.parse import urlparse
+
+from instrumentation import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: limiter state is per process
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by all workers of a bulk job.
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    Each request takes one token, blocking until one is available, so a
+    pool of workers never exceeds the configured request rate as a whole.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available right now; never blocks."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """Exponential backoff delay in seconds for the given retry attempt (0-based)."""
+    return min(cap, base * (2 ** attempt))
+
+
+# Shared limiter state lives here, one small file per host, so separate
+# processes (parallel pipelines) draw from the same budget
+RATE_LIMIT_DIR = os.environ.get('MKTCAP_RATE_LIMIT_DIR') or os.path.join(tempfile.gettempdir(), 'mktcap_rate_limits')
+
+# AIMD: the rate is multiplied by DECREASE_FACTOR on a 429/503 (at most once per
+# pause) and grows by INCREASE_STEP requests/s for each second's worth of clean responses
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.5
+# The adapted rate never drops below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.05
+ADAPTIVE_STATUSES = {429, 503}
+FAILURE_STATUSES = {500, 502, 504}
+
+# Circuit breaker: this many consecutive failures pause the host for OPEN_SECONDS
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30.0
+
+# State not touched for this long is reset to the configured rate
+STATE_TTL = 600.0
+
+# Rounds of retries for keys deferred while a host was failing
+DEFERRED_ROUNDS = 3
+
+# tokens, last refill, adapted rate, circuit open until, consecutive failures
+_STATE = struct.Struct('<5d')
+
+
+def host_key(url: str) -> str:
+    """Limiter key for a URL: the registered domain (query1.finance.yahoo.com -> yahoo.com) or host:port."""
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    if not host or host == 'localhost' or host.replace('.', '').isdigit() or ':' in host:
+        return parsed.netloc.lower() or 'local'
+    return '.'.join(host.split('.')[-2:])
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every thread and process using the same key.
+
+    The bucket lives in a file under RATE_LIMIT_DIR, updated under an
+    exclusive flock, so several pipelines hitting one host stay within one
+    budget. The rate adapts (AIMD): throttling responses halve it for all
+    sharers, clean responses raise it again up to the configured `rate`.
+    Throttling, and FAILURE_THRESHOLD consecutive failures, also open a
+    circuit breaker: acquire() blocks in every process until it closes.
+    Without fcntl (Windows) the state is kept per process.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: float = None, min_rate: float = None,
+                 state_dir: str = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.key = key
+        self.max_rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate * MIN_RATE_FRACTION
+        self.capacity = float(capacity) if capacity else max(1.0, self.max_rate)
+        self._lock = threading.Lock()
+        self._fd = None
+        self._local = None
+        if fcntl is not None:
+            state_dir = state_dir or RATE_LIMIT_DIR
+            os.makedirs(state_dir, exist_ok=True)
+            name = ''.join(c if c.isalnum() or c in '.-' else '_' for c in key)
+            self._fd = os.open(os.path.join(state_dir, f"{name}.state"), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def _default(self, now):
+        return [self.capacity, now, self.max_rate, 0.0, 0.0]
+
+    @contextmanager
+    def _state(self):
+        """Yield the mutable state list under both the thread and the file lock, then save it."""
+        with self._lock:
+            now = time.time()
+            if self._fd is None:
+                if self._local is None or now - self._local[1] > STATE_TTL:
+                    self._local = self._default(now)
+                yield self._local, now
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                raw = os.pread(self._fd, _STATE.size, 0)
+                state = list(_STATE.unpack(raw)) if len(raw) == _STATE.size else None
+                if state is None or now - state[1] > STATE_TTL:
+                    state = self._default(now)
+                yield state, now
+                os.pwrite(self._fd, _STATE.pack(*state), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _rate(self, state):
+        # Each sharer caps the shared rate at its own configured ceiling
+        return min(self.max_rate, max(self.min_rate, state[2]))
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take `tokens` if available and the circuit is closed; never blocks."""
+        return self._take(tokens) == 0.0
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until the circuit is closed and `tokens` are available, then take them."""
+        while True:
+            wait = self._take(tokens)
+            if wait == 0.0:
+                return
+            time.sleep(wait)
+
+    def _take(self, tokens):
+        """Take tokens and return 0.0, or return the seconds to wait before trying again."""
+        with self._state() as (state, now):
+            if state[3] > now:
+                return state[3] - now
+            rate = self._rate(state)
+            state[0] = min(self.capacity, state[0] + max(0.0, now - state[1]) * rate)
+            state[1] = now
+            if state[0] >= tokens:
+                state[0] -= tokens
+                return 0.0
+            return (tokens - state[0]) / rate
+
+    def wait_closed(self):
+        """Block while the circuit breaker is open."""
+        while True:
+            with self._state() as (state, now):
+                wait = state[3] - now
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def succeeded(self):
+        """Record a clean response: resets the failure count and grows the rate additively."""
+        with self._state() as (state, now):
+            rate = self._rate(state)
+            state[2] = min(self.max_rate, rate + INCREASE_STEP / rate)
+            state[4] = 0.0
+
+    def throttled(self, retry_after: float = None) -> float:
+        """
+        Record a 429/503: halves the shared rate and pauses the host for
+        Retry-After (or the backoff for the current failure streak).
+        Throttling seen while that pause is still running (requests sent
+        before it began) only extends it to Retry-After, so a burst of
+        concurrent 429s cuts the rate once. Returns the pause in seconds.
+        """
+        with self._state() as (state, now):
+            if state[3] > now:
+                if retry_after is not None:
+                    state[3] = max(state[3], now + retry_after)
+                delay = state[3] - now
+            else:
+                state[4] += 1
+                state[2] = max(self.min_rate, self._rate(state) * DECREASE_FACTOR)
+                delay = retry_after if retry_after is not None else backoff_delay(int(state[4]) - 1)
+                state[3] = now + delay
+                state[0] = 0.0
+        metrics.incr('throttled', host=self.key)
+        return delay
+
+    def failed(self) -> float:
+        """
+        Record a server error or connection failure. Returns the backoff delay;
+        after FAILURE_THRESHOLD failures in a row the circuit opens for every sharer.
+        """
+        with self._state() as (state, now):
+            state[4] += 1
+            delay = backoff_delay(int(state[4]) - 1)
+            if state[4] >= FAILURE_THRESHOLD and state[3] <= now:
+                state[3] = now + max(OPEN_SECONDS, delay)
+                metrics.incr('circuit_open', host=self.key)
+        return delay
+
+    def record(self, status: int, retry_after: str = None) -> float:
+        """Feed an HTTP status back into the limiter; returns the delay before a retry (0 on success)."""
+        if status in ADAPTIVE_STATUSES:
+            seconds = float(retry_after) if retry_after and retry_after.strip().isdigit() else None
+            return self.throttled(seconds)
+        if status in FAILURE_STATUSES:
+            return self.failed()
+        self.succeeded()
+        return 0.0
+
+    def stats(self) -> Dict:
+        with self._state() as (state, now):
+            return {'key': self.key, 'rate': round(self._rate(state), 3), 'failures': int(state[4]),
+                    'open_for': round(max(0.0, state[3] - now), 3)}
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(key: str, rate: float, capacity: float = None) -> AdaptiveRateLimiter:
+    """Return this process's shared limiter for a host key and configured rate."""
+    with _limiters_lock:
+        limiter = _limiters.get((key, rate, capacity))
+        if limiter is None:
+            limiter = _limiters[(key, rate, capacity)] = AdaptiveRateLimiter(key, rate, capacity)
+        return limiter
+
+
+class DeferredRetries:
+    """
+    Keys that failed while their host was throttling or down.
+
+    Instead of being dropped they are collected here and retried in up to
+    `rounds` later passes; each pass first waits for the limiter's circuit to
+    close. Keys that still fail are left in `failed`.
+    """
+
+    def __init__(self, limiter: AdaptiveRateLimiter, rounds: int = DEFERRED_ROUNDS):
+        self.limiter = limiter
+        self.rounds = rounds
+        self.pending: Dict[Hashable, BaseException] = {}
+        self.failed: Dict[Hashable, BaseException] = {}
+
+    def add(self, key: Hashable, error: BaseException = None):
+        self.pending[key] = error
+        metrics.incr('deferred', host=self.limiter.key)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def run(self, fn: Callable[[Hashable], Any]) -> Iterator[Tuple[Hashable, Any]]:
+        """Retry the deferred keys with fn (which raises on failure); yields (key, result) for successes."""
+        for attempt in range(self.rounds):
+            if not self.pending:
+                break
+            keys, self.pending = list(self.pending), {}
+            print(f"Retrying {len(keys)} deferred keys for {self.limiter.key} (round {attempt + 1}/{self.rounds})")
+            time.sleep(backoff_delay(attempt))
+            self.limiter.wait_closed()
+            for key in keys:
+                try:
+                    yield key, fn(key)
+                except Exception as e:
+                    self.pending[key] = e
+        self.failed.update(self.pending)
+        self.pending = {}
@@ -0,0 +1,351 @@
+# run_benchmarks.py
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from queue import Empty
+
+import requests
+
+from fake_api_server import FakeApiServer, MASTER_CSV_FILE
+
+# Directory for JSON results
+RESULTS_DIR = "benchmark_results"
+
+# A case regresses if throughput drops or p99 latency grows by more than this share
+REGRESSION_TOLERANCE = 0.15
+
+# Subprocess runs per command in the startup benchmark
+STARTUP_RUNS = 10
+
+DEFAULT_CASES = ['get_ticker_details', 'market_caps_bulk', 'market_caps_batched', 'search_companies',
+                 'process_company_list', 'fetch_10k_filings', 'fetch_10k_filings_cached', 'full_index_worklist',
+                 'download_filing']
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1]
+
+
+def _timed_map(fn, items, workers):
+    """Run fn over items on a thread pool; returns per-call latencies in seconds."""
+    def timed(item):
+        start = time.perf_counter()
+        fn(item)
+        return time.perf_counter() - start
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(timed, items))
+
+
+def _yahoo_info_fetcher(base_url):
+    """Info fetcher for InfoCache that reads the fake quoteSummary endpoint."""
+    session = requests.Session()
+
+    def fetch(symbol):
+        response = session.get(f"{base_url}/v10/finance/quoteSummary/{symbol}", timeout=30)
+        if response.status_code == 429:
+            raise Exception("429 Too Many Requests")
+        if response.status_code == 404:
+            return {}
+        response.raise_for_status()
+        return response.json()['quoteSummary']['result'][0]
+    return fetch
+
+
+def _configure(base_url, work_dir, args):
+    """Point every entry point at the fake server, with a cold cache."""
+    import info_cache
+    import search_ticker
+    import fetch_files_api
+    import yahoo_quotes
+    from edgar_client import EdgarClient
+
+    info_cache.set_cache(info_cache.InfoCache(os.path.join(work_dir, 'info_cache.sqlite'),
+                                              fetcher=_yahoo_info_fetcher(base_url)))
+    search_ticker.YAHOO_SEARCH_URL = f"{base_url}/v1/finance/search"
+    yahoo_quotes.set_client(yahoo_quotes.QuoteClient(quote_url=f"{base_url}/v7/finance/quote", crumb_url=None,
+                                                     cookie_url=None, rate=args.yahoo_rate))
+    fetch_files_api.SAVE_DIR = os.path.join(work_dir, '10k_reports')
+    os.makedirs(fetch_files_api.SAVE_DIR, exist_ok=True)
+    fetch_files_api.STORE_DIR = os.path.join(work_dir, 'filing_store')
+    fetch_files_api._store = None
+    fetch_files_api._client = EdgarClient(data_base_url=base_url, www_base_url=base_url,
+                                          rate=args.sec_rate, pool_size=args.workers,
+                                          cache_path=os.path.join(work_dir, 'edgar_http_cache.sqlite'))
+
+
+def _reset_server_stats(base_url):
+    from instrumentation import metrics
+    requests.get(f"{base_url}/_reset", timeout=30)
+    metrics.reset()
+
+
+def _run_case(name, base_url, symbols, names, args):
+    """
+    Run one case in the current process; returns (seconds, latencies).
+
+    Server request counters are reset right before the timed section, so
+    setup requests (e.g. building a download worklist) are not counted.
+    """
+    if name == 'get_ticker_details':
+        from get_market_cap import get_ticker_details
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        latencies = _timed_map(get_ticker_details, symbols, args.workers)
+    elif name == 'market_caps_bulk':
+        import get_market_cap
+        latencies = []
+
+        def provider(ticker, before_fetch=None):
+            call_start = time.perf_counter()
+            try:
+                return get_market_cap.fetch_ticker_details(ticker, before_fetch=before_fetch)
+            finally:
+                latencies.append(time.perf_counter() - call_start)
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        get_market_cap.fetch_market_caps_bulk(symbols, provider=provider, max_workers=args.workers,
+                                              rate=args.yahoo_rate)
+    elif name == 'market_caps_batched':
+        import get_market_cap
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        get_market_cap.fetch_market_caps_batched(symbols)
+        latencies = []
+    elif name == 'search_companies':
+        from search_ticker import search_companies
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        latencies = _timed_map(lambda n: search_companies(n, max_results=1), names, args.workers)
+    elif name == 'process_company_list':
+        from search_ticker import process_company_list
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        process_company_list(names)
+        latencies = []
+    elif name == 'fetch_10k_filings':
+        import fetch_files_api
+        ciks = [c['cik_str'] for c in fetch_files_api.fetch_cik_list().values()][:len(symbols)]
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        latencies = _timed_map(fetch_files_api.fetch_10k_filings, ciks, args.workers)
+    elif name == 'fetch_10k_filings_cached':
+        # Second nightly run: every submissions document is already in the HTTP cache
+        import fetch_files_api
+        ciks = [c['cik_str'] for c in fetch_files_api.fetch_cik_list().values()][:len(symbols)]
+        _timed_map(fetch_files_api.fetch_10k_filings, ciks, args.workers)
+        # Like a new process: no submissions memo and an empty parsed-JSON LRU, only the disk cache
+        from singleflight import SingleFlight
+        client = fetch_files_api.get_client()
+        client.submissions_flight = SingleFlight('sec_submissions')
+        client._json_lru.clear()
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        latencies = _timed_map(fetch_files_api.fetch_10k_filings, ciks, args.workers)
+    elif name == 'full_index_worklist':
+        import fetch_files_api
+        cik_list = fetch_files_api.fetch_cik_list()
+        cik_list = dict(list(cik_list.items())[:len(symbols)])
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        fetch_files_api.build_worklist_from_index(cik_list)
+        latencies = []
+    elif name == 'download_filing':
+        import fetch_files_api
+        ciks = [c['cik_str'] for c in fetch_files_api.fetch_cik_list().values()][:len(symbols)]
+        worklist = [(cik, fetch_files_api.fetch_10k_filings(cik)) for cik in ciks]
+        worklist = [(cik, filings[0][0]) for cik, filings in worklist if filings]
+        _reset_server_stats(base_url)
+        start = time.perf_counter()
+        latencies = _timed_map(lambda item: fetch_files_api.download_filing(*item), worklist, args.workers)
+    else:
+        raise ValueError(f"Unknown benchmark case: {name}")
+    return time.perf_counter() - start, latencies
+
+
+def _case_worker(name, base_url, symbols, names, args, queue):
+    # Runs in a child process so peak RSS and imports are measured per case
+    sys.stdout = open(os.devnull, 'w')
+    with tempfile.TemporaryDirectory() as work_dir:
+        _configure(base_url, work_dir, args)
+        seconds, latencies = _run_case(name, base_url, symbols, names, args)
+    from instrumentation import metrics
+    queue.put({
+        'seconds': seconds,
+        'latencies': latencies,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'metrics': metrics.snapshot(),
+    })
+
+
+def run_case(server, name, symbols, names, args):
+    """Run one case in a fresh process against the fake server and summarize it."""
+    server.reset_stats()
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_case_worker, args=(name, server.url, symbols, names, args, queue))
+    process.start()
+    while True:
+        try:
+            raw = queue.get(timeout=1)
+            break
+        except Empty:
+            if not process.is_alive():
+                raise RuntimeError(f"Benchmark case {name} exited with code {process.exitcode}")
+    process.join()
+
+    items = len(names) if name in ('search_companies', 'process_company_list') else len(symbols)
+    latencies = sorted(raw['latencies'])
+    p50 = _percentile(latencies, 50)
+    p99 = _percentile(latencies, 99)
+    return {
+        'items': items,
+        'seconds': round(raw['seconds'], 4),
+        'throughput_per_s': round(items / raw['seconds'], 2) if raw['seconds'] else None,
+        'p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+        'p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+        'peak_rss_mb': round(raw['peak_rss_mb'], 1),
+        'http': server.stats(),
+        'metrics': raw['metrics'],
+    }
+
+
+def _imported_modules(stderr):
+    # `python -X importtime` writes "import time: self | cumulative | module" lines
+    return {line.rsplit('|', 1)[-1].strip() for line in stderr.splitlines() if line.startswith('import time:')}
+
+
+def bench_startup(runs=STARTUP_RUNS):
+    """
+    Wall time of short-lived invocations, as a cron job or shell script would pay it.
+
+    Compares the bare interpreter, the imports every script used to load
+    eagerly, and `mktcap.py info` answering from a warm cache.
+    """
+    import info_cache
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = info_cache.InfoCache(os.path.join(work_dir, info_cache.CACHE_DB))
+        cache.put('AAPL', {'symbol': 'AAPL', 'longName': 'Apple Inc.', 'market': 'us_market',
+                           'marketCap': 3000000000000, 'currency': 'USD', 'exchange': 'NMS',
+                           'sector': 'Technology', 'industry': 'Consumer Electronics'}, replace=True)
+        cache.close()
+        commands = {
+            'interpreter': [sys.executable, '-c', 'pass'],
+            'eager_imports': [sys.executable, '-c', 'import pandas, yfinance, fuzzywuzzy, requests'],
+            'cli_info_cached': [sys.executable, os.path.join(repo_dir, 'mktcap.py'), 'info', 'AAPL'],
+            'cli_caps_cached': [sys.executable, os.path.join(repo_dir, 'mktcap.py'), 'caps', 'AAPL'],
+        }
+        results = {}
+        for name, command in commands.items():
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run(command, cwd=work_dir, check=True, capture_output=True)
+                timings.append(time.perf_counter() - start)
+            traced = subprocess.run([command[0], '-X', 'importtime'] + command[1:], cwd=work_dir,
+                                    capture_output=True, text=True)
+            modules = _imported_modules(traced.stderr)
+            results[name] = {
+                'median_ms': round(statistics.median(timings) * 1000, 1),
+                'min_ms': round(min(timings) * 1000, 1),
+                'modules': len(modules),
+                'imports_pandas': 'pandas' in modules,
+            }
+    return results
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Return a list of regression messages against a baseline result file."""
+    regressions = []
+    for name, case in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        if base.get('throughput_per_s') and case['throughput_per_s'] is not None \
+                and case['throughput_per_s'] < base['throughput_per_s'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {case['throughput_per_s']}/s "
+                               f"vs baseline {base['throughput_per_s']}/s")
+        if base.get('p99_ms') and case['p99_ms'] is not None \
+                and case['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {case['p99_ms']}ms vs baseline {base['p99_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the entry points against a local fake API.")
+    parser.add_argument('--cases', nargs='+', default=DEFAULT_CASES, choices=DEFAULT_CASES)
+    parser.add_argument('--limit', type=int, default=None, help="Use only the first N tickers")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent calls for per-item cases")
+    parser.add_argument('--latency', type=float, default=0.02, help="Fake server mean latency (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fake server 500 rate")
+    parser.add_argument('--rate-limit', type=float, default=None, help="Fake server requests/s before 429")
+    parser.add_argument('--yahoo-rate', type=float, default=200, help="Client rate limit for bulk Yahoo fetches")
+    parser.add_argument('--sec-rate', type=float, default=200,
+                        help="Client rate limit for EDGAR (production uses 10/s)")
+    parser.add_argument('--output', default=None, help="JSON results file")
+    parser.add_argument('--baseline', default=None, help="Earlier results file to check for regressions")
+    parser.add_argument('--startup', action='store_true', help="Also time CLI startup with a warm cache")
+    args = parser.parse_args()
+
+    import csv
+    with open(MASTER_CSV_FILE, newline='', encoding='utf-8') as f:
+        rows = [(row['Ticker'], row['Company Name']) for row in csv.DictReader(f)]
+    rows = rows[:args.limit] if args.limit else rows
+    symbols = [symbol for symbol, _ in rows]
+    names = [name.partition(' - ')[0] for _, name in rows]
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'cases': {},
+    }
+    with FakeApiServer(latency=args.latency, error_rate=args.error_rate,
+                       rate_limit=args.rate_limit) as server:
+        for name in args.cases:
+            print(f"Running {name} over {len(symbols)} tickers...")
+            case = run_case(server, name, symbols, names, args)
+            results['cases'][name] = case
+            print(f"  {case['throughput_per_s']}/s, p50 {case['p50_ms']}ms, p99 {case['p99_ms']}ms, "
+                  f"peak RSS {case['peak_rss_mb']}MB, {case['http']['total']} requests")
+
+    if args.startup:
+        print("Timing CLI startup...")
+        results['startup'] = bench_startup()
+        for name, row in results['startup'].items():
+            print(f"  {name}: median {row['median_ms']}ms, {row['modules']} modules, "
+                  f"pandas {'loaded' if row['imports_pandas'] else 'not loaded'}")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("Regressions against baseline:")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,82 @@
-import yfinance as yf
-from fuzzywuzzy import fuzz
 from typing import List, Dict, Tuple
-import pandas as pd
-import requests
 import json
+from info_cache import get_info
+from ticker_index import get_index
+from instrumentation import profiled, span
+from singleflight import SingleFlight
+# requests, fuzzywuzzy, pandas and batch_matcher (numpy/scipy) are imported where
+# they are used, so a cached single-company search starts without them
+
+# Info fields needed for search results; all have a long cache TTL
+SEARCH_INFO_FIELDS = ['market', 'exchange', 'sector', 'industry']
+
+# Local index matches at or above this score are used without calling Yahoo search
+LOCAL_MATCH_THRESHOLD = 75
+
+# Yahoo Finance search endpoint (can be pointed at a local stand-in for benchmarks)
+YAHOO_SEARCH_URL = "https://query1.finance.yahoo.com/v1/finance/search"
+
+# Identical searches running at the same time (or within a few seconds) share one request
+_search_flight = SingleFlight('yahoo_search')
 
 def search_companies(query: str, max_results: int = 5) -> List[Dict]:
     """
     Search for companies using fuzzy matching on company names.
     
+    The local ticker index is tried first; Yahoo search is only called when
+    no local match reaches LOCAL_MATCH_THRESHOLD.
+    
+    Args:
+        query (str): Company name or partial name to search for
+        max_results (int): Maximum number of results to return
+        
+    Returns:
+        List[Dict]: List of matching companies with their information
+    """
+    companies = search_local(query, max_results)
+    if companies and companies[0]['similarity'] >= LOCAL_MATCH_THRESHOLD:
+        return companies
+    # Fall back to the weaker local matches if the remote search finds nothing
+    return search_remote(query, max_results) or companies
+
+def search_local(query: str, max_results: int = 5) -> List[Dict]:
+    """
+    Search the offline index built from Master_us_stock_tickers.csv.
+    
+    Args:
+        query (str): Company name, partial name or ticker symbol
+        max_results (int): Maximum number of results to return
+        
+    Returns:
+        List[Dict]: Matches in the same format as search_companies
+    """
+    try:
+        matches = get_index().search(query, max_results)
+    except Exception as e:
+        print(f"Error searching local ticker index: {str(e)}")
+        return []
+    
+    companies = []
+    for match in matches:
+        try:
+            info = get_info(match['ticker'], fields=SEARCH_INFO_FIELDS)
+        except Exception:
+            info = {}
+        companies.append({
+            'name': match['name'],
+            'ticker': match['ticker'],
+            'similarity': match['similarity'],
+            'market': info.get('market', 'N/A'),
+            'exchange': info.get('exchange', 'N/A'),
+            'sector': info.get('sector', 'N/A'),
+            'industry': info.get('industry', 'N/A')
+        })
+    return companies
+
+def search_remote(query: str, max_results: int = 5) -> List[Dict]:
+    """
+    Search for companies through the Yahoo Finance search API.
+    
     Args:
         query (str): Company name or partial name to search for
         max_results (int): Maximum number of results to return
@@ -16,15 +84,23 @@ def search_companies(query: str, max_results: int = 5) -> List[Dict]:
     Returns:
         List[Dict]: List of matching companies with their information
     """
+    import requests
+    from fuzzywuzzy import fuzz
+
     try:
         # Use Yahoo Finance API to search for companies
-        url = f"https://query1.finance.yahoo.com/v1/finance/search?q={query}&quotesCount={max_results}"
+        url = f"{YAHOO_SEARCH_URL}?q={query}&quotesCount={max_results}"
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
-        response = requests.get(url, headers=headers)
-        data = response.json()
+        def fetch():
+            with span('http_request', endpoint='yahoo_search'):
+                response = requests.get(url, headers=headers)
+            with span('parse', step='yahoo_search'):
+                return response.json()
+
+        data = _search_flight.do((query.lower(), max_results), fetch)
         
         if 'quotes' not in data:
             return []
@@ -38,10 +114,9 @@ def search_companies(query: str, max_results: int = 5) -> List[Dict]:
             # Calculate similarity score
             similarity = fuzz.ratio(query.lower(), quote['longname'].lower())
             
-            # Get additional info using yfinance
+            # Get additional info using yfinance (cached across calls and runs)
             try:
-                ticker = yf.Ticker(quote['symbol'])
-                info = ticker.info
+                info = get_info(quote['symbol'], fields=SEARCH_INFO_FIELDS)
                 
                 companies.append({
                     'name': quote['longname'],
@@ -63,45 +138,67 @@ def search_companies(query: str, max_results: int = 5) -> List[Dict]:
         print(f"Error searching for companies: {str(e)}")
         return []
 
-def process_company_list(company_names: List[str]) -> List[Dict]:
+def process_company_list(company_names: List[str], workers: int = None) -> List[Dict]:
     """
     Process a list of company names and find their ticker symbols.
     
+    All names are matched against the local ticker universe in one batch.
+    Only names whose best local match is below LOCAL_MATCH_THRESHOLD go to
+    the Yahoo search API, and sector/industry details are looked up once per
+    distinct ticker through the info cache.
+    
     Args:
         company_names (List[str]): List of company names to search for
+        workers (int): Number of processes used for batch matching (None = in-process)
         
     Returns:
         List[Dict]: List of companies with their information
     """
+    from batch_matcher import match_names
+
+    print(f"\nMatching {len(company_names)} names against the local ticker index...")
+    with span('batch_match'):
+        matches = match_names(company_names, workers=workers)
+    
     results = []
-    for company_name in company_names:
-        print(f"\nSearching for: {company_name}")
-        matches = search_companies(company_name, max_results=1)
-        
-        if matches:
-            # Get the best match
-            best_match = matches[0]
-            results.append({
-                'input_name': company_name,
-                'found_name': best_match['name'],
-                'ticker': best_match['ticker'],
-                'confidence': best_match['similarity'],
-                'market': best_match['market'],
-                'exchange': best_match['exchange'],
-                'sector': best_match['sector'],
-                'industry': best_match['industry']
-            })
-        else:
-            results.append({
-                'input_name': company_name,
-                'found_name': 'Not Found',
-                'ticker': 'N/A',
-                'confidence': 0,
-                'market': 'N/A',
-                'exchange': 'N/A',
-                'sector': 'N/A',
-                'industry': 'N/A'
-            })
+    for match in matches.to_dict('records'):
+        result = {
+            'input_name': match['input_name'],
+            'found_name': match['found_name'],
+            'ticker': match['ticker'],
+            'confidence': match['confidence'],
+            'market': 'N/A',
+            'exchange': 'N/A',
+            'sector': 'N/A',
+            'industry': 'N/A',
+            'runner_up': match['runner_up_ticker'],
+            'runner_up_confidence': match['runner_up_confidence']
+        }
+        if match['confidence'] < LOCAL_MATCH_THRESHOLD:
+            print(f"\nSearching for: {match['input_name']}")
+            remote = search_remote(match['input_name'], max_results=1)
+            if remote:
+                result.update({
+                    'found_name': remote[0]['name'],
+                    'ticker': remote[0]['ticker'],
+                    'confidence': remote[0]['similarity']
+                })
+            elif match['confidence'] == 0:
+                result.update({'found_name': 'Not Found', 'ticker': 'N/A'})
+        results.append(result)
+    
+    # Fetch details once per distinct ticker
+    details = {}
+    for ticker in {r['ticker'] for r in results if r['ticker'] != 'N/A'}:
+        try:
+            details[ticker] = get_info(ticker, fields=SEARCH_INFO_FIELDS)
+        except Exception as e:
+            print(f"Error getting information for ticker {ticker}: {str(e)}")
+    
+    for result in results:
+        info = details.get(result['ticker'], {})
+        for field in SEARCH_INFO_FIELDS:
+            result[field] = info.get(field, 'N/A')
     
     return results
 
@@ -172,6 +269,7 @@ def main():
         results = process_company_list(companies)
         
         # Create a DataFrame for better display
+        import pandas as pd
         df = pd.DataFrame(results)
         print("\nResults:")
         print("-" * 100)
@@ -186,4 +284,5 @@ def main():
         print("Invalid choice. Please enter 1 or 2.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    with profiled():
+        main() 
\ No newline at end of file
@@ -0,0 +1,98 @@
+# singleflight.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from instrumentation import metrics
+
+# Completed results are reused for this many seconds to absorb bursts
+MEMO_TTL = 5.0
+# Most results kept in the memo; oldest are dropped first
+MEMO_SIZE = 4096
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one execution.
+
+    The first caller for a key (the leader) runs the fetch; callers arriving
+    while it is in flight wait for and share its result or exception.
+    Successful results are also kept for memo_ttl seconds, so a burst of
+    calls right after a fetch is served without another one. Coalesced calls
+    are counted in the 'coalesced' metric, labelled by endpoint and by kind
+    ('inflight' or 'memo').
+    """
+
+    def __init__(self, endpoint: str, memo_ttl: float = MEMO_TTL, memo_size: int = MEMO_SIZE):
+        self.endpoint = endpoint
+        self.memo_ttl = memo_ttl
+        self.memo_size = memo_size
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._memo: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.executed = 0
+        self.coalesced = 0
+        self.memo_hits = 0
+
+    def begin(self, key: Hashable, use_memo: bool = True) -> Tuple[bool, Future]:
+        """
+        Claim a key. Returns (True, future) if the caller must fetch it and then
+        call finish(); otherwise (False, future) for a result in flight or memoized.
+        """
+        with self._lock:
+            if use_memo and key in self._memo:
+                stored_at, result = self._memo[key]
+                if time.monotonic() - stored_at < self.memo_ttl:
+                    self.memo_hits += 1
+                    metrics.incr('coalesced', endpoint=self.endpoint, kind='memo')
+                    future = Future()
+                    future.set_result(result)
+                    return False, future
+                del self._memo[key]
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                metrics.incr('coalesced', endpoint=self.endpoint, kind='inflight')
+                return False, future
+            future = self._inflight[key] = Future()
+            self.executed += 1
+            return True, future
+
+    def finish(self, key: Hashable, result: Any = None, error: BaseException = None):
+        """Publish the leader's result (or exception) to every waiter."""
+        with self._lock:
+            future = self._inflight.pop(key, None)
+            if error is None:
+                self._memo[key] = (time.monotonic(), result)
+                self._memo.move_to_end(key)
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+        if future is not None:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], use_memo: bool = True) -> Any:
+        """Run fn for key unless an identical call is in flight or memoized; returns its result."""
+        leader, future = self.begin(key, use_memo)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self.finish(key, error=e)
+                raise
+            self.finish(key, result)
+        return future.result()
+
+    def forget(self, key: Hashable):
+        """Drop a memoized result, e.g. after the underlying data was invalidated."""
+        with self._lock:
+            self._memo.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'executed': self.executed, 'coalesced': self.coalesced,
+                    'memo_hits': self.memo_hits, 'inflight': len(self._inflight)}
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import rate_limiter  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def limiter_state(tmp_path, monkeypatch):
+    """Fresh shared limiter state for every test, without real backoff pauses."""
+    monkeypatch.setattr(rate_limiter, 'RATE_LIMIT_DIR', str(tmp_path / 'rate_limits'))
+    monkeypatch.setattr(rate_limiter, '_limiters', {})
+    monkeypatch.setattr(rate_limiter, 'backoff_delay', lambda attempt, base=1.0, cap=60.0: 0.0)
+    monkeypatch.setattr(rate_limiter, 'OPEN_SECONDS', 0.0)
@@ -0,0 +1,36 @@
+from batch_matcher import RESULT_COLUMNS, BatchMatcher
+from ticker_index import TickerIndex
+
+RECORDS = [
+    ('AAPL', 'Apple Inc. - Common Stock'),
+    ('APLE', 'Apple Hospitality REIT, Inc. Common Shares'),
+    ('MSFT', 'Microsoft Corporation - Common Stock'),
+    ('AACB', 'Artius II Acquisition Inc. - Class A Ordinary Shares'),
+    ('AACBU', 'Artius II Acquisition Inc. - Units'),
+    ('NVDA', 'NVIDIA Corporation - Common Stock'),
+]
+
+
+def test_match_returns_best_and_runner_up_in_input_order():
+    matcher = BatchMatcher(TickerIndex(RECORDS))
+
+    df = matcher.match(['Apple Inc', 'Microsoft Corp.', 'Artius II Acquisition', 'zzzz', ''], chunk_size=2)
+
+    assert df.columns.tolist() == RESULT_COLUMNS
+    assert df['input_name'].tolist() == ['Apple Inc', 'Microsoft Corp.', 'Artius II Acquisition', 'zzzz', '']
+    assert df['ticker'].tolist() == ['AAPL', 'MSFT', 'AACB', 'N/A', 'N/A']
+    assert df['confidence'].tolist()[:3] == [100, 100, 100]
+    assert df.loc[0, 'runner_up_ticker'] == 'APLE'
+    assert 0 < df.loc[0, 'runner_up_confidence'] < 100
+    assert df.loc[3, 'found_name'] == 'Not Found' and df.loc[3, 'confidence'] == 0
+
+
+def test_worker_processes_give_the_same_result():
+    matcher = BatchMatcher(TickerIndex(RECORDS))
+    names = ['Apple', 'NVIDIA Corp', 'Microsoft', 'Apple Hospitality REIT']
+
+    assert matcher.match(names, chunk_size=1, workers=2).equals(matcher.match(names, chunk_size=1))
+
+
+def test_empty_batch():
+    assert BatchMatcher(TickerIndex(RECORDS)).match([]).columns.tolist() == RESULT_COLUMNS
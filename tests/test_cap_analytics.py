@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+import yahoo_quotes
+from cap_analytics import CapAnalytics, cap_weighted_index, fx_rates
+from ticker_universe import TickerUniverse
+from yahoo_quotes import QuoteFetchError
+
+
+def _fetch(prices):
+    def fetch(symbols, fields):
+        return pd.DataFrame({'regularMarketPrice': [prices.get(s) for s in symbols]}, index=symbols)
+    return fetch
+
+
+def test_fx_rates_for_minor_units():
+    rates = fx_rates(['USD', 'GBP', 'GBX', 'GBp', 'ZAC', 'ILA'],
+                     fetch=_fetch({'GBPUSD=X': 1.25, 'ZARUSD=X': 0.05, 'ILSUSD=X': 0.25}))
+
+    assert rates['GBP'] == 1.25
+    assert rates['GBX'] == rates['GBp'] == 0.0125
+    assert rates['ZAC'] == 0.0005
+    assert rates['ILA'] == 0.0025
+    assert rates['USD'] == 1.0
+
+
+def test_fx_rates_leave_out_unknown_currencies():
+    rates = fx_rates(['EUR', 'USD'], fetch=_fetch({}))
+
+    assert rates == {'USD': 1.0}
+
+
+def test_fx_rates_skip_currencies_whose_quotes_failed():
+    def fetch(symbols, fields):
+        raise QuoteFetchError("HTTP 503", ['EURUSD=X'], [{'symbol': 'GBPUSD=X', 'regularMarketPrice': 1.25}])
+
+    assert fx_rates(['EUR', 'GBX'], fetch=fetch) == {'USD': 1.0, 'GBX': 0.0125}
+
+
+UNIVERSE = TickerUniverse.build([
+    ('AAPL', 'Apple Inc.', 'NMS', 'Technology', 'Consumer Electronics'),
+    ('MSFT', 'Microsoft Corporation', 'NMS', 'Technology', 'Software'),
+    ('JPM', 'JPMorgan Chase & Co.', 'NYQ', 'Financial Services', 'Banks'),
+    ('VOD', 'Vodafone Group', 'NMS', 'Communication Services', 'Telecom'),
+])
+RATES = {'USD': 1.0, 'GBX': 0.0125}
+
+
+def _snapshot(rows):
+    return pd.DataFrame(rows, columns=['Ticker', 'MarketCap', 'Currency', 'Market'])
+
+
+def _sector_totals(analytics):
+    return analytics.totals('sector')['market_cap_usd'].to_dict()
+
+
+def test_update_matches_a_fresh_build():
+    analytics = CapAnalytics(_snapshot([('AAPL', 3e12, 'USD', 'NMS'), ('MSFT', 1e12, 'USD', 'N/A'),
+                                        ('JPM', 5e11, 'USD', 'NYQ')]), universe=UNIVERSE, rates=RATES)
+    assert _sector_totals(analytics) == {'Technology': 4e12, 'Financial Services': 5e11}
+
+    applied = analytics.update(_snapshot([('MSFT', 2e12, 'USD', 'NMS'), ('VOD', 4e12, 'GBX', 'N/A')]))
+
+    rebuilt = CapAnalytics(_snapshot([('AAPL', 3e12, 'USD', 'NMS'), ('MSFT', 2e12, 'USD', 'NMS'),
+                                      ('JPM', 5e11, 'USD', 'NYQ'), ('VOD', 4e12, 'GBX', 'N/A')]),
+                           universe=UNIVERSE, rates=RATES)
+    assert applied == 2
+    assert _sector_totals(analytics) == _sector_totals(rebuilt) == {
+        'Technology': 5e12, 'Financial Services': 5e11, 'Communication Services': 5e10}
+    assert analytics.totals('exchange')['count'].to_dict() == {'NMS': 3, 'NYQ': 1}
+    ranks = analytics.ranks()
+    pd.testing.assert_frame_equal(ranks.sort_index(), rebuilt.ranks().sort_index(), check_categorical=False)
+    assert ranks.loc['AAPL', 'sector_pct_rank'] == 1.0
+    assert ranks.loc['VOD', 'pct_rank'] == 0.25
+
+
+def test_failed_fx_quotes_leave_caps_without_usd_value(monkeypatch):
+    def get_quotes(symbols, fields):
+        raise QuoteFetchError("HTTP 503", list(symbols), [])
+
+    monkeypatch.setattr(yahoo_quotes, 'get_quotes', get_quotes)
+
+    analytics = CapAnalytics(_snapshot([('AAPL', 3e12, 'USD', 'NMS'), ('VOD', 4e12, 'GBX', 'NMS')]),
+                             universe=UNIVERSE)
+
+    usd = analytics.table()['MarketCapUSD']
+    assert usd['AAPL'] == 3e12 and pd.isna(usd['VOD'])
+
+
+def test_cap_weighted_index_ignores_entries_and_exits():
+    history = pd.DataFrame({
+        'date': ['2024-05-01'] * 2 + ['2024-05-02'] * 3 + ['2024-05-03'] * 2,
+        'Ticker': ['AAPL', 'JPM', 'AAPL', 'JPM', 'MSFT', 'AAPL', 'MSFT'],
+        'MarketCap': [100.0, 100.0, 110.0, 110.0, 500.0, 121.0, 550.0],
+        'Currency': 'USD',
+        'Market': ['NMS', 'NYQ', 'NMS', 'NYQ', 'NMS', 'NMS', 'NMS'],
+    })
+
+    levels = cap_weighted_index(history, rates=RATES)
+    assert levels['level'].tolist() == pytest.approx([100.0, 110.0, 110.0 * 671 / 610])
+
+    by_exchange = cap_weighted_index(history, by='exchange', universe=UNIVERSE, rates=RATES)
+    assert by_exchange['NMS'].tolist() == pytest.approx([100.0, 110.0, 110.0 * 671 / 610])
+    assert by_exchange['NYQ'].tolist()[:2] == pytest.approx([100.0, 110.0])
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from companyfacts import cik_map, compute_market_caps, latest_shares
+
+
+def _fact(val, end, accn, filed='2024-02-01', form='10-K'):
+    return {'val': val, 'end': end, 'accn': accn, 'filed': filed, 'form': form}
+
+
+def test_latest_shares_sums_classes_of_the_latest_report():
+    facts = {'cik': 1652044, 'facts': {'dei': {'EntityCommonStockSharesOutstanding': {'units': {'shares': [
+        _fact(100, '2023-01-20', 'A1'),
+        _fact(300, '2024-01-25', 'A2'),
+        _fact(200, '2024-01-25', 'A2'),
+    ]}}}}}
+
+    row = latest_shares(facts)
+
+    assert row['cik'] == 1652044
+    assert row['shares_outstanding'] == 500
+    assert row['shares_as_of'] == '2024-01-25'
+    assert row['accession'] == 'A2'
+    assert row['concept'] == 'dei:EntityCommonStockSharesOutstanding'
+
+
+def test_latest_shares_falls_back_to_balance_sheet_concept():
+    facts = {'cik': 1, 'facts': {'us-gaap': {'CommonStockSharesOutstanding': {'units': {'shares': [
+        _fact(42, '2024-03-31', 'B1', form='10-Q')]}}}}}
+
+    assert latest_shares(facts)['shares_outstanding'] == 42
+    assert latest_shares({'cik': 2, 'facts': {}}) is None
+
+
+def test_compute_market_caps():
+    ciks = cik_map({str(i): {'cik_str': cik, 'ticker': ticker, 'title': ''} for i, (ticker, cik) in enumerate([
+        ('AAPL', 1), ('GOOGL', 2), ('GOOG', 2), ('BAC', 3), ('BAC-PB', 3), ('BAC-PL', 3),
+        ('ACAH', 4), ('ACAHW', 4), ('ACAHU', 4), ('XYZ', 5), ('XYZ-WT', 5),
+    ])})
+    shares = pd.DataFrame({'cik': [1, 2, 3, 4, 5], 'shares_outstanding': [10, 20, 30, 40, 50],
+                           'shares_as_of': ['2024-01-01'] * 5})
+    tickers = ['AAPL', 'GOOGL', 'GOOG', 'BAC', 'BAC-PB', 'ACAH', 'ACAHW', 'XYZ', 'NOCIK']
+    prices = pd.Series({ticker: 2.0 for ticker in tickers})
+
+    results = compute_market_caps(tickers, shares, ciks, prices).set_index('Ticker')
+
+    caps = results['MarketCap']
+    assert caps['AAPL'] == 20
+    assert caps['BAC'] == 60
+    assert caps['ACAH'] == 80
+    assert caps['XYZ'] == 100
+    assert caps[['GOOGL', 'GOOG', 'BAC-PB', 'ACAHW', 'NOCIK']].isna().all()
+    assert set(results['Market']) == {'N/A'}
+    assert set(results['Currency']) == {'USD'}
@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from edgar_client import EdgarClient
+from fake_api_server import MASTER_CSV_FILE, FakeApiServer
+from rate_limiter import DEFERRED_ROUNDS
+
+TICKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), MASTER_CSV_FILE)
+
+
+@pytest.fixture
+def server():
+    with FakeApiServer(tickers_file=TICKERS_FILE) as server:
+        yield server
+
+
+def _client(server, tmp_path, **kwargs):
+    return EdgarClient(data_base_url=server.url, www_base_url=server.url,
+                       cache_path=str(tmp_path / 'edgar_http_cache.sqlite'), **kwargs)
+
+
+def _cik(client, ticker):
+    return next(entry['cik_str'] for entry in client.company_tickers().values() if entry['ticker'] == ticker)
+
+
+def test_company_tickers_are_revalidated(server, tmp_path):
+    client = _client(server, tmp_path)
+
+    first = client.company_tickers()
+    second = client.company_tickers()
+
+    assert second == first
+    assert server.stats()['statuses'] == {200: 1, 304: 1}
+
+
+def test_download_filings(server, tmp_path):
+    client = _client(server, tmp_path)
+    cik = _cik(client, 'AAPL')
+
+    filings = client.filings(cik, year=server.filing_year)
+    assert [form for _, form, _ in filings] == ['10-K']
+
+    saved = client.download_filings([(cik, filings[0][0])], str(tmp_path / '10k_reports'))
+
+    assert len(saved) == 1
+    with open(saved[0], 'rb') as f:
+        assert f.read().startswith(b'<html>')
+
+
+def test_server_errors_are_retried(server, tmp_path):
+    client = _client(server, tmp_path, max_retries=2)
+    server.error_rate = 1.0
+
+    response = client.get(f"{server.url}/files/company_tickers.json")
+
+    assert response.status_code == 500
+    assert server.stats()['total'] == 3
+
+
+def test_failed_downloads_are_deferred(server, tmp_path):
+    client = _client(server, tmp_path, max_retries=0)
+    cik = _cik(client, 'AAPL')
+    accession = client.filings(cik)[0][0]
+    server.error_rate = 1.0
+    server.reset_stats()
+
+    saved = client.download_filings([(cik, accession)], str(tmp_path / '10k_reports'))
+
+    assert saved == []
+    assert server.stats()['total'] == 1 + DEFERRED_ROUNDS
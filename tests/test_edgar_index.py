@@ -0,0 +1,70 @@
+import gzip
+import os
+
+from edgar_client import EdgarClient
+from edgar_index import IndexEntry, filing_worklist, iter_full_index, parse_index
+from fake_api_server import MASTER_CSV_FILE, FakeApiServer
+
+TICKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), MASTER_CSV_FILE)
+
+MASTER_IDX = """Description:           Master Index of EDGAR Dissemination Feed
+Last Data Received:    March 31, 2024
+
+CIK|Company Name|Form Type|Date Filed|Filename
+--------------------------------------------------------------------------------
+320193|Apple Inc.|10-K|2024-03-01|edgar/data/320193/0000320193-24-000123.txt
+1652044|Alphabet Inc.|8-K|20240215|edgar/data/1652044/0001652044-24-000010.txt
+not a row
+"""
+
+FORM_IDX = """Description:           Master Index of EDGAR Dissemination Feed
+
+Form Type   Company Name                                                  CIK         Date Filed  File Name
+---------------------------------------------------------------------------------------------------------------
+10-K        A VERY LONG COMPANY NAME THAT RUNS PAST ITS COLUMN HOLDINGS INCORPORATED 1234567     2024-02-20  edgar/data/1234567/0001234567-24-000002.txt
+10-K/A      Apple Inc.                                                    320193      2024-03-05  edgar/data/320193/0000320193-24-000130.txt
+"""
+
+
+def test_parse_master_index():
+    entries = list(parse_index(line.encode('latin-1') for line in MASTER_IDX.splitlines(keepends=True)))
+
+    assert entries == [
+        IndexEntry(320193, 'Apple Inc.', '10-K', '2024-03-01', '0000320193-24-000123'),
+        IndexEntry(1652044, 'Alphabet Inc.', '8-K', '2024-02-15', '0001652044-24-000010'),
+    ]
+
+
+def test_parse_form_index_with_long_company_names():
+    entries = list(parse_index(FORM_IDX.splitlines()))
+
+    assert entries == [
+        IndexEntry(1234567, 'A VERY LONG COMPANY NAME THAT RUNS PAST ITS COLUMN HOLDINGS INCORPORATED', '10-K',
+                   '2024-02-20', '0001234567-24-000002'),
+        IndexEntry(320193, 'Apple Inc.', '10-K/A', '2024-03-05', '0000320193-24-000130'),
+    ]
+
+
+def test_local_mirror_reads_gzipped_quarters_and_skips_missing_ones(tmp_path, capsys):
+    quarter_dir = tmp_path / '2024' / 'QTR1'
+    quarter_dir.mkdir(parents=True)
+    with gzip.open(quarter_dir / 'master.idx.gz', 'wt', encoding='latin-1') as f:
+        f.write(MASTER_IDX)
+
+    entries = list(iter_full_index(2024, forms={'10-K'}, quarters=(1, 2), source=str(tmp_path)))
+
+    assert [e.accession for e in entries] == ['0000320193-24-000123']
+    assert "No master.idx for 2024 QTR2" in capsys.readouterr().out
+
+
+def test_filing_worklist_from_edgar():
+    with FakeApiServer(tickers_file=TICKERS_FILE,
+                       fail_paths={'/Archives/edgar/full-index/2024/QTR4/master.idx': [404]}) as server:
+        client = EdgarClient(data_base_url=server.url, www_base_url=server.url, cache_path=None)
+        year = server.filing_year
+
+        worklist = filing_worklist(year, ciks={1001, 1000}, client=client)
+        all_forms = list(iter_full_index(2024, forms={'8-K'}, quarters=(3, 4), client=client))
+
+    assert worklist == [(1000, f"0000001000-{year % 100:02d}-001000"), (1001, f"0000001001-{year % 100:02d}-001001")]
+    assert {e.date_filed for e in all_forms} == {'2024-08-15'}
@@ -0,0 +1,62 @@
+import os
+from collections import Counter
+
+import pytest
+
+import fetch_files_api
+from edgar_client import EdgarClient, RetryableError
+from fake_api_server import MASTER_CSV_FILE, FakeApiServer
+
+TICKERS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), MASTER_CSV_FILE)
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    """Fake EDGAR whose first submissions CIK answers 503 to its first three requests."""
+    with FakeApiServer(tickers_file=TICKERS_FILE, fail_paths={'/submissions/CIK0000001000.json': [503] * 3}) as server:
+        monkeypatch.setattr(fetch_files_api, '_client', EdgarClient(
+            data_base_url=server.url, www_base_url=server.url, max_retries=1,
+            cache_path=str(tmp_path / 'edgar_http_cache.sqlite')))
+        monkeypatch.setattr(fetch_files_api, 'CURRENT_YEAR', server.filing_year)
+        yield server
+
+
+def test_build_worklist_dedupes_ciks_and_skips_failures(monkeypatch):
+    monkeypatch.setattr(fetch_files_api, '_client', EdgarClient(cache_path=None))
+    calls = Counter()
+
+    def fetch_10k_filings(cik):
+        calls[cik] += 1
+        if cik == 2:
+            raise ValueError("malformed submissions document")
+        return [(f"{cik:010d}-24-000001", '10-K', '2024-03-01')]
+
+    monkeypatch.setattr(fetch_files_api, 'fetch_10k_filings', fetch_10k_filings)
+    cik_list = {
+        '0': {'cik_str': 1, 'ticker': 'AAA'},
+        '1': {'cik_str': 2, 'ticker': 'BBB'},
+        '2': {'cik_str': 1, 'ticker': 'AAA-B'},
+        '3': {'cik_str': 3, 'ticker': 'CCC'},
+    }
+
+    worklist = fetch_files_api.build_worklist(cik_list, limit=None, max_workers=2)
+
+    assert worklist == [(1, '0000000001-24-000001'), (3, '0000000003-24-000001')]
+    assert calls == {1: 1, 2: 1, 3: 1}
+
+
+def test_build_worklist_defers_throttled_lookups(server):
+    cik_list = dict(list(fetch_files_api.fetch_cik_list().items())[:3])
+
+    worklist = fetch_files_api.build_worklist(cik_list, limit=None, max_workers=2)
+
+    assert sorted(cik for cik, _ in worklist) == [1000, 1001, 1002]
+    assert server.stats()['statuses'][503] == 3
+
+
+def test_submissions_still_failing_raise(server):
+    server.fail_paths['/submissions/CIK0000001000.json'] = [503] * 10
+
+    with pytest.raises(RetryableError):
+        fetch_files_api.get_client().filings(1000)
+    assert fetch_files_api.get_client().filings(99999999) == []
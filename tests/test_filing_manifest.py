@@ -0,0 +1,69 @@
+import sqlite3
+
+from filing_manifest import FULL_SUBMISSION_FILE, ROOT_SAVE_FOLDER, FilingManifest, read_submission_header
+
+HEADER = """<SEC-HEADER>0001652044-24-000022.hdr.sgml : 20240131
+ACCESSION NUMBER:		0001652044-24-000022
+CONFORMED SUBMISSION TYPE:	10-K
+FILED AS OF DATE:		20240131
+FILER:
+	COMPANY DATA:
+		CENTRAL INDEX KEY:			0001652044
+</SEC-HEADER>
+"""
+
+
+def _download(download_dir, ticker, form, accession):
+    accession_dir = download_dir / ROOT_SAVE_FOLDER / ticker / form / accession
+    accession_dir.mkdir(parents=True)
+    (accession_dir / FULL_SUBMISSION_FILE).write_text(HEADER, encoding='latin-1')
+    return accession_dir
+
+
+def test_read_submission_header(tmp_path):
+    path = _download(tmp_path, 'GOOGL', '10-K', '0001652044-24-000022') / FULL_SUBMISSION_FILE
+
+    assert read_submission_header(str(path)) == {'form': '10-K', 'filing_date': '2024-01-31', 'cik': '1652044'}
+
+
+def test_filing_shared_by_two_tickers_is_recorded_for_both(tmp_path):
+    manifest = FilingManifest(str(tmp_path / 'manifest.sqlite'))
+    for ticker in ('GOOGL', 'GOOG'):
+        _download(tmp_path, ticker, '10-K', '0001652044-24-000022')
+
+    assert manifest.scan_downloads(str(tmp_path), 'GOOGL', '10-K') == ['0001652044-24-000022']
+    assert manifest.scan_downloads(str(tmp_path), 'GOOG', '10-K') == ['0001652044-24-000022']
+
+    assert manifest.accessions('GOOGL', '10-K') == manifest.accessions('GOOG', '10-K') == {'0001652044-24-000022'}
+    assert manifest.scan_downloads(str(tmp_path), 'GOOGL', '10-K') == []
+    assert manifest.scan_downloads(str(tmp_path), 'GOOG', '10-K') == []
+    assert sorted(filing['ticker'] for filing in manifest.filings()) == ['GOOG', 'GOOGL']
+    assert manifest.filings('GOOG')[0]['cik'] == '1652044'
+
+
+def test_sync_state(tmp_path):
+    manifest = FilingManifest(str(tmp_path / 'manifest.sqlite'))
+    assert manifest.last_sync('AAPL', '10-K') is None
+
+    manifest.mark_synced('AAPL', '10-K', '2024-01-01')
+    manifest.mark_synced('AAPL', '10-K', '2024-06-01')
+
+    assert manifest.last_sync('AAPL', '10-K') == '2024-06-01'
+    assert manifest.last_sync('AAPL', '10-Q') is None
+
+
+def test_accession_keyed_manifest_is_migrated(tmp_path):
+    path = str(tmp_path / 'manifest.sqlite')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE filings (accession TEXT PRIMARY KEY, ticker TEXT NOT NULL, cik TEXT, form TEXT NOT NULL,
+                              filing_date TEXT, path TEXT NOT NULL, recorded_at REAL NOT NULL);
+        CREATE INDEX filings_ticker_form ON filings (ticker, form);
+        INSERT INTO filings VALUES ('0001652044-24-000022', 'GOOG', '1652044', '10-K', '2024-01-31', 'p', 0);
+    """)
+    conn.close()
+
+    manifest = FilingManifest(path)
+    manifest.record_filing('0001652044-24-000022', 'GOOGL', '10-K', 'q')
+
+    assert manifest.accessions('GOOG', '10-K') == manifest.accessions('GOOGL', '10-K') == {'0001652044-24-000022'}
@@ -0,0 +1,109 @@
+import io
+import os
+
+import filing_parser
+from filing_manifest import FULL_SUBMISSION_FILE, ROOT_SAVE_FOLDER, FilingManifest
+from filing_parser import _document_chunks, _parse_number, discover_filings, extract_facts, parse_stream
+
+
+def test_filing_shared_by_two_tickers_is_parsed_once(tmp_path):
+    sec_dir = tmp_path / 'sec_filings'
+    sec_dir.mkdir()
+    manifest = FilingManifest(str(sec_dir / 'manifest.sqlite'))
+    for ticker in ('GOOGL', 'GOOG'):
+        accession_dir = sec_dir / ROOT_SAVE_FOLDER / ticker / '10-K' / '0001652044-24-000022'
+        accession_dir.mkdir(parents=True)
+        (accession_dir / FULL_SUBMISSION_FILE).write_text('<SEC-DOCUMENT>\n', encoding='latin-1')
+        manifest.record_filing('0001652044-24-000022', ticker, '10-K', str(accession_dir))
+    manifest.close()
+
+    tasks = discover_filings(str(sec_dir), str(tmp_path / 'reports'), str(tmp_path / 'store'))
+
+    assert [(task['ticker'], task['accession']) for task in tasks] == [('GOOG', '0001652044-24-000022')]
+
+
+def test_parse_number_applies_format_scale_and_sign():
+    assert _parse_number('1,234', {'scale': '6'}) == 1234e6
+    assert _parse_number('(56.7)', {'scale': '3', 'sign': '-'}) == -56700.0
+    assert _parse_number('1.234,5', {'format': 'ixt:num-comma-decimal'}) == 1234.5
+    assert _parse_number('—', {}) == 0.0
+    assert _parse_number('', {'format': 'ixt:fixed-zero'}) == 0.0
+    assert _parse_number('n/a', {}) is None
+
+
+SUBMISSION = """<SEC-DOCUMENT>0000000001-24-000001.txt : 20240301
+<SEC-HEADER>
+CONFORMED SUBMISSION TYPE:	10-K
+</SEC-HEADER>
+<DOCUMENT>
+<TYPE>10-K
+<TEXT>
+<html><body>
+<xbrli:context id="FY"><xbrli:period><xbrli:startDate>2023-01-01</xbrli:startDate>
+<xbrli:endDate>2023-12-31</xbrli:endDate></xbrli:period></xbrli:context>
+<xbrli:context id="Q4"><xbrli:period><xbrli:startDate>2023-10-01</xbrli:startDate>
+<xbrli:endDate>2023-12-31</xbrli:endDate></xbrli:period></xbrli:context>
+<ix:nonFraction name="us-gaap:Revenues" contextRef="FY" scale="6">1,000</ix:nonFraction>
+<ix:nonFraction name="us-gaap:Revenues" contextRef="Q4" scale="6">300</ix:nonFraction>
+<ix:nonFraction name="us-gaap:NetIncomeLoss" contextRef="FY" scale="6" sign="-">25</ix:nonFraction>
+</body></html>
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>EX-21
+<TEXT>
+<ix:nonFraction name="us-gaap:Revenues" contextRef="FY">999999</ix:nonFraction>
+</TEXT>
+</DOCUMENT>
+<DOCUMENT>
+<TYPE>GRAPHIC
+<TEXT>
+begin 644 logo.jpg
+M_]C_X
+end
+</TEXT>
+</DOCUMENT>
+</SEC-DOCUMENT>
+"""
+
+
+def test_document_chunks_keep_only_the_form_document(monkeypatch):
+    monkeypatch.setattr(filing_parser, 'READ_CHUNK_SIZE', 200)
+
+    chunks = list(_document_chunks(io.StringIO(SUBMISSION), '10-K'))
+
+    text = ''.join(chunks)
+    assert len(chunks) > 1
+    assert 'us-gaap:NetIncomeLoss' in text
+    assert '999999' not in text and 'logo.jpg' not in text and 'SEC-HEADER' not in text
+
+
+def test_parse_stream_picks_the_annual_period():
+    facts = parse_stream(io.StringIO(SUBMISSION), '10-K')
+
+    assert facts['revenue'] == 1000e6
+    assert facts['net_income'] == -25e6
+    assert facts['period_end'] == '2023-12-31'
+    assert facts['source'] == 'xbrl'
+
+
+def test_extract_facts_skips_unchanged_filings(tmp_path, capsys):
+    path = tmp_path / 'full-submission.txt'
+    path.write_text(SUBMISSION, encoding='latin-1')
+    facts_file = str(tmp_path / 'facts.parquet')
+    tasks = [{'ticker': 'AAA', 'accession': '0000000001-24-000001', 'cik': '1', 'form': '10-K',
+              'filing_date': '2024-03-01', 'path': str(path)}]
+
+    first = extract_facts(tasks, facts_file=facts_file, workers=1)
+    assert first['revenue'].tolist() == [1000000000]
+    assert "Parsed 1 filings" in capsys.readouterr().out
+
+    extract_facts(tasks, facts_file=facts_file, workers=1)
+    assert "1 of 1 filings already parsed" in capsys.readouterr().out
+
+    # A new mtime with the same content is checksummed but not parsed again
+    os.utime(path, (0, 0))
+    again = extract_facts(tasks, facts_file=facts_file, workers=1)
+    out = capsys.readouterr().out
+    assert "parsing 1" in out and "Parsed 0 filings" in out
+    assert again['revenue'].tolist() == [1000000000] and again['mtime'].tolist() == [0.0]
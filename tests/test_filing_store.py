@@ -0,0 +1,61 @@
+import random
+import threading
+
+from filing_store import INLINE_BYTES, FilingStore
+
+
+def _submission(exhibit):
+    return (b"<SEC-DOCUMENT>0000000001-24-000001.txt : 20240301\n"
+            b"<DOCUMENT>\n<TYPE>10-K\n<TEXT>\nannual report\n</TEXT>\n</DOCUMENT>\n"
+            b"<DOCUMENT>\n<TYPE>EX-21\n<TEXT>\n" + exhibit + b"\n</TEXT>\n</DOCUMENT>\n</SEC-DOCUMENT>\n")
+
+
+def _exhibit(seed):
+    rng = random.Random(seed)
+    return b"\n".join(str(rng.random()).encode() for _ in range(INLINE_BYTES // 8))
+
+
+def test_put_dedupes_parts_and_round_trips(tmp_path):
+    store = FilingStore(str(tmp_path / 'store'))
+    exhibit = _exhibit(0)
+    first = tmp_path / 'first.txt'
+    first.write_bytes(_submission(exhibit))
+    second = tmp_path / 'second.txt'
+    second.write_bytes(_submission(exhibit).replace(b'annual report', b'amended report'))
+
+    assert store.put('A1', 'full-submission.txt', str(first))['new_parts'] > 0
+    stored = store.put('A2', 'full-submission.txt', str(second))
+
+    assert stored['new_parts'] == 1
+    assert store.open('A2', 'full-submission.txt').read() == second.read_bytes()
+
+
+def test_shard_processes_storing_the_same_parts(tmp_path):
+    root = str(tmp_path / 'store')
+    FilingStore(root).close()
+    documents = [tmp_path / f"{i}.txt" for i in range(4)]
+    for i, path in enumerate(documents):
+        path.write_bytes(_submission(_exhibit(i % 2)))
+    errors = []
+
+    def store_all():
+        # One store (and SQLite connection) per worker, as in separate shard processes
+        store = FilingStore(root)
+        try:
+            for i, path in enumerate(documents):
+                store.put(f"A{i}", 'full-submission.txt', str(path))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            store.close()
+
+    threads = [threading.Thread(target=store_all) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    store = FilingStore(root)
+    for i, path in enumerate(documents):
+        assert store.open(f"A{i}", 'full-submission.txt').read() == path.read_bytes()
@@ -0,0 +1,158 @@
+import csv
+import functools
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+import get_market_cap
+import info_cache
+import yahoo_quotes
+from get_market_cap import (FAILED_FLAG, fetch_market_caps_batched, fetch_market_caps_bulk, iter_market_caps,
+                            run_market_caps_job)
+from rate_limiter import DEFERRED_ROUNDS, get_limiter
+
+
+class FakeProvider:
+    """
+    Stand-in for fetch_ticker_details with injected latency.
+
+    `throttle` maps a ticker to the number of 429s it answers before
+    succeeding; tickers in `errors` fail with a non-throttling error.
+    """
+
+    def __init__(self, latency=0.0, throttle=None, errors=()):
+        self.latency = latency
+        self.throttle = dict(throttle or {})
+        self.errors = set(errors)
+        self.calls = Counter()
+        self.active = 0
+        self.max_active = 0
+        self.random = random.Random(0)
+        self._lock = threading.Lock()
+
+    def __call__(self, ticker, before_fetch):
+        before_fetch()
+        with self._lock:
+            self.calls[ticker] += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            throttled = self.throttle.get(ticker, 0) > 0
+            if throttled:
+                self.throttle[ticker] -= 1
+            latency = self.latency * self.random.uniform(0.5, 1.5)
+        try:
+            time.sleep(latency)
+            if throttled:
+                raise Exception("429 Too Many Requests")
+            if ticker in self.errors:
+                raise ValueError(f"no data for {ticker}")
+            return len(ticker) * 1000, 'USD', 'NMS'
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _rows(tickers, provider, **kwargs):
+    return {row['Ticker']: row for row in iter_market_caps(tickers, provider=provider, rate=1000, **kwargs)}
+
+
+def test_bulk_fetch_returns_input_order_and_streams_csv(tmp_path):
+    tickers = [f"T{i}" for i in range(40)]
+    provider = FakeProvider(latency=0.01)
+    output_file = str(tmp_path / 'market_data.csv')
+
+    df = fetch_market_caps_bulk(tickers, output_file=output_file, provider=provider, max_workers=4, rate=1000)
+
+    assert df['Ticker'].tolist() == tickers
+    assert df['MarketCap'].tolist() == [len(t) * 1000 for t in tickers]
+    with open(output_file, newline='') as f:
+        written = list(csv.DictReader(f))
+    assert sorted(row['Ticker'] for row in written) == sorted(tickers)
+    assert all(FAILED_FLAG not in row for row in written)
+    assert provider.max_active <= 4
+
+
+def test_throttled_ticker_is_retried():
+    provider = FakeProvider(throttle={'B': 2})
+
+    rows = _rows(['A', 'B', 'C'], provider, max_retries=4)
+
+    assert rows['B']['MarketCap'] == 1000
+    assert FAILED_FLAG not in rows['B']
+    assert provider.calls['B'] == 3
+    assert provider.calls['A'] == provider.calls['C'] == 1
+
+
+def test_throttled_ticker_recovers_in_deferred_round():
+    provider = FakeProvider(throttle={'B': 3})
+
+    rows = _rows(['A', 'B'], provider, max_retries=1)
+
+    assert rows['B']['MarketCap'] == 1000
+    assert provider.calls['B'] == 4
+
+
+def test_ticker_still_throttled_is_flagged_failed():
+    provider = FakeProvider(throttle={'B': 100})
+
+    rows = _rows(['A', 'B'], provider, max_retries=2)
+
+    assert rows['B'][FAILED_FLAG] is True
+    assert rows['B']['MarketCap'] is None
+    assert FAILED_FLAG not in rows['A']
+    # Retries inside the worker, then one attempt per deferred round
+    assert provider.calls['B'] == 3 + DEFERRED_ROUNDS
+
+
+def test_error_is_flagged_failed_without_retries():
+    provider = FakeProvider(errors={'B'})
+
+    rows = _rows(['A', 'B'], provider)
+
+    assert rows['B'][FAILED_FLAG] is True
+    assert provider.calls['B'] == 1
+
+
+def test_job_retries_failed_tickers_on_next_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    provider = FakeProvider(throttle={'B': 100})
+    monkeypatch.setattr(get_market_cap, 'iter_market_caps',
+                        functools.partial(iter_market_caps, provider=provider, rate=1000, max_retries=0))
+
+    df = run_market_caps_job(['A', 'B', 'C'], source='per_ticker')
+
+    assert df['Ticker'].tolist() == ['A', 'B', 'C']
+    assert df['MarketCap'].isna().tolist() == [False, True, False]
+    assert os.path.exists(os.path.join('.jobs', 'market_caps.jsonl'))
+
+    provider.throttle.clear()
+    provider.calls.clear()
+    df = run_market_caps_job(['A', 'B', 'C'], source='per_ticker')
+
+    assert dict(provider.calls) == {'B': 1}
+    assert df['MarketCap'].notna().all()
+    assert os.path.exists(os.path.join('.jobs', 'market_caps.jsonl.done'))
+
+
+class FakeQuoteClient:
+    """Quote client answering from a dict of symbol -> currency."""
+
+    def __init__(self, currencies):
+        self.currencies = currencies
+        self.limiter = get_limiter('fake', 1000)
+
+    def quote(self, symbols, before_fetch=None, max_retries=None):
+        return [{'symbol': s, 'marketCap': 1000, 'currency': self.currencies[s], 'exchange': 'LSE'}
+                for s in symbols]
+
+
+def test_batched_currencies_keep_minor_units_distinct(tmp_path, monkeypatch):
+    monkeypatch.setattr(info_cache, '_default_cache', info_cache.InfoCache(str(tmp_path / 'info_cache.sqlite')))
+    monkeypatch.setattr(yahoo_quotes, '_client', FakeQuoteClient(
+        {'VOD.L': 'GBp', 'BARC.L': 'GBP', 'NPN.JO': 'ZAc', 'TEVA.TA': 'ILA', 'AAPL': 'USD'}))
+
+    df = fetch_market_caps_batched(['VOD.L', 'BARC.L', 'NPN.JO', 'TEVA.TA', 'AAPL'])
+
+    assert df['Currency'].tolist() == ['GBX', 'GBP', 'ZAC', 'ILA', 'USD']
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+import get_us_tickers
+from get_us_tickers import columnar_path, iter_ticker_chunks, load_tickers, save_tickers
+
+HEADER = "Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares"
+TRAILER = "File Creation Time: 0516202518:01|||||||"
+
+
+def test_chunks_are_deduplicated_as_they_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(get_us_tickers, 'CHUNK_SIZE', 2)
+    rows = [('AAPL', 'N'), ('NA', 'N'), ('ZXZZT', 'Y'), ('AAPL', 'N'), ('MSFT', 'N'), ('IBM', 'N')]
+    path = tmp_path / 'nasdaqlisted.txt'
+    path.write_text('\n'.join([HEADER] + [f"{s}|{s} Inc.|Q|{t}|N|100|N|N" for s, t in rows] + [TRAILER]) + '\n',
+                    encoding='latin-1')
+    seen = {'IBM'}
+
+    chunks = list(iter_ticker_chunks(str(path), seen))
+
+    assert [chunk['Ticker'].tolist() for chunk in chunks] == [['AAPL', 'NA'], ['MSFT']]
+    assert seen == {'AAPL', 'NA', 'MSFT', 'IBM'}
+
+
+def test_load_prefers_a_parquet_copy_no_older_than_the_csv(tmp_path):
+    csv_path = str(tmp_path / 'tickers.csv')
+    save_tickers(pd.DataFrame({'Ticker': ['NA', 'AAPL'], 'Company Name': ['Nano Labs', 'Apple Inc.']}), csv_path)
+    assert os.path.exists(columnar_path(csv_path))
+    assert load_tickers(csv_path)['Ticker'].tolist() == ['NA', 'AAPL']
+
+    with open(csv_path, 'a', encoding='utf-8') as f:
+        f.write('MSFT,Microsoft\n')
+    os.utime(columnar_path(csv_path), (0, 0))
+
+    assert load_tickers(csv_path)['Ticker'].tolist() == ['NA', 'AAPL', 'MSFT']
@@ -0,0 +1,37 @@
+import time
+
+from info_cache import DEFAULT_TTL, SHORT_TTL, InfoCache
+
+
+def _cache(tmp_path, payloads):
+    fetched = []
+
+    def fetcher(symbol):
+        fetched.append(symbol)
+        return payloads.get(symbol, {})
+
+    return InfoCache(str(tmp_path / 'info_cache.sqlite'), fetcher=fetcher), fetched
+
+
+def test_fields_expire_after_their_ttl(tmp_path):
+    cache, fetched = _cache(tmp_path, {'AAPL': {'longName': 'Apple Inc.', 'marketCap': 1}})
+    cache.get('AAPL')
+
+    cache.put('AAPL', {'longName': 'Apple Inc.', 'marketCap': 1}, fetched_at=time.time() - SHORT_TTL,
+              replace=True)
+
+    assert cache.lookup('AAPL', ['longName']) is not None
+    assert cache.lookup('AAPL', ['marketCap']) is None
+    assert fetched == ['AAPL']
+
+
+def test_empty_payload_expires_after_default_ttl(tmp_path):
+    cache, fetched = _cache(tmp_path, {})
+
+    assert cache.get('NOPE') == {}
+    assert cache.lookup('NOPE') == {}
+
+    cache.put('NOPE', {}, fetched_at=time.time() - DEFAULT_TTL, replace=True)
+
+    assert cache.lookup('NOPE') is None
+    assert fetched == ['NOPE']
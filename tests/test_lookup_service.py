@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from lookup_client import LookupClient
+from lookup_service import LookupService
+
+
+class FakeCache:
+    def stats(self):
+        return {'hits': 1, 'misses': 0}
+
+
+class FakeLookupService(LookupService):
+    """Service answering from fixed data instead of loading the index and calling Yahoo."""
+
+    def warm_up(self):
+        self.calls = []
+        self.cache = FakeCache()
+        self.get_company_info = self._info
+        self.search_companies = lambda query, max_results=5: [
+            {'ticker': 'AAPL', 'name': 'Apple Inc.', 'similarity': 100}][:max_results]
+        self.process_company_list = lambda names: [{'input_name': name, 'ticker': 'N/A',
+                                                    'confidence': float('nan')} for name in names]
+
+    def _info(self, symbol, refresh=False):
+        self.calls.append((symbol, refresh))
+        return {'symbol': symbol, 'marketCap': 3000} if symbol == 'AAPL' else None
+
+
+async def _cancel_pending():
+    pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+@pytest.fixture
+def service(tmp_path):
+    """A FakeLookupService serving on a Unix socket from a background event loop."""
+    service = FakeLookupService(max_workers=2)
+    socket_path = str(tmp_path / 'lookup.sock')
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(service.serve(socket_path=socket_path))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        # Let the connection handlers still waiting for requests finish before the loop closes
+        loop.run_until_complete(_cancel_pending())
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    deadline = time.time() + 10
+    while not os.path.exists(socket_path) and time.time() < deadline:
+        time.sleep(0.01)
+    client = LookupClient(socket_path=socket_path, timeout=10)
+    yield service, client
+    client.close()
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+    service.executor.shutdown()
+
+
+def test_endpoints_share_one_keep_alive_connection(service):
+    service, client = service
+
+    assert client.info('aapl', refresh=True) == (200, {'symbol': 'AAPL', 'marketCap': 3000})
+    assert client.search('Apple', max_results=1) == (200, [{'ticker': 'AAPL', 'name': 'Apple Inc.',
+                                                            'similarity': 100}])
+    assert client.batch(['Nothing Corp']) == (200, [{'input_name': 'Nothing Corp', 'ticker': 'N/A',
+                                                     'confidence': None}])
+    status, stats = client.stats()
+
+    assert status == 200 and stats['info_cache'] == {'hits': 1, 'misses': 0}
+    assert service.calls == [('AAPL', True)]
+
+
+def test_errors_map_to_http_statuses(service):
+    _, client = service
+
+    assert client.info('NOPE')[0] == 404
+    assert client.request('GET', '/search')[0] == 400
+    assert client.request('POST', '/batch', {'names': 'not a list'})[0] == 400
+    assert client.request('GET', '/batch')[0] == 405
+    assert client.request('GET', '/unknown')[0] == 404
+    assert client.request('GET', '/health')[1]['status'] == 'ok'
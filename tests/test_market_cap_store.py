@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pandas as pd
+
+from market_cap_store import append_snapshot, cap_history, load_history, partition_path, sum_by_exchange, top_n
+
+
+def _results(rows):
+    return pd.DataFrame(rows, columns=['Ticker', 'MarketCap', 'Currency', 'Market'])
+
+
+def test_snapshot_queries(tmp_path):
+    root = str(tmp_path / 'history')
+    append_snapshot(_results([('AAPL', 3000, 'USD', 'NMS'), ('IBM', 200, 'USD', 'NYQ'),
+                              ('XYZ', None, 'N/A', 'N/A')]), day='2024-05-01', root=root)
+    append_snapshot(_results([('AAPL', 3100, 'USD', 'NMS'), ('IBM', 210, 'USD', 'NYQ')]),
+                    day='2024-06-03', root=root)
+
+    assert top_n('2024-05-01', n=1, root=root)['Ticker'].tolist() == ['AAPL']
+    history = cap_history('AAPL', root=root)
+    assert history['MarketCap'].tolist() == [3000, 3100]
+    totals = sum_by_exchange('2024-06-01', '2024-06-30', root=root)
+    assert dict(zip(totals['Market'], totals['MarketCap'])) == {'NMS': 3100, 'NYQ': 210}
+    assert len(load_history(start='2024-05-01', end='2024-05-31', root=root)) == 3
+
+
+def test_rerun_replaces_rows_of_the_same_day(tmp_path):
+    root = str(tmp_path / 'history')
+    append_snapshot(_results([('AAPL', 3000, 'USD', 'NMS'), ('IBM', 200, 'USD', 'NYQ')]), day='2024-05-01', root=root)
+    append_snapshot(_results([('IBM', 250, 'USD', 'NYQ')]), day='2024-05-01', root=root)
+
+    rows = load_history(root=root)
+    assert dict(zip(rows['Ticker'], rows['MarketCap'])) == {'AAPL': 3000, 'IBM': 250}
+    totals = sum_by_exchange('2024-05-01', '2024-05-01', root=root)
+    assert dict(zip(totals['Market'], totals['MarketCap'])) == {'NMS': 3000, 'NYQ': 250}
+
+
+def test_concurrent_shards_keep_each_others_rows(tmp_path):
+    root = str(tmp_path / 'history')
+    shards = [[(f"S{shard}T{i}", 100, 'USD', f"EX{shard}") for i in range(20)] for shard in range(6)]
+    errors = []
+
+    def append(rows):
+        try:
+            append_snapshot(_results(rows), day='2024-05-01', root=root)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=append, args=(rows,)) for rows in shards]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(load_history(root=root)) == 120
+    totals = sum_by_exchange('2024-05-01', '2024-05-01', root=root)
+    assert dict(zip(totals['Market'], totals['MarketCap'])) == {f"EX{shard}": 2000 for shard in range(6)}
+    month_dir = os.path.dirname(partition_path(pd.Timestamp('2024-05-01').date(), root))
+    assert os.listdir(month_dir) == ['data.parquet']
+
+
+def test_queries_on_a_missing_store_are_empty(tmp_path):
+    root = str(tmp_path / 'history')
+
+    assert top_n('2024-05-01', root=root).empty
+    assert cap_history('AAPL', root=root).empty
+    assert sum_by_exchange('2024-05-01', '2024-05-31', root=root).empty
+    assert load_history(root=root).empty
+
+
+def test_ranges_filter_days_within_a_month(tmp_path):
+    root = str(tmp_path / 'history')
+    for day, cap in [('2024-04-30', 90), ('2024-05-01', 100), ('2024-05-15', 110), ('2024-05-31', 120)]:
+        append_snapshot(_results([('AAPL', cap, 'USD', 'NMS')]), day=day, root=root)
+
+    history = cap_history('AAPL', start='2024-05-02', end='2024-05-31', root=root)
+
+    assert history['MarketCap'].tolist() == [110, 120]
+    assert len(load_history(start='2024-04-30', end='2024-05-01', root=root)) == 2
+    assert top_n('2024-05-15', root=root)['MarketCap'].tolist() == [110]
@@ -0,0 +1,34 @@
+from rate_limiter import AdaptiveRateLimiter
+
+
+def test_throttling_halves_rate_once_per_pause(tmp_path):
+    limiter = AdaptiveRateLimiter('example.com', 8, state_dir=str(tmp_path))
+
+    limiter.throttled(retry_after=5)
+    # 429s for requests sent before the pause began
+    limiter.throttled()
+    limiter.throttled()
+
+    stats = limiter.stats()
+    assert stats['rate'] == 4.0
+    assert stats['failures'] == 1
+    assert stats['open_for'] > 4
+
+
+def test_rate_recovers_after_clean_responses(tmp_path):
+    limiter = AdaptiveRateLimiter('example.com', 8, state_dir=str(tmp_path))
+
+    limiter.throttled(retry_after=0)
+    for _ in range(100):
+        limiter.succeeded()
+
+    assert limiter.stats()['rate'] == 8.0
+
+
+def test_shared_state_between_limiters(tmp_path):
+    first = AdaptiveRateLimiter('example.com', 8, state_dir=str(tmp_path))
+    second = AdaptiveRateLimiter('example.com', 8, state_dir=str(tmp_path))
+
+    first.throttled(retry_after=5)
+
+    assert second.stats()['rate'] == 4.0
@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+from get_us_tickers import TickerDirectoryError, load_ticker_directory, load_tickers
+from ticker_delta import (ADDED, DELISTED, RENAMED, append_change_log, diff_tickers, get_changed_symbols,
+                          refresh_master)
+
+NASDAQ_HEADER = "Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares"
+OTHER_HEADER = "ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol"
+TRAILER = "File Creation Time: 0516202518:01||||||"
+
+
+def _nasdaq(rows, trailer=True):
+    lines = [NASDAQ_HEADER] + [f"{symbol}|{name}|Q|{test}|N|100|N|N" for symbol, name, test in rows]
+    return '\n'.join(lines + ([TRAILER + '|'] if trailer else [])) + '\n'
+
+
+def _other(rows, trailer=True):
+    lines = [OTHER_HEADER] + [f"{symbol}|{name}|N|{symbol}|N|100|{test}|{symbol}" for symbol, name, test in rows]
+    return '\n'.join(lines + ([TRAILER + '|'] if trailer else [])) + '\n'
+
+
+@pytest.fixture
+def directories(tmp_path):
+    """Write the two directory files and return their paths."""
+    def write(nasdaq_rows, other_rows, other_trailer=True):
+        nasdaq, other = tmp_path / 'nasdaqlisted.txt', tmp_path / 'otherlisted.txt'
+        nasdaq.write_text(_nasdaq(nasdaq_rows), encoding='latin-1')
+        other.write_text(_other(other_rows, other_trailer), encoding='latin-1')
+        return str(nasdaq), str(other)
+    return write
+
+
+def test_load_reads_both_directory_schemas(directories):
+    urls = directories([('AAPL', 'Apple Inc. - Common Stock', 'N'), ('ZXZZT', 'NASDAQ TEST STOCK', 'Y')],
+                       [('IBM', 'International Business Machines', 'N'), ('AAPL', 'Duplicate', 'N')])
+
+    df = load_ticker_directory(urls, strict=True)
+
+    assert df['Ticker'].tolist() == ['AAPL', 'IBM']
+    assert df['Company Name'].tolist() == ['Apple Inc. - Common Stock', 'International Business Machines']
+
+
+def test_truncated_directory_raises_in_strict_mode(directories):
+    urls = directories([('AAPL', 'Apple Inc.', 'N')], [('IBM', 'IBM', 'N')], other_trailer=False)
+
+    with pytest.raises(TickerDirectoryError):
+        load_ticker_directory(urls, strict=True)
+    assert load_ticker_directory(urls)['Ticker'].tolist() == ['AAPL']
+
+
+def test_refresh_master_logs_changes(directories, tmp_path):
+    master, log = str(tmp_path / 'master.csv'), str(tmp_path / 'changes.csv')
+    urls = directories([('AAPL', 'Apple Inc.', 'N'), ('MSFT', 'Microsoft', 'N')], [('IBM', 'IBM', 'N')])
+    first = refresh_master(urls, master, log)
+    assert set(first['change']) == {ADDED}
+
+    urls = directories([('AAPL', 'Apple Inc. (new)', 'N'), ('NVDA', 'NVIDIA', 'N')], [('IBM', 'IBM', 'N')])
+    changes = refresh_master(urls, master, log)
+
+    assert dict(zip(changes['Ticker'], changes['change'])) == {'AAPL': RENAMED, 'MSFT': DELISTED, 'NVDA': ADDED}
+    assert load_tickers(master)['Ticker'].tolist() == ['AAPL', 'IBM', 'NVDA']
+
+
+def test_changed_symbols_since_latest_refresh(tmp_path):
+    log = str(tmp_path / 'changes.csv')
+    old = pd.DataFrame({'Ticker': ['AAPL', 'MSFT'], 'Company Name': ['Apple', 'Microsoft']})
+    new = pd.DataFrame({'Ticker': ['AAPL', 'NVDA'], 'Company Name': ['Apple Inc.', 'NVIDIA']})
+    append_change_log(diff_tickers(old.iloc[:0], old, timestamp='2025-01-01T00:00:00+00:00'), log)
+    append_change_log(diff_tickers(old, new, timestamp='2025-01-02T00:00:00+00:00'), log)
+
+    assert get_changed_symbols(log_file=log) == ['AAPL', 'NVDA']
+    assert get_changed_symbols(since='2025-01-01', log_file=log) == ['AAPL', 'MSFT', 'NVDA']
+
+
+def test_refresh_master_leaves_master_on_truncated_directory(directories, tmp_path):
+    master, log = str(tmp_path / 'master.csv'), str(tmp_path / 'changes.csv')
+    refresh_master(directories([('AAPL', 'Apple Inc.', 'N')], [('IBM', 'IBM', 'N')]), master, log)
+    before = pd.read_csv(master)
+
+    urls = directories([('AAPL', 'Apple Inc.', 'N')], [], other_trailer=False)
+    with pytest.raises(TickerDirectoryError):
+        refresh_master(urls, master, log)
+
+    assert pd.read_csv(master).equals(before)
@@ -0,0 +1,50 @@
+from ticker_index import TickerIndex, looks_like_symbol, normalize_name
+
+RECORDS = [
+    ('AACB', 'Artius II Acquisition Inc. - Class A Ordinary Shares'),
+    ('AACBR', 'Artius II Acquisition Inc. - Rights'),
+    ('AACBU', 'Artius II Acquisition Inc. - Units'),
+    ('F', 'Ford Motor Company Common Stock'),
+    ('FORD', 'Forward Industries, Inc. - Common Stock'),
+    ('AAPL', 'Apple Inc. - Common Stock'),
+    ('APLE', 'Apple Hospitality REIT, Inc. Common Shares'),
+    ('JPM', 'JP Morgan Chase & Co. Common Stock'),
+]
+
+
+def test_normalize_name():
+    assert normalize_name('Apple Inc. - Common Stock') == 'apple'
+    assert normalize_name('The Walt Disney Company') == 'walt disney'
+    assert normalize_name('JP Morgan Chase & Co.') == 'jp morgan chase and'
+    assert normalize_name('Corporation') == 'corporation'
+
+
+def test_looks_like_symbol():
+    assert looks_like_symbol('F') and looks_like_symbol('BRK.B')
+    assert not looks_like_symbol('Ford') and not looks_like_symbol('FORD MOTOR')
+    assert not looks_like_symbol('TOOLONGSYM') and not looks_like_symbol('123')
+
+
+def test_listings_of_one_company_are_one_entry_with_its_primary_symbol():
+    index = TickerIndex(RECORDS)
+
+    assert len(index) == len(RECORDS) - 2
+    assert index.search('Artius II Acquisition', k=1) == [
+        {'name': 'Artius II Acquisition Inc.', 'ticker': 'AACB', 'similarity': 100}]
+
+
+def test_symbol_queries_come_first_only_when_typed_like_symbols():
+    index = TickerIndex(RECORDS)
+
+    assert index.search('FORD')[0] == {'name': 'Forward Industries, Inc.', 'ticker': 'FORD', 'similarity': 100}
+    assert index.search('Ford')[0]['ticker'] == 'F'
+
+
+def test_name_search_ranks_by_similarity():
+    index = TickerIndex(RECORDS)
+
+    results = index.search('Apple', k=2)
+
+    assert [r['ticker'] for r in results] == ['AAPL', 'APLE']
+    assert results[0]['similarity'] == 100 > results[1]['similarity']
+    assert index.search('...') == []
@@ -0,0 +1,28 @@
+import os
+import threading
+
+from ticker_universe import TickerUniverse
+
+
+def test_concurrent_saves_leave_one_complete_copy(tmp_path):
+    universe = TickerUniverse.build([('AAPL', 'Apple Inc.'), ('MSFT', 'Microsoft Corporation')])
+    path = str(tmp_path / 'tickers.universe')
+    errors = []
+
+    def save():
+        try:
+            for _ in range(5):
+                universe.save(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert os.listdir(tmp_path) == ['tickers.universe']
+    loaded = TickerUniverse.load(path)
+    assert len(loaded) == 2 and 'MSFT' in loaded
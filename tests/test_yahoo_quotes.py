@@ -0,0 +1,37 @@
+import info_cache
+import yahoo_quotes
+from rate_limiter import get_limiter
+from yahoo_quotes import get_quotes
+
+
+class FakeQuoteClient:
+    """Quote client answering from a dict of symbol -> quote, counting requested symbols."""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.requested = []
+        self.limiter = get_limiter('fake', 1000)
+
+    def quote(self, symbols, before_fetch=None, max_retries=None):
+        self.requested.extend(symbols)
+        return [dict(self.quotes[s], symbol=s) for s in symbols if s in self.quotes]
+
+
+def _fresh_flight(monkeypatch):
+    monkeypatch.setattr(yahoo_quotes, '_flight', yahoo_quotes.SingleFlight('yahoo_quote'))
+
+
+def test_fields_missing_from_a_quote_are_not_requested_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(info_cache, '_default_cache', info_cache.InfoCache(str(tmp_path / 'info_cache.sqlite')))
+    client = FakeQuoteClient({'AAPL': {'marketCap': 3000, 'currency': 'USD'}, 'SPY': {'currency': 'USD'}})
+    monkeypatch.setattr(yahoo_quotes, '_client', client)
+
+    _fresh_flight(monkeypatch)
+    first = get_quotes(['AAPL', 'SPY'], fields=['marketCap', 'currency'])
+    # A new flight has no memo of the first call, so only the cache can serve the second
+    _fresh_flight(monkeypatch)
+    second = get_quotes(['AAPL', 'SPY'], fields=['marketCap', 'currency'])
+
+    assert client.requested == ['AAPL', 'SPY']
+    assert first['marketCap'].tolist()[0] == second['marketCap'].tolist()[0] == 3000
+    assert second['marketCap'].isna().tolist() == [False, True]
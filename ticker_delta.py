@@ -0,0 +1,125 @@
+# ticker_delta.py
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from get_us_tickers import (NASDAQ_LISTED_URL, OTHER_LISTED_URL, OUTPUT_COLUMNS, TickerDirectoryError,
+                            load_ticker_directory, load_tickers, save_tickers)
+
+# Ticker master that is updated in place
+MASTER_CSV_FILE = "Master_us_stock_tickers.csv"
+
+# Append-only log of every add, delisting and rename
+CHANGE_LOG_FILE = "ticker_changes.csv"
+CHANGE_COLUMNS = ['timestamp', 'change', 'Ticker', 'old_name', 'new_name']
+
+ADDED = 'added'
+DELISTED = 'delisted'
+RENAMED = 'renamed'
+
+
+def diff_tickers(old_df, new_df, timestamp=None):
+    """
+    Compares two ticker tables and returns the changes between them.
+
+    Returns:
+        pd.DataFrame: One row per added, delisted or renamed ticker (CHANGE_COLUMNS)
+    """
+    timestamp = timestamp or datetime.now(timezone.utc).isoformat(timespec='seconds')
+    merged = old_df[OUTPUT_COLUMNS].merge(
+        new_df[OUTPUT_COLUMNS], on='Ticker', how='outer', suffixes=('_old', '_new'), indicator=True)
+
+    change = pd.Series(None, index=merged.index, dtype=object)
+    change[merged['_merge'] == 'right_only'] = ADDED
+    change[merged['_merge'] == 'left_only'] = DELISTED
+    renamed = (merged['_merge'] == 'both') & (merged['Company Name_old'] != merged['Company Name_new'])
+    change[renamed] = RENAMED
+
+    changes = pd.DataFrame({
+        'timestamp': timestamp,
+        'change': change,
+        'Ticker': merged['Ticker'],
+        'old_name': merged['Company Name_old'],
+        'new_name': merged['Company Name_new'],
+    })
+    return changes[changes['change'].notna()].sort_values('Ticker', ignore_index=True)
+
+
+def append_change_log(changes, log_file=CHANGE_LOG_FILE):
+    """Appends changes to the change log CSV, writing the header for a new file."""
+    if changes.empty:
+        return
+    changes.to_csv(log_file, mode='a', header=not os.path.exists(log_file), index=False)
+
+
+def load_change_log(log_file=CHANGE_LOG_FILE):
+    """Reads the change log; returns an empty frame if nothing has been logged yet."""
+    if not os.path.exists(log_file):
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    return pd.read_csv(log_file, dtype=str, keep_default_na=False)
+
+
+def get_changed_symbols(since=None, kinds=(ADDED, RENAMED), log_file=CHANGE_LOG_FILE):
+    """
+    Returns the tickers changed since a point in time.
+
+    Args:
+        since (str): ISO timestamp; changes at or after it are returned.
+            Defaults to the most recent refresh in the log.
+        kinds (tuple): Change types to include (added, renamed, delisted)
+        log_file (str): Change log CSV
+
+    Returns:
+        list: Ticker symbols, sorted and without duplicates
+    """
+    log = load_change_log(log_file)
+    if log.empty:
+        return []
+    if since is None:
+        since = log['timestamp'].max()
+    log = log[(log['timestamp'] >= since) & log['change'].isin(kinds)]
+    return sorted(log['Ticker'].unique().tolist())
+
+
+def refresh_master(urls=(NASDAQ_LISTED_URL, OTHER_LISTED_URL), master_file=MASTER_CSV_FILE,
+                   log_file=CHANGE_LOG_FILE):
+    """
+    Updates the ticker master from the NASDAQ directories, logging what changed.
+
+    The master is only rewritten when something changed. Every directory
+    must be read completely: a failed source or truncated download raises
+    TickerDirectoryError before anything is diffed, logged or saved, since
+    the symbols missing from a partial directory would be logged as delisted.
+
+    Returns:
+        pd.DataFrame: The changes recorded in this run
+    """
+    new_df = load_ticker_directory(list(urls), strict=True)
+    if new_df.empty:
+        print("No ticker data was fetched; master left unchanged.")
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+
+    if os.path.exists(master_file):
+        old_df = load_tickers(master_file)
+    else:
+        old_df = pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    changes = diff_tickers(old_df, new_df)
+    if changes.empty:
+        print(f"No changes to {master_file}")
+        return changes
+
+    append_change_log(changes, log_file)
+    save_tickers(new_df, master_file)
+    counts = changes['change'].value_counts()
+    print(f"Updated {master_file}: {counts.get(ADDED, 0)} added, "
+          f"{counts.get(DELISTED, 0)} delisted, {counts.get(RENAMED, 0)} renamed")
+    return changes
+
+
+if __name__ == "__main__":
+    try:
+        refresh_master()
+    except TickerDirectoryError as e:
+        print(f"Ticker refresh aborted, master left unchanged: {e}")
@@ -0,0 +1,181 @@
+# ticker_index.py
+import csv
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import Levenshtein
+
+# Ticker master used to build the local index
+MASTER_CSV_FILE = "Master_us_stock_tickers.csv"
+
+# Candidates re-ranked with Levenshtein for each query
+CANDIDATE_LIMIT = 40
+
+# Trigrams found in more than this share of names carry little signal and are
+# skipped during candidate generation (unless the query has nothing else)
+COMMON_TRIGRAM_RATIO = 0.05
+
+# Trailing legal-form words dropped from company names
+LEGAL_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd', 'limited',
+    'plc', 'llc', 'lp', 'llp', 'sa', 'ag', 'nv', 'se', 'the',
+}
+
+# Queries are looked up as ticker symbols first only if typed like one:
+# upper case, no spaces, at most this long (e.g. 'F', 'GOOGL', 'BRK.B')
+SYMBOL_QUERY_MAX_LENGTH = 7
+
+# Security descriptions that mark the primary listing of a company
+PRIMARY_SECURITY_WORDS = ('common stock', 'ordinary shares', 'common shares',
+                          'american depositary shares')
+
+_PUNCTUATION = re.compile(r"[^a-z0-9 ]+")
+_SPACES = re.compile(r"\s+")
+
+
+def split_security_name(name: str) -> Tuple[str, str]:
+    """Split 'Apple Inc. - Common Stock' into ('Apple Inc.', 'Common Stock')."""
+    company, _, security = name.partition(' - ')
+    return company.strip(), security.strip()
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a company name for matching.
+
+    Drops the security description after ' - ' (e.g. '- Class A Ordinary Shares'),
+    punctuation and trailing legal suffixes such as 'Inc.' or 'Corporation'.
+    """
+    company = split_security_name(name)[0].lower().replace('&', ' and ')
+    words = _SPACES.sub(' ', _PUNCTUATION.sub(' ', company)).split()
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == 'the':
+        words.pop(0)
+    return ' '.join(words)
+
+
+def looks_like_symbol(query: str) -> bool:
+    """True for queries typed like a ticker symbol: short, upper case, no spaces."""
+    return (0 < len(query) <= SYMBOL_QUERY_MAX_LENGTH and ' ' not in query
+            and query == query.upper() and any(c.isalpha() for c in query))
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of a normalized name, padded so short words still match."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _is_primary(security: str) -> bool:
+    security = security.lower()
+    return any(word in security for word in PRIMARY_SECURITY_WORDS)
+
+
+class TickerIndex:
+    """
+    In-memory fuzzy search over company names.
+
+    Names are normalized and grouped so a company with several listed securities
+    (shares, warrants, units) is one entry pointing at its primary symbol.
+    Candidates come from a trigram inverted index and are ranked with
+    Levenshtein similarity on a 0-100 scale, the same scale as fuzz.ratio.
+    """
+
+    def __init__(self, records: Iterable[Tuple[str, str]]):
+        groups = {}
+        self.symbols = {}
+        for symbol, name in records:
+            if not symbol or not name:
+                continue
+            self.symbols[symbol.upper()] = name
+            key = normalize_name(name)
+            if not key:
+                continue
+            groups.setdefault(key, []).append((symbol, name))
+
+        self.keys = []
+        self.entries = []
+        postings = defaultdict(list)
+        for key, listings in groups.items():
+            # Prefer common/ordinary shares, then the shortest symbol
+            listings.sort(key=lambda item: (not _is_primary(split_security_name(item[1])[1]),
+                                            len(item[0]), item[0]))
+            entry_id = len(self.keys)
+            self.keys.append(key)
+            self.entries.append(listings)
+            for gram in trigrams(key):
+                postings[gram].append(entry_id)
+        self.postings = dict(postings)
+        self.common_cutoff = max(1, int(len(self.keys) * COMMON_TRIGRAM_RATIO))
+
+    @classmethod
+    def from_csv(cls, file_path: str = MASTER_CSV_FILE) -> 'TickerIndex':
+        """Build the index from a CSV with 'Ticker' and 'Company Name' columns."""
+        with open(file_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            return cls((row['Ticker'], row['Company Name']) for row in reader)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, key: str) -> List[int]:
+        grams = [g for g in trigrams(key) if g in self.postings]
+        rare = [g for g in grams if len(self.postings[g]) <= self.common_cutoff]
+        counts = defaultdict(int)
+        for gram in rare or grams:
+            for entry_id in self.postings[gram]:
+                counts[entry_id] += 1
+        if len(counts) <= CANDIDATE_LIMIT:
+            return list(counts)
+        return sorted(counts, key=counts.__getitem__, reverse=True)[:CANDIDATE_LIMIT]
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """
+        Return up to k best matches for a company name or ticker symbol.
+
+        A query typed like a symbol (see looks_like_symbol) that is a known
+        ticker comes first with similarity 100; anything else, such as
+        'Ford', is matched on name similarity only.
+
+        Returns:
+            List[Dict]: Matches with 'name', 'ticker' and 'similarity' (0-100),
+            best first
+        """
+        key = normalize_name(query)
+        if not key:
+            return []
+        scored = {}
+        for entry_id in self._candidates(key):
+            scored[entry_id] = round(Levenshtein.ratio(key, self.keys[entry_id]) * 100)
+
+        results = []
+        symbol_query = query.strip()
+        exact_symbol = self.symbols.get(symbol_query) if looks_like_symbol(symbol_query) else None
+        if exact_symbol:
+            results.append({'name': split_security_name(exact_symbol)[0],
+                            'ticker': symbol_query, 'similarity': 100})
+
+        for entry_id in sorted(scored, key=scored.__getitem__, reverse=True):
+            if len(results) >= k:
+                break
+            symbol, name = self.entries[entry_id][0]
+            if results and results[0]['ticker'] == symbol:
+                continue
+            results.append({'name': split_security_name(name)[0], 'ticker': symbol,
+                            'similarity': scored[entry_id]})
+        return results[:k]
+
+
+_default_index = None
+
+
+def get_index(file_path: Optional[str] = None) -> TickerIndex:
+    """Return the shared index, building it from the ticker master on first use."""
+    global _default_index
+    if file_path is not None:
+        return TickerIndex.from_csv(file_path)
+    if _default_index is None:
+        _default_index = TickerIndex.from_csv()
+    return _default_index
@@ -0,0 +1,268 @@
+# ticker_universe.py
+import argparse
+import csv
+import errno
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Ticker master the universe is built from
+MASTER_CSV_FILE = "Master_us_stock_tickers.csv"
+
+# Categorical metadata stored as integer codes; code 0 means unknown
+CATEGORY_FIELDS = ['exchange', 'sector', 'industry']
+
+# On-disk form: one .npy file per array plus the category tables, all in one directory
+ARRAY_NAMES = ['symbols', 'name_offsets', 'name_data', 'slots'] + CATEGORY_FIELDS
+CATEGORIES_FILE = "categories.json"
+
+EMPTY_SLOT = -1
+
+
+def universe_path(csv_path: str) -> str:
+    """Directory of the memory-mapped universe built from a ticker CSV."""
+    return os.path.splitext(csv_path)[0] + '.universe'
+
+
+def _hash(symbol: bytes) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(symbol)
+
+
+class TickerUniverse:
+    """
+    Immutable, memory-compact table of tickers.
+
+    Symbols are kept in one fixed-width byte array and names in one UTF-8
+    buffer with offsets; exchange, sector and industry are int16 codes into
+    small category tables. Symbol -> row lookups go through an open-addressing
+    hash table stored as an int32 array, so the whole structure is a handful
+    of flat arrays. Saved with save(), it can be opened with load() as
+    read-only memory maps, letting several processes share one copy.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], categories: Dict[str, List[str]]):
+        self.symbols = arrays['symbols']
+        self.name_offsets = arrays['name_offsets']
+        self.name_data = arrays['name_data']
+        self.slots = arrays['slots']
+        self.codes = {field: arrays[field] for field in CATEGORY_FIELDS}
+        self.categories = categories
+        self._mask = len(self.slots) - 1
+
+    @classmethod
+    def build(cls, records: Iterable[Tuple]) -> 'TickerUniverse':
+        """
+        Build a universe from (symbol, name[, exchange, sector, industry]) records.
+
+        Duplicate symbols keep their first record.
+        """
+        symbols, names = [], []
+        values = {field: [] for field in CATEGORY_FIELDS}
+        seen = set()
+        for record in records:
+            symbol = str(record[0]).strip().upper()
+            if not symbol or symbol in seen:
+                continue
+            seen.add(symbol)
+            symbols.append(symbol.encode('ascii', 'replace'))
+            names.append(str(record[1] if len(record) > 1 else '').encode('utf-8'))
+            for i, field in enumerate(CATEGORY_FIELDS, start=2):
+                values[field].append((record[i] if len(record) > i else None) or '')
+
+        categories = {}
+        arrays = {'symbols': np.array(symbols, dtype=f"S{max(map(len, symbols), default=1)}")}
+        for field in CATEGORY_FIELDS:
+            table = [''] + sorted(set(values[field]) - {''})
+            index = {value: code for code, value in enumerate(table)}
+            categories[field] = table
+            arrays[field] = np.array([index[v] for v in values[field]], dtype=np.int16)
+
+        lengths = np.fromiter((len(n) for n in names), dtype=np.int64, count=len(names))
+        arrays['name_offsets'] = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+        arrays['name_data'] = np.frombuffer(b''.join(names), dtype=np.uint8).copy()
+
+        # Power-of-two table at most 3/4 full keeps probe sequences short
+        size = 1
+        while size * 3 < 4 * len(symbols) + 3:
+            size <<= 1
+        slots = np.full(size, EMPTY_SLOT, dtype=np.int32)
+        for row, symbol in enumerate(symbols):
+            slot = _hash(symbol) & (size - 1)
+            while slots[slot] != EMPTY_SLOT:
+                slot = (slot + 1) & (size - 1)
+            slots[slot] = row
+        arrays['slots'] = slots
+        return cls(arrays, categories)
+
+    @classmethod
+    def from_csv(cls, csv_path: str = MASTER_CSV_FILE,
+                 metadata: Optional[Dict[str, Dict]] = None) -> 'TickerUniverse':
+        """Build from a ticker CSV (Ticker, Company Name) plus optional per-symbol metadata."""
+        metadata = metadata or {}
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            rows = [(row['Ticker'], row['Company Name']) for row in csv.DictReader(f)]
+        return cls.build(
+            (symbol, name) + tuple(metadata.get(symbol.upper(), {}).get(field) for field in CATEGORY_FIELDS)
+            for symbol, name in rows)
+
+    def save(self, path: str) -> str:
+        """
+        Write the arrays as .npy files under path, replacing an older copy.
+
+        The files are written to a private temporary directory next to path and
+        swapped in by rename, so concurrent builders never write into the same
+        directory. If another builder swaps its copy in first, that one is kept.
+        """
+        parent = os.path.dirname(os.path.abspath(path))
+        prefix = os.path.basename(path)
+        tmp_path = tempfile.mkdtemp(prefix=prefix + '.tmp-', dir=parent)
+        try:
+            arrays = {'symbols': self.symbols, 'name_offsets': self.name_offsets,
+                      'name_data': self.name_data, 'slots': self.slots, **self.codes}
+            for name in ARRAY_NAMES:
+                np.save(os.path.join(tmp_path, f"{name}.npy"), arrays[name])
+            with open(os.path.join(tmp_path, CATEGORIES_FILE), 'w') as f:
+                json.dump(self.categories, f)
+            if os.path.isdir(path):
+                # A directory cannot be renamed over a non-empty one: move the old copy aside first
+                old_path = tmp_path + '.old'
+                try:
+                    os.replace(path, old_path)
+                except FileNotFoundError:
+                    pass
+                else:
+                    shutil.rmtree(old_path, ignore_errors=True)
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # ENOTEMPTY/EEXIST: another builder's copy landed in between; keep it
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'TickerUniverse':
+        """Open a saved universe; with mmap the arrays are read-only views of the files."""
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAY_NAMES}
+        with open(os.path.join(path, CATEGORIES_FILE)) as f:
+            categories = json.load(f)
+        return cls(arrays, categories)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return self.row(symbol) != EMPTY_SLOT
+
+    def row(self, symbol: str) -> int:
+        """Row of a symbol, or -1 if it is not in the universe."""
+        key = symbol.upper().encode('ascii', 'replace')
+        slot = _hash(key) & self._mask
+        while True:
+            row = int(self.slots[slot])
+            if row == EMPTY_SLOT or self.symbols[row] == key:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def symbol(self, row: int) -> str:
+        return self.symbols[row].decode('ascii')
+
+    def name(self, row: int) -> str:
+        start, end = self.name_offsets[row], self.name_offsets[row + 1]
+        return self.name_data[start:end].tobytes().decode('utf-8')
+
+    def category(self, field: str, row: int) -> Optional[str]:
+        return self.categories[field][self.codes[field][row]] or None
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """Record of one symbol as a dict, or None if unknown."""
+        row = self.row(symbol)
+        if row == EMPTY_SLOT:
+            return None
+        record = {'ticker': self.symbol(row), 'name': self.name(row)}
+        record.update((field, self.category(field, row)) for field in CATEGORY_FIELDS)
+        return record
+
+    def tickers(self) -> List[str]:
+        """All symbols, in CSV order."""
+        return [symbol.decode('ascii') for symbol in self.symbols.tolist()]
+
+    def rows_where(self, field: str, value: str) -> np.ndarray:
+        """Rows whose exchange/sector/industry equals value (vectorized over the code array)."""
+        try:
+            code = self.categories[field].index(value)
+        except ValueError:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.codes[field] == code)
+
+    def nbytes(self) -> int:
+        """Size of all arrays, i.e. the resident cost of the universe."""
+        return sum(a.nbytes for a in (self.symbols, self.name_offsets, self.name_data, self.slots,
+                                      *self.codes.values()))
+
+
+def cached_metadata(symbols: Iterable[str]) -> Dict[str, Dict]:
+    """Exchange/sector/industry already in the info cache; never hits the network."""
+    from info_cache import get_cache
+    return get_cache().stored_fields(symbols, CATEGORY_FIELDS)
+
+
+def build_universe(csv_path: str = MASTER_CSV_FILE, path: Optional[str] = None,
+                   with_metadata: bool = True) -> TickerUniverse:
+    """Build the universe of a ticker CSV, save it next to the CSV and return the memory-mapped copy."""
+    path = path or universe_path(csv_path)
+    metadata = None
+    if with_metadata:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            metadata = cached_metadata(row['Ticker'] for row in csv.DictReader(f))
+    TickerUniverse.from_csv(csv_path, metadata).save(path)
+    return TickerUniverse.load(path)
+
+
+_universes = {}
+_universe_lock = threading.Lock()
+
+
+def get_universe(csv_path: str = MASTER_CSV_FILE) -> TickerUniverse:
+    """
+    Shared universe for a ticker CSV.
+
+    Opens the saved copy when it is newer than the CSV and rebuilds it otherwise.
+    """
+    with _universe_lock:
+        universe = _universes.get(csv_path)
+        if universe is None:
+            path = universe_path(csv_path)
+            marker = os.path.join(path, CATEGORIES_FILE)
+            if os.path.exists(marker) and os.path.getmtime(marker) >= os.path.getmtime(csv_path):
+                universe = TickerUniverse.load(path)
+            else:
+                universe = build_universe(csv_path, path)
+            _universes[csv_path] = universe
+        return universe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped ticker universe.")
+    parser.add_argument('csv_path', nargs='?', default=MASTER_CSV_FILE)
+    parser.add_argument('--no-metadata', action='store_true', help="Skip exchange/sector/industry from the info cache")
+    args = parser.parse_args()
+
+    universe = build_universe(args.csv_path, with_metadata=not args.no_metadata)
+    known = int((universe.codes['sector'] != 0).sum())
+    print(f"Saved {len(universe)} tickers ({known} with sector) to {universe_path(args.csv_path)}, "
+          f"{universe.nbytes() / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
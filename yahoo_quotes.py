@@ -0,0 +1,324 @@
+# yahoo_quotes.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional
+
+from info_cache import get_cache
+from instrumentation import metrics, span
+from rate_limiter import DEFERRED_ROUNDS, DeferredRetries, get_limiter, host_key
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas and requests are imported on first use: cached single-symbol
+# lookups (get_quote) need neither
+
+# Yahoo multi-symbol quote endpoint and the cookie/crumb pair it requires
+YAHOO_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+YAHOO_COOKIE_URL = "https://fc.yahoo.com"
+YAHOO_CRUMB_URL = "https://query1.finance.yahoo.com/v1/test/getcrumb"
+USER_AGENT = "Mozilla/5.0"
+
+# Symbols per quote request; Yahoo accepts a few hundred per call
+BATCH_SIZE = 200
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 2
+MAX_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Quote fields kept (same names as Ticker.info) and the dtype of each column
+QUOTE_FIELDS = {
+    'symbol': 'string',
+    'longName': 'string',
+    'shortName': 'string',
+    'quoteType': 'category',
+    'market': 'category',
+    'exchange': 'category',
+    'currency': 'category',
+    'marketCap': 'Int64',
+    'regularMarketPrice': 'float64',
+    'sharesOutstanding': 'Int64',
+}
+
+
+class RetryableError(Exception):
+    """A 429/5xx response left after the client's retries; worth retrying later."""
+
+    def __init__(self, status: int, retry_after: Optional[str] = None):
+        reason = "Too Many Requests" if status == 429 else "Server Error"
+        super().__init__(f"{status} {reason} from Yahoo quote endpoint")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class QuoteFetchError(Exception):
+    """
+    Quote batches still failing after the deferred rounds. `symbols` lists
+    the symbols not fetched, `records` the quotes of the batches that were.
+    """
+
+    def __init__(self, message: str, symbols: List[str], records: List[Dict]):
+        super().__init__(message)
+        self.symbols = symbols
+        self.records = records
+
+
+def to_frame(records: Iterable[Dict]) -> 'pd.DataFrame':
+    """Typed quote table indexed by symbol; unknown fields are dropped."""
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(list(records), columns=list(QUOTE_FIELDS))
+    for field, dtype in QUOTE_FIELDS.items():
+        if dtype in ('Int64', 'float64'):
+            frame[field] = pd.to_numeric(frame[field], errors='coerce')
+            if dtype == 'Int64':
+                frame[field] = frame[field].round()
+        frame[field] = frame[field].astype(dtype)
+    return frame.set_index('symbol', drop=False)
+
+
+class QuoteClient:
+    """
+    Client for the Yahoo multi-symbol quote endpoint.
+
+    One pooled session shared by all workers, a per-host token bucket shared
+    across processes (rate_limiter.AdaptiveRateLimiter) that backs off on
+    throttling, and retries on 429/5xx. The crumb is fetched once and
+    refreshed when Yahoo rejects it; set crumb_url=None for servers that do
+    not need one.
+    """
+
+    def __init__(self, quote_url: str = YAHOO_QUOTE_URL, crumb_url: Optional[str] = YAHOO_CRUMB_URL,
+                 cookie_url: Optional[str] = YAHOO_COOKIE_URL, rate: float = REQUESTS_PER_SECOND,
+                 max_retries: int = MAX_RETRIES, timeout: float = 30):
+        import requests
+
+        self.quote_url = quote_url
+        self.crumb_url = crumb_url
+        self.cookie_url = cookie_url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = get_limiter(host_key(quote_url), rate)
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self._crumb = None
+        self._crumb_lock = threading.Lock()
+
+    def crumb(self, refresh: bool = False) -> Optional[str]:
+        if self.crumb_url is None:
+            return None
+        with self._crumb_lock:
+            if self._crumb is None or refresh:
+                if self.cookie_url:
+                    try:
+                        # Only sets the session cookie; the response itself is a 404
+                        self.session.get(self.cookie_url, timeout=self.timeout)
+                    except OSError:  # requests.RequestException derives from it
+                        pass
+                response = self.session.get(self.crumb_url, timeout=self.timeout)
+                self._crumb = response.text.strip() if response.status_code == 200 else None
+            return self._crumb
+
+    def quote(self, symbols: List[str], before_fetch: Optional[Callable[[], None]] = None,
+              max_retries: Optional[int] = None) -> List[Dict]:
+        """
+        Raw quote records for up to a few hundred symbols in one request.
+
+        429/5xx responses are retried up to max_retries times (default: the
+        client's), then raise RetryableError. before_fetch, if given, replaces
+        the client's own limiter: the caller rate-limits, feeds the outcome to
+        its limiter and retries (e.g. get_market_cap.iter_market_caps), so the
+        request is sent once and its response is not recorded here.
+        """
+        params = {'symbols': ','.join(symbols)}
+        if before_fetch:
+            max_retries = 0
+        elif max_retries is None:
+            max_retries = self.max_retries
+        attempt = 0
+        crumb_refreshed = False
+        while True:
+            crumb = self.crumb()
+            if crumb:
+                params['crumb'] = crumb
+            with span('rate_limit_wait', endpoint='yahoo_quote'):
+                if before_fetch:
+                    before_fetch()
+                else:
+                    self.limiter.acquire()
+            with span('http_request', endpoint='yahoo_quote'):
+                response = self.session.get(self.quote_url, params=params, timeout=self.timeout)
+            metrics.incr('http_responses', endpoint='yahoo_quote', status=response.status_code)
+            retry_after = response.headers.get('Retry-After')
+            delay = 0.0 if before_fetch else self.limiter.record(response.status_code, retry_after)
+            if response.status_code == 401 and self.crumb_url and not crumb_refreshed:
+                crumb_refreshed = True
+                self.crumb(refresh=True)
+                continue
+            if response.status_code in RETRY_STATUSES:
+                if attempt >= max_retries:
+                    raise RetryableError(response.status_code, retry_after)
+                attempt += 1
+                metrics.incr('retries', endpoint='yahoo_quote')
+                with span('backoff_sleep', endpoint='yahoo_quote'):
+                    time.sleep(delay)
+                continue
+            response.raise_for_status()
+            with span('parse', step='yahoo_quote'):
+                return response.json().get('quoteResponse', {}).get('result') or []
+
+
+_client = None
+_client_lock = threading.Lock()
+
+# Per-symbol coalescing: a symbol already being fetched by another caller is not requested again
+_flight = SingleFlight('yahoo_quote')
+
+
+def get_client() -> QuoteClient:
+    """Return the shared quote client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = QuoteClient()
+        return _client
+
+
+def set_client(client: QuoteClient):
+    """Replace the shared quote client, e.g. with one pointed at a local server."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def fetch_quotes(symbols: List[str], batch_size: int = BATCH_SIZE, max_workers: int = MAX_WORKERS,
+                 before_fetch: Optional[Callable[[], None]] = None,
+                 deferred_rounds: int = DEFERRED_ROUNDS) -> List[Dict]:
+    """
+    Fetch quotes for many symbols, batch_size symbols per request.
+
+    Each record keeps only QUOTE_FIELDS and is merged into the info cache, so
+    later single-symbol lookups of the same fields are served locally. Fields
+    a quote leaves out are cached as None, so they stay known absent until
+    their TTL runs out instead of being requested again on every run.
+    Batches that fail (throttling, server errors) after the client's own
+    retries are retried once in each of up to deferred_rounds later passes
+    once Yahoo recovers; if any still fail, a
+    QuoteFetchError carrying the last error's message and the symbols of the
+    failed batches is raised after the successful batches have been cached.
+    """
+    client = get_client()
+    batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    deferred = DeferredRetries(client.limiter, rounds=deferred_rounds)
+    cache = get_cache()
+    records = []
+
+    def keep(batch):
+        kept = [{field: item.get(field) for field in QUOTE_FIELDS} for item in batch]
+        for record in kept:
+            if record.get('symbol'):
+                cache.put(record['symbol'], record)
+        records.extend(kept)
+
+    def quote(batch):
+        try:
+            return client.quote(batch, before_fetch)
+        except Exception as e:
+            deferred.add(tuple(batch), e)
+            return []
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+        for batch in executor.map(quote, batches):
+            keep(batch)
+    for _, batch in deferred.run(lambda key: client.quote(list(key), before_fetch, max_retries=0)):
+        keep(batch)
+    if deferred.failed:
+        error = list(deferred.failed.values())[-1]
+        raise QuoteFetchError(str(error), [s for batch in deferred.failed for s in batch], records) from error
+    return records
+
+
+def get_quotes(symbols: Iterable[str], fields: Optional[Iterable[str]] = None, refresh: bool = False,
+               before_fetch: Optional[Callable[[], None]] = None, partial: bool = False,
+               **kwargs) -> 'pd.DataFrame':
+    """
+    Typed quote table for symbols, in input order.
+
+    Symbols whose requested fields are fresh in the info cache are not
+    requested again; the rest are fetched in batches. Symbols another caller
+    is already fetching are waited for instead of requested twice. Symbols
+    Yahoo does not know get a row of missing values. Symbols that could not
+    be fetched raise QuoteFetchError, or with partial=True also get a row of
+    missing values and are listed in the frame's attrs['failed'].
+    """
+    symbols = [s.upper() for s in symbols]
+    fields = list(fields) if fields is not None else [f for f in QUOTE_FIELDS if f != 'symbol']
+    cache = get_cache()
+    records = {}
+    missing = []
+    failed = []
+    for symbol in dict.fromkeys(symbols):
+        cached = None if refresh else cache.lookup(symbol, fields)
+        if cached is not None:
+            metrics.incr('cache_hits', cache='yf_quote')
+            records[symbol] = dict(cached, symbol=symbol)
+        else:
+            metrics.incr('cache_misses', cache='yf_quote')
+            missing.append(symbol)
+    if missing:
+        claims = {symbol: _flight.begin(symbol, use_memo=not refresh) for symbol in missing}
+        leaders = [symbol for symbol, (leader, _) in claims.items() if leader]
+        if leaders:
+            try:
+                result, errors = fetch_quotes(leaders, before_fetch=before_fetch, **kwargs), {}
+            except QuoteFetchError as e:
+                result, errors = e.records, {symbol: e for symbol in e.symbols}
+            except BaseException as e:
+                for symbol in leaders:
+                    _flight.finish(symbol, error=e)
+                raise
+            fetched = {record['symbol'].upper(): record for record in result if record.get('symbol')}
+            for symbol in leaders:
+                if symbol in errors:
+                    _flight.finish(symbol, error=errors[symbol])
+                else:
+                    _flight.finish(symbol, fetched.get(symbol))
+        for symbol, (_, future) in claims.items():
+            try:
+                record = future.result()
+            except QuoteFetchError:
+                if not partial:
+                    raise
+                failed.append(symbol)
+                continue
+            if record is not None:
+                records[symbol] = record
+    frame = to_frame(records.get(symbol, {'symbol': symbol}) for symbol in symbols)
+    if partial:
+        frame.attrs['failed'] = failed
+    return frame
+
+
+def get_quote(symbol: str, fields: Optional[Iterable[str]] = None, refresh: bool = False,
+              before_fetch: Optional[Callable[[], None]] = None) -> Dict:
+    """Quote fields for one symbol as a plain dict (missing values dropped)."""
+    if not refresh:
+        # Cache hits skip building a one-row frame
+        cached = get_cache().lookup(symbol, fields if fields is not None else
+                                    [f for f in QUOTE_FIELDS if f != 'symbol'])
+        if cached is not None:
+            metrics.incr('cache_hits', cache='yf_quote')
+            cached = dict(cached, symbol=symbol.upper())
+            return {field: cached[field] for field in QUOTE_FIELDS if cached.get(field) is not None}
+    import pandas as pd
+
+    # No deferred rounds for a single symbol: errors reach the caller's own retry logic
+    try:
+        row = get_quotes([symbol], fields=fields, refresh=refresh, before_fetch=before_fetch,
+                         deferred_rounds=0).iloc[0]
+    except QuoteFetchError as e:
+        raise e.__cause__ or e
+    return {field: (value.item() if hasattr(value, 'item') else value)
+            for field, value in row.items() if not pd.isna(value)}